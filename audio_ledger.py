@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Audio Ledger: Persistent record of what has already been transcribed.
+Keeps a rolling hash of each recording's transcribed audio prefix so a file
+that re-syncs with appended audio (e.g. a long meeting arriving in pieces via
+Syncthing) only needs its new tail transcribed.
+
+Entries hold resume metadata only (prefix hashes, page, summary, segment
+count and last segment end); the segments themselves live in the recording's
+segment sidecar (segment_store), which the entry points to.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LEDGER_PATH = Path(__file__).parent / "state" / "ledger.json"
+
+# Whisper decodes everything to 16 kHz mono float32
+SAMPLE_RATE = 16000
+
+# Prefix hash granularity: one Whisper window (30 s)
+HASH_BLOCK = SAMPLE_RATE * 30
+
+
+def hash_chain(audio, num_samples: Optional[int] = None) -> List[str]:
+    """
+    Rolling hash over full HASH_BLOCK blocks of decoded audio.
+    Each digest covers its block plus the previous digest, so digest N
+    verifies the whole prefix up to the end of block N.
+    """
+    if num_samples is None:
+        num_samples = len(audio)
+    chain = []
+    previous = b""
+    for start in range(0, num_samples - HASH_BLOCK + 1, HASH_BLOCK):
+        digest = hashlib.sha256(previous)
+        digest.update(audio[start:start + HASH_BLOCK].tobytes())
+        previous = digest.digest()
+        chain.append(digest.hexdigest())
+    return chain
+
+
+def _tail_hash(audio, start: int, end: int) -> str:
+    """Hash the trailing partial block that the chain does not cover."""
+    return hashlib.sha256(audio[start:end].tobytes()).hexdigest()
+
+
+def verified_prefix(entry: Dict, audio) -> int:
+    """
+    Return how many samples at the start of `audio` are identical to the
+    audio recorded in the ledger entry (0 if nothing matches).
+    """
+    chain = entry.get("chain", [])
+    samples = entry.get("samples", 0)
+    verified = 0
+    previous = b""
+    for index, expected in enumerate(chain):
+        start = index * HASH_BLOCK
+        if start + HASH_BLOCK > len(audio):
+            return verified
+        digest = hashlib.sha256(previous)
+        digest.update(audio[start:start + HASH_BLOCK].tobytes())
+        if digest.hexdigest() != expected:
+            return verified
+        previous = digest.digest()
+        verified = start + HASH_BLOCK
+
+    # Chain fully matched: check the partial block up to the old end
+    if samples <= len(audio) and entry.get("tail_hash") == _tail_hash(audio, verified, samples):
+        return samples
+    return verified
+
+
+def stored_segments(entry: Dict) -> List[Dict]:
+    """
+    The segments an entry was recorded with, from its segment sidecar (inline
+    for entries written before segments moved out of the ledger). Empty if the
+    sidecar is gone or no longer matches the entry.
+    """
+    if "segments" in entry:
+        return entry["segments"]
+    path = entry.get("segments_path")
+    if not path or not Path(path).exists():
+        return []
+    try:
+        import segment_store
+        segments = segment_store.load(Path(path))
+    except (ImportError, OSError, ValueError):
+        return []
+    if len(segments) != entry.get("segment_count"):
+        return []
+    if len(segments) and abs(float(segments.end[-1]) - entry.get("last_end", 0.0)) > 1e-2:
+        return []
+    return list(segments)
+
+
+def resume_point(entry: Optional[Dict], audio) -> Tuple[List[Dict], int]:
+    """
+    Work out how much of a previous transcription can be reused.
+
+    Returns (kept_segments, resume_sample). The previous final segment is
+    always dropped because it may have been cut off mid-sentence at the old
+    end of file; transcription resumes at the end of the last kept segment.
+    """
+    if not entry:
+        return [], 0
+
+    segments = stored_segments(entry)
+    if not segments:
+        return [], 0
+    verified = verified_prefix(entry, audio)
+
+    # Same recording, nothing appended
+    if verified == entry.get("samples") == len(audio):
+        return segments, len(audio)
+
+    kept = [s for s in segments[:-1] if s["end"] * SAMPLE_RATE <= verified]
+    if not kept:
+        return [], 0
+    return kept, int(kept[-1]["end"] * SAMPLE_RATE)
+
+
+def fingerprint(audio) -> Dict:
+    """Prefix hashes to store in the ledger for a transcribed recording."""
+    chain = hash_chain(audio)
+    covered = len(chain) * HASH_BLOCK
+    return {
+        "samples": len(audio),
+        "chain": chain,
+        "tail_hash": _tail_hash(audio, covered, len(audio)),
+    }
+
+
+class AudioLedger:
+    """Thread-safe JSON ledger keyed by note type and audio filename."""
+
+    def __init__(self, path: Path = LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._entries), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(note_type: str, name: str) -> str:
+        return f"{note_type}/{name}"
+
+    def entries(self) -> List[Tuple[str, str, Dict]]:
+        """All entries as (note_type, audio filename, entry)."""
+        with self._lock:
+            items = list(self._entries.items())
+        return [(*key.split("/", 1), entry) for key, entry in items]
+
+    def get(self, note_type: str, name: str) -> Optional[Dict]:
+        """Return the ledger entry for an audio file, if any."""
+        with self._lock:
+            return self._entries.get(self._key(note_type, name))
+
+    def record(
+        self,
+        note_type: str,
+        name: str,
+        audio_fingerprint: Dict,
+        segments: List[Dict],
+        page: Path,
+        summary: Optional[str] = None,
+        segments_path: Optional[Path] = None
+    ):
+        """
+        Store the transcribed state of an audio file (see fingerprint()).
+        The segments are not copied: segments_path is the sidecar they were
+        saved to, and without one the recording cannot be resumed.
+        """
+        entry = {
+            **audio_fingerprint,
+            "segments_path": str(segments_path) if segments_path else None,
+            "segment_count": len(segments),
+            "last_end": segments[-1]["end"] if segments else 0.0,
+            "page": str(page),
+            "summary": summary,
+        }
+        with self._lock:
+            self._entries[self._key(note_type, name)] = entry
+            self._save()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Autotune: Pick the Whisper worker/thread profile that suits this host.
+
+Runs a short reference clip through the real transcription path (WhisperPool
++ ResourceGovernor) under several workers x threads configurations, measures
+aggregate real-time factor and memory, and saves the winner to a tuning file
+that transcribe_service_v3.py loads at startup. Each configuration gets an
+untimed warm-up round and keeps the median of AUTOTUNE_RUNS timed rounds, so
+page-cache and allocator warm-up do not favour whichever runs later.
+
+Usage:
+    python transcribe_service_v3.py --autotune [clip.m4a]
+    python autotune.py [clip.m4a]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import whisper_pool
+import resource_governor
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent.absolute()
+TUNING_PATH = BASE_DIR / "state" / "tuning.json"
+ARCHIVE_DIR = BASE_DIR / "archive"
+
+CLIP_SECONDS = float(os.getenv("AUTOTUNE_SECONDS", "60"))
+MAX_WORKERS = int(os.getenv("AUTOTUNE_MAX_WORKERS", "4"))
+MAX_MEMORY_MB = float(os.getenv("AUTOTUNE_MAX_MEMORY_MB", "0"))  # 0 = no cap
+RUNS = max(2, int(os.getenv("AUTOTUNE_RUNS", "3")))
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a"}
+
+
+def load_profile(path: Path = TUNING_PATH) -> Dict:
+    """Load the saved tuning profile ({} if autotune has not been run)."""
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(profile: Dict, path: Path = TUNING_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+
+
+def candidate_configs(cpus: int = resource_governor.CPU_COUNT) -> List[Tuple[int, int]]:
+    """(workers, threads per worker) pairs that do not oversubscribe the host."""
+    configs = []
+    for workers in range(1, min(MAX_WORKERS, cpus) + 1):
+        for threads in {cpus // workers, max(1, cpus // (2 * workers))}:
+            if threads >= 1:
+                configs.append((workers, threads))
+    return sorted(set(configs))
+
+
+def find_reference_clip() -> Optional[Path]:
+    """AUTOTUNE_CLIP if set, otherwise the most recently archived recording."""
+    if os.getenv("AUTOTUNE_CLIP"):
+        return Path(os.getenv("AUTOTUNE_CLIP"))
+    archived = [
+        p for p in ARCHIVE_DIR.glob("*/done/*")
+        if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS
+    ]
+    return max(archived, key=lambda p: p.stat().st_mtime) if archived else None
+
+
+def make_reference_clip(source: Path, seconds: float = CLIP_SECONDS) -> Tuple[Path, float]:
+    """Cut the first `seconds` of source into a 16 kHz mono WAV; returns (path, duration)."""
+    fd, clip_path = tempfile.mkstemp(suffix=".wav", prefix="autotune-")
+    os.close(fd)
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", str(source),
+         "-t", str(seconds), "-ac", "1", "-ar", "16000", clip_path],
+        check=True
+    )
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", clip_path],
+        check=True, capture_output=True, text=True
+    )
+    return Path(clip_path), float(probe.stdout.strip())
+
+
+def _round(pool: whisper_pool.WhisperPool, clip: Path, workers: int) -> float:
+    """Transcribe one copy of the clip per worker concurrently; returns the wall-clock seconds."""
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs = [executor.submit(pool.transcribe, clip, None, "urgent") for _ in range(workers)]
+        for job in jobs:
+            job.result()
+    return time.monotonic() - started
+
+
+def measure(clip: Path, clip_seconds: float, workers: int, threads: int, runs: int = RUNS) -> Dict:
+    """Median wall-clock time of `runs` timed rounds, after one untimed warm-up round."""
+    governor = resource_governor.ResourceGovernor(max_threads=threads)
+    pool = whisper_pool.WhisperPool(workers, governor=governor)
+    try:
+        _round(pool, clip, workers)
+        timings = sorted(_round(pool, clip, workers) for _ in range(runs))
+        memory = pool.memory_report()
+    finally:
+        pool.shutdown()
+    elapsed = statistics.median(timings)
+
+    return {
+        "workers": workers,
+        "threads": threads,
+        "seconds": round(elapsed, 2),
+        "runs": [round(t, 2) for t in timings],
+        # Wall-clock seconds per second of audio across all workers (lower is better)
+        "rtf": round(elapsed / (clip_seconds * workers), 4),
+        "total_pss_mb": memory["total_pss_mb"],
+        "total_rss_mb": memory["total_rss_mb"],
+    }
+
+
+def run_autotune(source: Optional[Path] = None) -> Dict:
+    """Measure every candidate configuration and save the fastest that fits."""
+    source = source or find_reference_clip()
+    if not source or not source.exists():
+        raise FileNotFoundError("No reference clip: pass one or set AUTOTUNE_CLIP")
+
+    clip, clip_seconds = make_reference_clip(source)
+    logger.info(f"🎛️  Autotuning with {clip_seconds:.0f}s of {source.name}")
+    results = []
+    try:
+        for workers, threads in candidate_configs():
+            result = measure(clip, clip_seconds, workers, threads)
+            logger.info(
+                f"   {workers} worker(s) x {threads} thread(s): RTF {result['rtf']}, "
+                f"PSS {result['total_pss_mb']} MB"
+            )
+            results.append(result)
+    finally:
+        clip.unlink(missing_ok=True)
+
+    eligible = [r for r in results if not MAX_MEMORY_MB or r["total_pss_mb"] <= MAX_MEMORY_MB]
+    best = min(eligible or results, key=lambda r: r["rtf"])
+    profile = {
+        "workers": best["workers"],
+        "threads": best["threads"],
+        "rtf": best["rtf"],
+        "total_pss_mb": best["total_pss_mb"],
+        "model": whisper_pool.MODEL_NAME,
+        "cpus": resource_governor.CPU_COUNT,
+        "reference_clip": str(source),
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "candidates": results,
+    }
+    save_profile(profile)
+    logger.info(f"✓ Saved tuning profile: {best['workers']} worker(s) x {best['threads']} thread(s)")
+    return profile
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_autotune(Path(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark and fuzz the single-pass Logseq bullet normalizer.
+
+Compares logseq_blocks.normalize (behind summarizer_local._ensure_logseq_format)
+with the previous regex-per-line implementation, kept below as legacy_normalize:
+1. Valid corpus: seeded random summaries in the shapes the LLM is asked for
+   (tab-indented "-" bullets, 2-space numbered/"•◦▪"/plain items, headings,
+   nesting one level at a time). Outputs must be identical.
+2. Fuzz corpus: arbitrary mixes of markers and indents (4 spaces, mixed
+   tabs/spaces, jumps of several levels). Both must not crash; differences
+   are counted, they are where the old depth heuristic guessed wrong.
+3. Timing: best-of-N per-document time of both over the valid corpus.
+
+The corpus is saved to state/bench/normalizer_corpus.json for inspection.
+
+Usage:
+    python bench_normalizer.py [--docs 2000] [--seed 1] [--repeat 5]
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import logseq_blocks
+
+OUTPUT_DIR = Path(__file__).parent / "state" / "bench"
+
+WORDS = ("guard pass armbar meeting budget follow up review kimura sweep "
+         "deadline owner decision grip posture frames timeline").split()
+
+
+def legacy_normalize(text: str) -> str:
+    """The previous _ensure_logseq_format, for comparison."""
+    lines = text.split("\n")
+    output = []
+
+    for line in lines:
+        line = line.rstrip()
+
+        # Skip empty lines
+        if not line.strip():
+            continue
+
+        # If it's a heading (##, ###), keep it as-is
+        if line.strip().startswith("#"):
+            output.append(line)
+            continue
+
+        # Ensure bullet format
+        stripped = line.lstrip()
+
+        # Count leading spaces/tabs for indentation
+        leading = len(line) - len(stripped)
+        indent_level = leading // 2  # Approximate tab level
+
+        # If already a bullet, keep as-is
+        if stripped.startswith("-"):
+            output.append(line)
+        # If starts with number (1., 2.), convert to bullet
+        elif re.match(r"^\d+\.", stripped):
+            bullet_text = re.sub(r"^\d+\.\s*", "", stripped)
+            tabs = "\t" * indent_level if indent_level > 0 else ""
+            output.append(f"{tabs}- {bullet_text}")
+        # If starts with •, ◦, etc., convert to dash
+        elif re.match(r"^[•◦▪]\s", stripped):
+            bullet_text = re.sub(r"^[•◦▪]\s*", "", stripped)
+            tabs = "\t" * indent_level if indent_level > 0 else ""
+            output.append(f"{tabs}- {bullet_text}")
+        # Otherwise, make it a bullet
+        else:
+            tabs = "\t" * indent_level if indent_level > 0 else ""
+            output.append(f"{tabs}- {stripped}")
+
+    return "\n".join(output)
+
+
+def _sentence(rng: random.Random) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+    return text[:1].upper() + text[1:]
+
+
+def valid_document(rng: random.Random) -> str:
+    """A summary in the shapes both implementations agree on."""
+    lines = []
+    level = -1  # No item yet (or just after a heading): next one is top-level
+    for _ in range(rng.randint(1, 40)):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.append(f"{'#' * rng.randint(2, 4)} {_sentence(rng)}")
+            level = -1
+            continue
+        if kind < 0.13:
+            lines.append("")
+            continue
+        level = rng.randint(0, level + 1)
+        marker = rng.random()
+        if marker < 0.5:
+            lines.append("\t" * level + f"- {_sentence(rng)}")
+        elif marker < 0.7:
+            lines.append("  " * level + f"{rng.randint(1, 20)}. {_sentence(rng)}")
+        elif marker < 0.85:
+            lines.append("  " * level + f"{rng.choice('•◦▪')} {_sentence(rng)}")
+        else:
+            lines.append("  " * level + _sentence(rng))
+    return "\n".join(lines)
+
+
+def fuzz_document(rng: random.Random) -> str:
+    """Arbitrary markers, indents and whitespace."""
+    indents = ["", " ", "  ", "   ", "    ", "\t", "\t\t", " \t", "\t  ", "        "]
+    markers = ["- ", "-", "* ", "+ ", "• ", "◦", "▪ ", "1. ", "12) ", "3.", "## ", "#", "---", "", "  "]
+    lines = []
+    for _ in range(rng.randint(0, 30)):
+        text = _sentence(rng) if rng.random() < 0.9 else ""
+        lines.append(rng.choice(indents) + rng.choice(markers) + text + rng.choice(["", " ", "\t"]))
+    return "\n".join(lines)
+
+
+def time_per_doc(functions, documents: List[str], repeat: int) -> List[float]:
+    """Best microseconds per document for each function, passes interleaved."""
+    best = [float("inf")] * len(functions)
+    for _ in range(repeat):
+        for i, function in enumerate(functions):
+            started = time.perf_counter()
+            for document in documents:
+                function(document)
+            best[i] = min(best[i], (time.perf_counter() - started) / len(documents) * 1e6)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz the Logseq bullet normalizer")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    valid = [valid_document(rng) for _ in range(args.docs)]
+    fuzz = [fuzz_document(rng) for _ in range(args.docs)]
+
+    mismatches = [doc for doc in valid if logseq_blocks.normalize(doc) != legacy_normalize(doc)]
+    fuzz_differences = sum(1 for doc in fuzz if logseq_blocks.normalize(doc) != legacy_normalize(doc))
+    # Normalized output is stable, and is a page the block parser round-trips
+    unstable = [
+        doc for doc in valid + fuzz
+        if logseq_blocks.normalize(logseq_blocks.normalize(doc)) != logseq_blocks.normalize(doc)
+        or logseq_blocks.serialize(logseq_blocks.parse(doc, lenient=True)) != logseq_blocks.normalize(doc)
+    ]
+
+    legacy_us, single_pass_us = time_per_doc((legacy_normalize, logseq_blocks.normalize), valid, args.repeat)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    corpus_path = OUTPUT_DIR / "normalizer_corpus.json"
+    corpus_path.write_text(json.dumps({"seed": args.seed, "valid": valid, "fuzz": fuzz}, indent=1), encoding="utf-8")
+
+    lines = sum(doc.count("\n") + 1 for doc in valid)
+    print(f"Valid corpus: {len(valid)} docs, {lines} lines; identical output: {len(valid) - len(mismatches)}/{len(valid)}")
+    print(f"Fuzz corpus: {len(fuzz)} docs; differ from legacy: {fuzz_differences} (depth/marker fixes)")
+    print(f"Unstable (not idempotent / not round-tripped): {len(unstable)}")
+    print(f"legacy      {legacy_us:8.1f} µs/doc")
+    print(f"single-pass {single_pass_us:8.1f} µs/doc  ({legacy_us / single_pass_us:.1f}x)")
+    print(f"Corpus saved to {corpus_path}")
+
+    if mismatches or unstable:
+        sample = (mismatches or unstable)[0]
+        print(f"\nFirst failing document:\n{sample!r}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
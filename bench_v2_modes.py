@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark staged vs fused execution of the v2 multi-stage summarizers.
+
+Runs both modes over the same transcript (response cache disabled so every
+run calls the model), then compares wall-clock latency, prompt/completion/
+cached tokens from llm_usage, and the output itself: per-section length,
+bullet counts and text similarity between the modes. Rendered pages are
+saved to state/bench/ for side-by-side review.
+
+Usage:
+    python bench_v2_modes.py transcript.txt [--summarizer revised|multistage] [--runs N] [--type bjj]
+"""
+
+import os
+import re
+import sys
+import time
+import json
+import difflib
+import argparse
+from pathlib import Path
+from statistics import median
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import type_manager
+import llm_usage
+import summarizer_v2_revised
+import summarizer_v2_multistage
+
+SUMMARIZERS = {"revised": summarizer_v2_revised, "multistage": summarizer_v2_multistage}
+OUTPUT_DIR = Path(__file__).parent / "state" / "bench"
+
+
+def run_mode(module, mode: str, transcript: str, config: Dict, run: int) -> Dict:
+    """One summarization in the given mode; returns timings, usage and sections."""
+    job_id = f"bench-{module.__name__}-{mode}-{run}-{int(time.time())}"
+    os.environ["LLM_JOB_ID"] = job_id
+    llm_usage.begin_job(config["type"], transcript)
+
+    started = time.monotonic()
+    if mode == "fused":
+        # No silent fallback here: a failed fused run should show up as one
+        sections = module.extract_fused(transcript, config)
+    else:
+        sections = module.extract_staged(transcript, config)
+    elapsed = time.monotonic() - started
+
+    usage = llm_usage.get_ledger().job_usage(job_id)["total"]
+    return {"seconds": elapsed, "usage": usage, "sections": sections}
+
+
+def section_stats(text: str) -> Dict:
+    lines = [line for line in text.splitlines() if line.strip()]
+    return {
+        "chars": len(text),
+        "bullets": sum(1 for line in lines if re.match(r"\s*(-|\*|\d+\.)\s", line)),
+    }
+
+
+def compare_sections(staged: Dict[str, str], fused: Dict[str, str]) -> Dict:
+    """Per-section shape of both outputs and how similar their text is."""
+    comparison = {}
+    for section in staged:
+        a, b = staged[section], fused.get(section, "")
+        comparison[section] = {
+            "staged": section_stats(a),
+            "fused": section_stats(b),
+            "similarity": round(difflib.SequenceMatcher(None, a, b).ratio(), 3),
+        }
+    return comparison
+
+
+def summarize_runs(runs) -> Dict:
+    return {
+        "median_s": round(median(r["seconds"] for r in runs), 2),
+        "max_s": round(max(r["seconds"] for r in runs), 2),
+        "calls": runs[0]["usage"]["calls"],
+        "prompt_tokens": round(median(r["usage"]["prompt_tokens"] for r in runs)),
+        "completion_tokens": round(median(r["usage"]["completion_tokens"] for r in runs)),
+        "cached_tokens": round(median(r["usage"]["cached_tokens"] for r in runs)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare staged and fused v2 summarizer modes")
+    parser.add_argument("transcript", type=Path)
+    parser.add_argument("--summarizer", choices=sorted(SUMMARIZERS), default="revised")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--type", default="bjj")
+    args = parser.parse_args()
+
+    module = SUMMARIZERS[args.summarizer]
+    transcript = args.transcript.read_text(encoding="utf-8").strip()
+    config = type_manager.load_config(args.type)
+    # Every run must reach the model
+    config["llm"] = {**type_manager.get_llm_settings(config), "cache": False}
+
+    results = {"staged": [], "fused": []}
+    for run in range(args.runs):
+        # Alternate the order so neither mode always gets the warm connection/prefix
+        for mode in (("staged", "fused") if run % 2 == 0 else ("fused", "staged")):
+            print(f"▶️  {args.summarizer} {mode} run {run + 1}/{args.runs}", file=sys.stderr)
+            results[mode].append(run_mode(module, mode, transcript, config, run))
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    for mode, runs in results.items():
+        page = module.render(runs[0]["sections"], transcript, args.transcript.name)
+        (OUTPUT_DIR / f"{args.summarizer}-{mode}.md").write_text(page, encoding="utf-8")
+
+    report = {
+        "summarizer": args.summarizer,
+        "transcript_tokens": llm_usage.count_tokens(transcript),
+        "runs": args.runs,
+        "staged": summarize_runs(results["staged"]),
+        "fused": summarize_runs(results["fused"]),
+        "sections": compare_sections(results["staged"][0]["sections"], results["fused"][0]["sections"]),
+    }
+    (OUTPUT_DIR / f"{args.summarizer}-report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"\n{args.summarizer}: {report['transcript_tokens']} transcript tokens, {args.runs} run(s) per mode")
+    print(f"{'mode':<8} {'median s':>9} {'max s':>7} {'calls':>6} {'prompt':>8} {'cached':>8} {'completion':>11}")
+    for mode in ("staged", "fused"):
+        r = report[mode]
+        print(f"{mode:<8} {r['median_s']:>9} {r['max_s']:>7} {r['calls']:>6} {r['prompt_tokens']:>8} "
+              f"{r['cached_tokens']:>8} {r['completion_tokens']:>11}")
+    print(f"\n{'section':<20} {'staged chars/bullets':>21} {'fused chars/bullets':>20} {'similarity':>11}")
+    for section, c in report["sections"].items():
+        print(f"{section:<20} {c['staged']['chars']:>14}/{c['staged']['bullets']:<6} "
+              f"{c['fused']['chars']:>13}/{c['fused']['bullets']:<6} {c['similarity']:>11}")
+    print(f"\nPages and report saved to {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
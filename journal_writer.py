@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Journal Writer: Append page links to Logseq daily journals.
+
+Links are appended with O_APPEND under an advisory lock (fcntl.flock) instead
+of reading and rewriting the whole journal, so a write is O(links) and cannot
+clobber an edit Logseq or another worker made in the meantime. Each day's
+existing links are read once into an in-memory index used for deduplication,
+and links from notes that finish close together are coalesced into a single
+write per flush interval.
+"""
+
+import os
+import re
+import fcntl
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "2"))
+
+LINK_LINE = re.compile(r"^\s*-\s+\[\[(.+?)\]\]\s*$", re.MULTILINE)
+
+
+class JournalWriter:
+    """Batched, lock-protected appends of page links to daily journals."""
+
+    def __init__(self, journals_dir: Path, flush_interval: float = FLUSH_INTERVAL):
+        self.journals_dir = Path(journals_dir)
+        self.flush_interval = flush_interval
+        self._index: Dict[str, Set[str]] = {}
+        self._pending: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the flusher and write anything still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _journal_path(self, day: str) -> Path:
+        return self.journals_dir / f"{day}.md"
+
+    def _links(self, day: str) -> Set[str]:
+        """Links already in a day's journal (read once per day, caller holds _lock)."""
+        if day not in self._index:
+            path = self._journal_path(day)
+            try:
+                text = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                text = ""
+            self._index[day] = set(LINK_LINE.findall(text))
+            # Only today's and recent journals get links; keep the index small
+            for old in sorted(self._index)[:-7]:
+                del self._index[old]
+        return self._index[day]
+
+    def add_link(self, page_stem: str, day: Optional[str] = None):
+        """Queue a [[page]] link for a day's journal (today by default) unless it is there."""
+        day = day or datetime.now().strftime("%Y_%m_%d")
+        with self._lock:
+            links = self._links(day)
+            if page_stem in links:
+                return
+            links.add(page_stem)
+            self._pending.setdefault(day, []).append(page_stem)
+        if self._thread is None:
+            # Not running as a service: write straight away
+            self.flush()
+        else:
+            self._wake.set()
+
+    def flush(self):
+        """Append every pending link, one write per journal."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for day, stems in pending.items():
+            try:
+                self._append(self._journal_path(day), "".join(f"- [[{stem}]]\n" for stem in stems))
+                logger.debug(f"Journal {day}: +{len(stems)} link(s)")
+            except OSError as e:
+                logger.error(f"Journal write failed ({day}): {e}")
+                with self._lock:
+                    # Retry on the next flush
+                    self._pending.setdefault(day, [])[:0] = stems
+
+    def _append(self, path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                size = os.fstat(fd).st_size
+                # Start on a new line if the journal does not end with one
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    text = "\n" + text
+                os.write(fd, text.encode("utf-8"))
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            # Coalesce links from notes finishing within the interval
+            self._stop.wait(self.flush_interval)
+            self.flush()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+LLM Backend: Where chat completions are sent and with which model.
+
+Two backends speak the same OpenAI chat-completions protocol:
+- openai: the hosted API (OPENAI_API_KEY)
+- local:  any OpenAI-compatible server on the LAN/host, e.g. llama.cpp
+          server, vLLM-CPU or Ollama (LLM_LOCAL_BASE_URL, LLM_LOCAL_MODEL)
+
+Each backend keeps one client per process with a pooled, keep-alive HTTP
+connection, so the several calls a multi-stage summarizer makes reuse the
+same connection. Type configs route per type (and per stage):
+
+    "llm": {
+        "backend": "local",
+        "model": "qwen2.5:7b-instruct",
+        "stage_models": {"overview": "gpt-4o-mini"},
+        "routes": [
+            {"max_input_tokens": 3000, "model": "gpt-4o-mini", "max_tokens": 1200},
+            {"model": "gpt-4o", "max_tokens_scale": 1.5}
+        ]
+    }
+
+Routes pick the model and output budget from the transcript's token count:
+the first rule whose max_input_tokens covers the transcript (or that has no
+limit) applies. "max_tokens" replaces a call's output budget and
+"max_tokens_scale" scales it.
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import type_manager
+
+DEFAULT_BACKEND = os.getenv("LLM_BACKEND", "openai")
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+# Connection pool per backend
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "120"))
+
+BACKENDS = {
+    "openai": {
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "model": None,
+        "rate_limited": True,
+        "stream_usage": True,
+        "extra_body": None,
+    },
+    "local": {
+        "base_url": os.getenv("LLM_LOCAL_BASE_URL", "http://localhost:8080/v1"),
+        # Local servers ignore the key but the client requires one
+        "api_key": os.getenv("LLM_LOCAL_API_KEY", "local"),
+        "model": os.getenv("LLM_LOCAL_MODEL") or None,
+        "rate_limited": False,
+        "stream_usage": os.getenv("LLM_LOCAL_STREAM_USAGE", "0") == "1",
+        # llama.cpp server: keep the KV cache of the shared prompt prefix between calls
+        "extra_body": {"cache_prompt": True} if os.getenv("LLM_LOCAL_CACHE_PROMPT", "1") == "1" else None,
+    },
+}
+
+
+class Backend:
+    """A named OpenAI-compatible endpoint with a lazily created pooled client."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        rate_limited: bool = True,
+        stream_usage: bool = True,
+        extra_body: Optional[Dict] = None
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.rate_limited = rate_limited
+        self.stream_usage = stream_usage
+        self.extra_body = extra_body
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI client over a keep-alive connection pool."""
+        with self._lock:
+            if self._client is None:
+                import httpx
+                from openai import OpenAI
+
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_SECONDS
+                    ),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+                # Retries are handled by the scheduler so they respect the shared budget
+                self._client = OpenAI(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    http_client=http_client,
+                    max_retries=0
+                )
+            return self._client
+
+
+_backends: Dict[str, Backend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str = DEFAULT_BACKEND) -> Backend:
+    """Backend by name (one instance, and so one connection pool, per process)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {list(BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = Backend(name, **BACKENDS[name])
+        return _backends[name]
+
+
+def length_rule(config: Optional[Dict], input_tokens: Optional[int]) -> Dict:
+    """First routing rule that covers a transcript of input_tokens ({} if none)."""
+    if input_tokens is None:
+        return {}
+    for rule in type_manager.get_llm_settings(config or {}).get("routes", []):
+        if input_tokens <= rule.get("max_input_tokens", float("inf")):
+            return rule
+    return {}
+
+
+def output_budget(rule: Dict, max_tokens: Optional[int]) -> Optional[int]:
+    """A call's max_tokens after applying a routing rule."""
+    if "max_tokens" in rule:
+        return rule["max_tokens"]
+    if max_tokens and "max_tokens_scale" in rule:
+        return int(max_tokens * rule["max_tokens_scale"])
+    return max_tokens
+
+
+def route(
+    config: Optional[Dict],
+    stage: str,
+    default_model: Optional[str] = None,
+    rule: Optional[Dict] = None
+) -> Tuple[Backend, str]:
+    """
+    Pick backend and model for a call.
+    Model precedence: stage_models[stage] > length rule > type model >
+    backend model > caller default.
+    """
+    settings = type_manager.get_llm_settings(config or {})
+    backend = get_backend(settings.get("backend", DEFAULT_BACKEND))
+    model = (
+        settings.get("stage_models", {}).get(stage)
+        or (rule or {}).get("model")
+        or settings.get("model")
+        or backend.model
+        or default_model
+        or DEFAULT_MODEL
+    )
+    return backend, model
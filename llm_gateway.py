@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway: Single entry point for the chat completions the summarizers make.
+
+Every summarizer goes through chat() (or cached_call() for clients it does
+not own) so cross-cutting behaviour lives in one place:
+- Responses are served from the on-disk response cache when an identical
+  request was made before, unless the note type opts out with
+  "llm": {"cache": false}.
+- Requests are admitted by the shared rate-limit scheduler and transient
+  errors are retried with backoff before anyone falls back.
+- Backend (hosted or local OpenAI-compatible server), model and output
+  budget are routed per type/stage/transcript length by llm_backend.
+- Tokens and latency are recorded per job/stage/type, and non-urgent types
+  are throttled once the daily token budget is spent (llm_usage).
+- Optionally, a request with no first token by the running p95 TTFT is
+  hedged with a duplicate and the first to respond wins (llm_hedge).
+- Completions are streamed. Tokens can be forwarded to the caller as they
+  arrive, the timeout is inactivity-based (no bytes for N seconds) with an
+  overall deadline scaled to max_tokens, and a stream that is cut off part
+  way raises PartialResponse carrying the text received so far.
+"""
+
+import os
+import sys
+import time
+import itertools
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import type_manager
+import response_cache
+import llm_scheduler
+import llm_backend
+import llm_hedge
+import llm_usage
+
+# Global switch, e.g. LLM_CACHE=0 to force fresh responses
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+
+# Streaming timeouts: max silence between chunks, and an overall deadline of
+# DEADLINE_BASE + max_tokens / MIN_TOKENS_PER_SECOND
+INACTIVITY_TIMEOUT = float(os.getenv("LLM_INACTIVITY_TIMEOUT", "30"))
+DEADLINE_BASE = float(os.getenv("LLM_DEADLINE_BASE", "30"))
+MIN_TOKENS_PER_SECOND = float(os.getenv("LLM_MIN_TOKENS_PER_SEC", "10"))
+
+
+class PartialResponse(Exception):
+    """A streamed completion was cut off; `text` holds what arrived."""
+
+    def __init__(self, text: str, reason: str):
+        super().__init__(f"stream cut off after {len(text)} chars: {reason}")
+        self.text = text
+        self.reason = reason
+
+
+_cache = None
+_scheduler = None
+
+
+def get_scheduler() -> llm_scheduler.LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = llm_scheduler.LLMScheduler()
+    return _scheduler
+
+
+def get_cache() -> response_cache.ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = response_cache.ResponseCache()
+    return _cache
+
+
+def _note_type(config: Optional[Dict]) -> str:
+    return (config or {}).get("type", "unknown")
+
+
+def cache_enabled(config: Optional[Dict] = None) -> bool:
+    """Whether responses for this type may be served from / stored in the cache."""
+    return CACHE_ENABLED and type_manager.get_llm_settings(config or {}).get("cache", True)
+
+
+def cached_call(
+    call: Callable[[], str],
+    model: str,
+    messages: List[Dict],
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    config: Optional[Dict] = None,
+    stage: str = "summary",
+    extra: Optional[Dict] = None
+) -> str:
+    """
+    Run `call` (which must make exactly the described request and return the
+    response text) unless an identical request is already cached.
+    """
+    if not cache_enabled(config):
+        return call()
+
+    cache = get_cache()
+    key = response_cache.make_key(model, messages, temperature, max_tokens, extra)
+    cached = cache.get(key, _note_type(config))
+    if cached is not None:
+        print(f"💾 Cache hit ({stage})", file=sys.stderr)
+        llm_usage.get_ledger().record(
+            llm_usage.current_job().job_id, _note_type(config), stage, model, 0, 0, 0.0, cache_hit=True
+        )
+        return cached
+
+    content = call()
+    if content:
+        cache.put(key, content, model)
+    return content
+
+
+def hedging_enabled(config: Optional[Dict] = None) -> bool:
+    """Whether slow requests of this type may be hedged."""
+    return type_manager.get_llm_settings(config or {}).get("hedge", llm_hedge.HEDGE_ENABLED)
+
+
+def prefix_messages(system: str, transcript: str, task: str) -> List[Dict]:
+    """
+    Messages for one of several calls over the same transcript. Everything
+    before `task` is byte-identical between the calls, so provider prefix
+    caching and a local server's KV cache can skip re-processing it.
+    """
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"Transcript:\n{transcript}\n\n---\n\n{task}"},
+    ]
+
+
+def stream_deadline(max_tokens: Optional[int]) -> float:
+    """Seconds a completion of up to max_tokens may take in total."""
+    return DEADLINE_BASE + (max_tokens or 1000) / MIN_TOKENS_PER_SECOND
+
+
+def _open_stream(backend: llm_backend.Backend, params: Dict, opened: Optional[Callable] = None):
+    """
+    Create a streamed completion and read up to its first token. Returns
+    (stream, chunks). opened(stream) is called as soon as the request is open
+    (so a hedge race can close it before its first token).
+    """
+    stream = backend.client.chat.completions.create(
+        **params,
+        stream=True,
+        timeout=INACTIVITY_TIMEOUT
+    )
+    if opened:
+        opened(stream)
+    chunks = []
+    for chunk in stream:
+        chunks.append(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            break
+    return stream, chunks
+
+
+def _consume_stream(
+    backend: llm_backend.Backend,
+    params: Dict,
+    on_token: Optional[Callable[[str], None]],
+    hedge: Optional[llm_hedge.Hedge] = None
+):
+    """
+    Create a streamed completion and collect it. Returns (text, usage).
+    Errors before the first token propagate (so the scheduler can retry);
+    after it they become PartialResponse.
+    """
+    deadline = time.monotonic() + stream_deadline(params.get("max_tokens"))
+    if backend.stream_usage:
+        params = {**params, "stream_options": {"include_usage": True}}
+    if backend.extra_body:
+        params = {**params, "extra_body": backend.extra_body}
+    if hedge:
+        stream, chunks = hedge.race(lambda opened: _open_stream(backend, params, opened), close=lambda s: s.close())
+    else:
+        stream, chunks = _open_stream(backend, params)
+
+    parts = []
+    usage = None
+    try:
+        for chunk in itertools.chain(chunks, stream):
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                token = chunk.choices[0].delta.content
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+            if time.monotonic() > deadline:
+                stream.close()
+                raise PartialResponse("".join(parts), "deadline exceeded")
+    except PartialResponse:
+        raise
+    except Exception as e:
+        if not parts:
+            raise
+        raise PartialResponse("".join(parts), f"{type(e).__name__}: {e}") from e
+    return "".join(parts), usage
+
+
+def chat(
+    messages: List[Dict],
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    config: Optional[Dict] = None,
+    stage: str = "summary",
+    on_token: Optional[Callable[[str], None]] = None,
+    response_format: Optional[Dict] = None
+) -> str:
+    """
+    Chat completion through the gateway; returns the response text.
+    `model` is the caller's default; the type config can route elsewhere.
+    `on_token` is called with each streamed chunk of text as it arrives.
+    `response_format` constrains the output (e.g. a strict JSON schema).
+    Raises PartialResponse if the stream is cut off after it started, and
+    llm_usage.BudgetExceeded if the daily budget refuses this type.
+    """
+    job = llm_usage.current_job()
+    rule = llm_backend.length_rule(config, job.transcript_tokens)
+    backend, model = llm_backend.route(config, stage, model, rule)
+    max_tokens = llm_backend.output_budget(rule, max_tokens)
+    params = {"model": model, "messages": messages}
+    if temperature is not None:
+        params["temperature"] = temperature
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    if response_format is not None:
+        params["response_format"] = response_format
+
+    def call() -> str:
+        ledger = llm_usage.get_ledger()
+        ledger.guard(_note_type(config), type_manager.get_priority(config or {}))
+        started = time.monotonic()
+        scheduler = get_scheduler()
+        prompt_text = "".join(m.get("content") or "" for m in messages)
+        estimated = llm_scheduler.estimate_tokens(prompt_text) + (max_tokens or 1000)
+        hedges = []
+
+        def attempt():
+            hedge = None
+            if hedging_enabled(config):
+                # A hedge is an extra request, so it must fit the shared budget too
+                may_hedge = (lambda: scheduler.try_acquire(estimated)) if backend.rate_limited else None
+                hedge = llm_hedge.Hedge(
+                    llm_hedge.get_stats(), _note_type(config), f"{backend.name}:{model}", may_hedge
+                )
+                hedges.append(hedge)
+            return _consume_stream(backend, params, on_token, hedge)
+
+        def settle_hedges(usage=None):
+            # Each duplicate was billed for the prompt (it is closed at or before its
+            # first token): return the rest of its budget and count it against the job
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or llm_usage.count_tokens(prompt_text, model)
+            for hedge in hedges:
+                if not hedge.fired:
+                    continue
+                if backend.rate_limited:
+                    scheduler.settle(estimated, prompt_tokens)
+                ledger.record(
+                    job.job_id, _note_type(config), f"{stage}_hedge", f"{backend.name}:{model}",
+                    prompt_tokens, 0, time.monotonic() - started
+                )
+
+        def record(text: str, usage=None):
+            # Backends that do not report usage (and cut-off streams) are counted locally
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or llm_usage.count_tokens(prompt_text, model)
+            completion_tokens = getattr(usage, "completion_tokens", None) or llm_usage.count_tokens(text, model)
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) or 0
+            if cached_tokens:
+                print(f"♻️  Prompt prefix cache ({stage}): {cached_tokens}/{prompt_tokens} tokens",
+                      file=sys.stderr)
+            ledger.record(
+                job.job_id, _note_type(config), stage, f"{backend.name}:{model}",
+                prompt_tokens, completion_tokens, time.monotonic() - started,
+                cached_tokens=cached_tokens
+            )
+
+        try:
+            text, usage = scheduler.run(
+                attempt,
+                tokens=estimated,
+                note_type=_note_type(config),
+                limited=backend.rate_limited
+            )
+        except PartialResponse as e:
+            record(e.text)
+            settle_hedges()
+            raise
+        except Exception:
+            settle_hedges()
+            raise
+        scheduler.settle(estimated, getattr(usage, "total_tokens", 0))
+        record(text, usage)
+        settle_hedges(usage)
+        return text
+
+    extra = {"response_format": response_format} if response_format else None
+    return cached_call(call, f"{backend.name}:{model}", messages, temperature, max_tokens, config, stage, extra)
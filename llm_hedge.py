@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+LLM Hedge: Duplicate slow LLM requests to cut tail latency.
+
+Summary latency at p99 is dominated by the occasional completion that takes
+far longer than usual to produce its first token. When hedging is enabled
+(LLM_HEDGE=1, or per type with "llm": {"hedge": true}) and a request has not
+produced a token by the running p95 time-to-first-token for its model, a
+duplicate is fired. Whichever produces a token first wins; the other is
+closed the moment the winner is chosen (even while it is still waiting for
+its first token), which drops its connection so the server stops generating.
+
+Hedges are capped at LLM_HEDGE_MAX_EXTRA (a fraction of requests over the
+last LLM_HEDGE_WINDOW_HOURS) and also need room in the shared rate-limit
+budget; the gateway settles that budget and records the duplicate's tokens
+in llm_usage. TTFT samples, hedge rate and hedge wins are kept per type in
+SQLite, shared by the summarizer subprocesses.
+
+Usage:
+    python llm_hedge.py stats
+"""
+
+import os
+import sys
+import math
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+DB_PATH = Path(os.getenv("LLM_HEDGE_PATH") or Path(__file__).parent / "state" / "llm_hedge.sqlite")
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0") == "1"
+MAX_EXTRA = float(os.getenv("LLM_HEDGE_MAX_EXTRA", "0.05"))
+WINDOW_HOURS = float(os.getenv("LLM_HEDGE_WINDOW_HOURS", "24"))
+
+PERCENTILE = 95
+MIN_SAMPLES = 20      # No hedging until p95 is meaningful
+SAMPLES = 200         # Most recent TTFTs per model used for p95
+RETENTION_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    ts REAL,
+    note_type TEXT,
+    model TEXT,
+    ttft REAL,
+    hedged INTEGER DEFAULT 0,
+    hedge_won INTEGER DEFAULT 0,
+    saved REAL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS calls_model ON calls (model, id);
+CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts);
+"""
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class HedgeStats:
+    """Persisted TTFT samples and hedge outcomes."""
+
+    def __init__(self, path: Path = DB_PATH, max_extra: float = MAX_EXTRA):
+        self.path = Path(path)
+        self.max_extra = max_extra
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def threshold(self, model: str) -> Optional[float]:
+        """Running p95 TTFT for a model (None until there are enough samples)."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT ttft FROM calls WHERE model = ? ORDER BY id DESC LIMIT ?", (model, SAMPLES)
+            ).fetchall()
+        if len(rows) < MIN_SAMPLES:
+            return None
+        return percentile([r[0] for r in rows], PERCENTILE)
+
+    def within_budget(self) -> bool:
+        """Whether one more hedge keeps hedges within max_extra of requests."""
+        with self._connect() as db:
+            requests, hedges = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hedged), 0) FROM calls WHERE ts > ?",
+                (time.time() - WINDOW_HOURS * 3600,)
+            ).fetchone()
+        # Count the request being hedged, which is not recorded yet
+        return hedges + 1 <= self.max_extra * (requests + 1)
+
+    def record(self, note_type: str, model: str, ttft: float, hedged: bool, hedge_won: bool) -> int:
+        """Record one request; returns its id (for record_saving)."""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO calls (ts, note_type, model, ttft, hedged, hedge_won) VALUES (?, ?, ?, ?, ?, ?)",
+                (now, note_type, model, ttft, int(hedged), int(hedge_won))
+            )
+            db.execute("DELETE FROM calls WHERE ts < ?", (now - RETENTION_DAYS * 86400,))
+            return cursor.lastrowid
+
+    def report(self) -> Dict:
+        """Per-type request count, hedge rate, hedge wins and p95 TTFT."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT note_type, COUNT(*), SUM(hedged), SUM(hedge_won) "
+                "FROM calls GROUP BY note_type"
+            ).fetchall()
+            ttfts = {}
+            for note_type, ttft in db.execute("SELECT note_type, ttft FROM calls"):
+                ttfts.setdefault(note_type, []).append(ttft)
+        return {
+            note_type: {
+                "requests": requests,
+                "hedged": hedged,
+                "hedge_rate": round(hedged / requests, 4) if requests else 0,
+                "hedge_wins": wins,
+                "p95_ttft_s": round(percentile(ttfts.get(note_type), PERCENTILE) or 0, 2),
+            }
+            for note_type, requests, hedged, wins in rows
+        }
+
+
+class Hedge:
+    """
+    Hedging policy for one logical request.
+    `may_hedge` is consulted right before a duplicate is fired (e.g. to take
+    room in the rate-limit budget) and can veto it.
+    """
+
+    def __init__(
+        self,
+        stats: HedgeStats,
+        note_type: str,
+        model: str,
+        may_hedge: Optional[Callable[[], bool]] = None
+    ):
+        self.stats = stats
+        self.note_type = note_type
+        self.model = model
+        self.may_hedge = may_hedge or (lambda: True)
+        self.delay = stats.threshold(model)
+        # Set by race(): whether a duplicate was sent (and so took budget)
+        self.fired = False
+
+    def race(self, start: Callable[[Callable], Tuple], close: Callable[[object], None]) -> Tuple:
+        """
+        Run start(opened) (which returns once the first token has arrived)
+        and, if it is slower than p95, a duplicate. start calls opened(handle)
+        as soon as its request is open; once a winner is chosen, the other
+        attempt's handle is passed to close() right away, or as soon as it
+        opens. Returns the winner's result; raises if every attempt failed.
+        """
+        results = queue.Queue()
+        lock = threading.Lock()
+        state = {"winner": None}
+        handles = {}
+        started = time.monotonic()
+
+        def attempt(label: str):
+            def opened(handle):
+                with lock:
+                    handles[label] = handle
+                    lost = state["winner"] not in (None, label)
+                if lost:
+                    close(handle)
+
+            try:
+                result, error = start(opened), None
+            except Exception as e:
+                result, error = None, e
+            ttft = time.monotonic() - started
+            with lock:
+                if state["winner"] is None:
+                    results.put((label, result, error, ttft))
+                    return
+                handle = handles.get(label)
+            if handle is not None:
+                # Lost while reading its first token (usually already closed)
+                close(handle)
+
+        def launch(label: str):
+            threading.Thread(target=attempt, args=(label,), daemon=True).start()
+
+        launch("primary")
+        pending = 1
+        waited = False
+        error = None
+        while True:
+            try:
+                timeout = None if waited or self.delay is None else max(0.0, self.delay - (time.monotonic() - started))
+                label, result, failed, ttft = results.get(timeout=timeout)
+            except queue.Empty:
+                waited = True
+                if self.stats.within_budget() and self.may_hedge():
+                    print(f"🐢 No token after {self.delay:.1f}s (p95), hedging request",
+                          file=sys.stderr, flush=True)
+                    launch("hedge")
+                    pending += 1
+                    self.fired = True
+                continue
+            pending -= 1
+            if failed is not None:
+                error = error or failed
+                if pending:
+                    continue
+                raise error
+            with lock:
+                state["winner"] = label
+                losers = [handle for other, handle in handles.items() if other != label]
+            break
+
+        # Stop the other attempt now rather than when its first token arrives
+        for handle in losers:
+            close(handle)
+
+        self.stats.record(
+            self.note_type, self.model, ttft, hedged=self.fired, hedge_won=label == "hedge"
+        )
+        if label == "hedge":
+            print(f"🐇 Hedge won ({ttft:.1f}s to first token)", file=sys.stderr, flush=True)
+        return result
+
+
+_stats = None
+
+
+def get_stats() -> HedgeStats:
+    global _stats
+    if _stats is None:
+        _stats = HedgeStats()
+    return _stats
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command != "stats":
+        print("Usage: python llm_hedge.py stats", file=sys.stderr)
+        sys.exit(1)
+    print(f"Hedging {'on' if HEDGE_ENABLED else 'off by default'}, "
+          f"capped at {MAX_EXTRA:.0%} extra requests per {WINDOW_HOURS:.0f}h")
+    for note_type, stats in sorted(get_stats().report().items()):
+        print(f"  {note_type}: {stats['requests']} requests, p95 TTFT {stats['p95_ttft_s']}s, "
+              f"hedged {stats['hedge_rate']:.1%} ({stats['hedge_wins']} won)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+LLM Scheduler: Rate-limit-aware admission and retries for LLM requests.
+
+Requests-per-minute and tokens-per-minute budgets are enforced with token
+buckets stored in SQLite, so every summarizer subprocess shares the same
+budget and a burst of queued notes drains at the maximum allowed rate
+instead of tripping 429s. Transient failures (429, timeouts, connection
+errors, 5xx) are retried with jittered exponential backoff, honouring
+Retry-After. Time spent waiting for budget is recorded per note type.
+
+Usage:
+    python llm_scheduler.py stats
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+DB_PATH = Path(os.getenv("LLM_SCHEDULER_PATH") or Path(__file__).parent / "state" / "llm_scheduler.sqlite")
+
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_RPM", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TPM", "200000"))
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+TRANSIENT_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    level REAL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS waits (
+    note_type TEXT PRIMARY KEY,
+    requests INTEGER DEFAULT 0,
+    retries INTEGER DEFAULT 0,
+    total_wait REAL DEFAULT 0,
+    max_wait REAL DEFAULT 0
+);
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an API error is worth retrying."""
+    if type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    return getattr(error, "status_code", None) in TRANSIENT_STATUS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, if it said."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMScheduler:
+    """Token-bucket admission control shared by all processes on the host."""
+
+    def __init__(
+        self,
+        path: Path = DB_PATH,
+        rpm: float = REQUESTS_PER_MINUTE,
+        tpm: float = TOKENS_PER_MINUTE
+    ):
+        self.path = Path(path)
+        self.capacity = {"requests": rpm, "tokens": tpm}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _levels(self, db, now: float) -> Dict[str, float]:
+        """Refill both buckets up to now (caller holds the write lock)."""
+        levels = {}
+        for name, capacity in self.capacity.items():
+            row = db.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            level, updated = row if row else (capacity, now)
+            levels[name] = min(capacity, level + (now - updated) * capacity / 60)
+        return levels
+
+    def _store(self, db, levels: Dict[str, float], now: float):
+        for name, level in levels.items():
+            db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, level, now))
+
+    def acquire(self, tokens: int) -> float:
+        """Block until the request fits both budgets; returns seconds waited."""
+        # A request larger than the whole budget only has to wait for a full bucket
+        tokens = min(tokens, self.capacity["tokens"])
+        started = time.monotonic()
+        while True:
+            with self._connect() as db:
+                db.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                levels = self._levels(db, now)
+                if levels["requests"] >= 1 and levels["tokens"] >= tokens:
+                    levels["requests"] -= 1
+                    levels["tokens"] -= tokens
+                    self._store(db, levels, now)
+                    db.execute("COMMIT")
+                    return time.monotonic() - started
+                db.execute("COMMIT")
+
+            wait = max(
+                (1 - levels["requests"]) * 60 / self.capacity["requests"],
+                (tokens - levels["tokens"]) * 60 / self.capacity["tokens"]
+            )
+            if wait >= 1:
+                # Also tells the service watchdog we are alive, just queued
+                print(f"⏳ Waiting {wait:.1f}s for LLM rate limit budget", file=sys.stderr, flush=True)
+            time.sleep(max(0.05, wait))
+
+    def try_acquire(self, tokens: int) -> bool:
+        """Take budget for a request only if it is available right now."""
+        tokens = min(tokens, self.capacity["tokens"])
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._levels(db, now)
+            admitted = levels["requests"] >= 1 and levels["tokens"] >= tokens
+            if admitted:
+                levels["requests"] -= 1
+                levels["tokens"] -= tokens
+                self._store(db, levels, now)
+            db.execute("COMMIT")
+        return admitted
+
+    def settle(self, estimated: int, actual: int):
+        """Return over-estimated tokens to the bucket (or charge the shortfall)."""
+        if not actual or actual == estimated:
+            return
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._levels(db, now)
+            levels["tokens"] = min(self.capacity["tokens"], levels["tokens"] + estimated - actual)
+            self._store(db, levels, now)
+            db.execute("COMMIT")
+
+    def _record(self, note_type: str, waited: float, retries: int):
+        with self._connect() as db:
+            db.execute("INSERT OR IGNORE INTO waits (note_type) VALUES (?)", (note_type,))
+            db.execute(
+                "UPDATE waits SET requests = requests + 1, retries = retries + ?, "
+                "total_wait = total_wait + ?, max_wait = MAX(max_wait, ?) WHERE note_type = ?",
+                (retries, waited, waited, note_type)
+            )
+
+    def run(self, request: Callable, tokens: int, note_type: str = "unknown", limited: bool = True):
+        """
+        Call `request()` within budget, retrying transient errors.
+        Returns whatever request() returns; re-raises once retries run out.
+        `limited=False` skips the budget (e.g. a local backend) but still retries.
+        """
+        waited = 0.0
+        attempt = 0
+        try:
+            while True:
+                if limited:
+                    waited += self.acquire(tokens)
+                try:
+                    return request()
+                except Exception as e:
+                    if not is_transient(e) or attempt >= MAX_RETRIES:
+                        raise
+                    delay = retry_after(e) or backoff_delay(attempt)
+                    print(f"⏳ {type(e).__name__}, retrying in {delay:.1f}s "
+                          f"({attempt + 1}/{MAX_RETRIES})", file=sys.stderr)
+                    time.sleep(delay)
+                    waited += delay
+                    attempt += 1
+        finally:
+            if waited >= 1:
+                print(f"⏳ Waited {waited:.1f}s for LLM rate limits", file=sys.stderr)
+            self._record(note_type, waited, attempt)
+
+    def stats(self) -> Dict:
+        """Per-type request counts, retries and queue wait times."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT note_type, requests, retries, total_wait, max_wait FROM waits"
+            ).fetchall()
+        return {
+            note_type: {
+                "requests": requests,
+                "retries": retries,
+                "avg_wait_s": round(total_wait / requests, 2) if requests else 0,
+                "max_wait_s": round(max_wait, 2),
+            }
+            for note_type, requests, retries, total_wait, max_wait in rows
+        }
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command != "stats":
+        print("Usage: python llm_scheduler.py stats", file=sys.stderr)
+        sys.exit(1)
+    scheduler = LLMScheduler()
+    print(f"Budget: {REQUESTS_PER_MINUTE:.0f} requests/min, {TOKENS_PER_MINUTE:.0f} tokens/min")
+    for note_type, stats in sorted(scheduler.stats().items()):
+        print(f"  {note_type}: {stats['requests']} requests, {stats['retries']} retries, "
+              f"avg wait {stats['avg_wait_s']}s, max wait {stats['max_wait_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+LLM Usage: Token and latency accounting per job, stage and note type.
+
+Every LLM call made through the gateway is recorded with its prompt and
+completion tokens (from the API's usage report, or counted with tiktoken when
+a backend does not send one), how many prompt tokens the provider served from
+its prefix cache, and its latency, against the current job. The
+service passes the job id to the summarizer in LLM_JOB_ID and writes the
+job's totals next to the archived recording (<name>.usage.json).
+
+A daily token budget (LLM_DAILY_TOKEN_BUDGET) guards spend: past it,
+non-urgent types are throttled to LLM_BUDGET_THROTTLE_RPM requests per
+minute, and past LLM_BUDGET_HARD_FACTOR x the budget they are refused (the
+summarizer then falls back to a transcript-only page). Urgent types are
+never held back.
+
+Usage:
+    python llm_usage.py stats [days]
+    python llm_usage.py job JOB_ID
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+DB_PATH = Path(os.getenv("LLM_USAGE_PATH") or Path(__file__).parent / "state" / "llm_usage.sqlite")
+
+DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET") or 0)  # 0 = unlimited
+THROTTLE_RPM = float(os.getenv("LLM_BUDGET_THROTTLE_RPM", "2"))
+HARD_FACTOR = float(os.getenv("LLM_BUDGET_HARD_FACTOR", "1.5"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    ts REAL,
+    day TEXT,
+    job_id TEXT,
+    note_type TEXT,
+    stage TEXT,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER DEFAULT 0,
+    latency REAL,
+    cache_hit INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS calls_job ON calls (job_id);
+CREATE INDEX IF NOT EXISTS calls_day ON calls (day);
+CREATE TABLE IF NOT EXISTS compactions (
+    job_id TEXT PRIMARY KEY,
+    note_type TEXT,
+    original_tokens INTEGER,
+    compact_tokens INTEGER
+);
+CREATE TABLE IF NOT EXISTS throttle (
+    name TEXT PRIMARY KEY,
+    next_slot REAL
+);
+"""
+
+
+class BudgetExceeded(Exception):
+    """The daily token budget is spent and this type may not use more today."""
+
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    """tiktoken encoding for a model (None if tiktoken or its data is unavailable)."""
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    # Unknown (e.g. local) models: closest modern tokenizer
+                    _encodings[model] = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Token count of text for a model, estimated if tiktoken cannot be used."""
+    encoding = _encoding(model.split(":")[-1])
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def prefix_cache_rate(cached_tokens: int, prompt_tokens: int) -> float:
+    """Share of prompt tokens the provider served from its prefix cache."""
+    return round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+
+
+class Job:
+    """The summarization job this process is working on."""
+
+    def __init__(self, job_id: str, note_type: str = "unknown", transcript_tokens: Optional[int] = None):
+        self.job_id = job_id
+        self.note_type = note_type
+        self.transcript_tokens = transcript_tokens
+
+
+def new_job_id(note_type: str, filename: str) -> str:
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{note_type}-{filename}"
+
+
+_job = None
+
+
+def begin_job(note_type: str, transcript: str, filename: str = "cli", model: str = "gpt-4o-mini") -> Job:
+    """Start accounting for a job (id from LLM_JOB_ID when run by the service)."""
+    global _job
+    _job = Job(
+        os.getenv("LLM_JOB_ID") or new_job_id(note_type, filename),
+        note_type,
+        count_tokens(transcript, model)
+    )
+    print(f"🔢 Transcript: {_job.transcript_tokens} tokens", file=sys.stderr)
+    return _job
+
+
+def current_job() -> Job:
+    global _job
+    if _job is None:
+        _job = Job(os.getenv("LLM_JOB_ID") or "adhoc")
+    return _job
+
+
+def record_compaction(original_tokens: int, compact_tokens: int):
+    """Record how much the current job's transcript was compacted before LLM calls."""
+    job = current_job()
+    job.transcript_tokens = compact_tokens
+    get_ledger().record_compaction(job.job_id, job.note_type, original_tokens, compact_tokens)
+
+
+class UsageLedger:
+    """Per-call usage records and the daily budget guard."""
+
+    def __init__(self, path: Path = DB_PATH, daily_budget: int = DAILY_TOKEN_BUDGET):
+        self.path = Path(path)
+        self.daily_budget = daily_budget
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(calls)")}
+            if "cached_tokens" not in columns:
+                db.execute("ALTER TABLE calls ADD COLUMN cached_tokens INTEGER DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def record(
+        self,
+        job_id: str,
+        note_type: str,
+        stage: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+        cache_hit: bool = False,
+        cached_tokens: int = 0
+    ):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO calls (ts, day, job_id, note_type, stage, model, prompt_tokens, "
+                "completion_tokens, cached_tokens, latency, cache_hit) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (now, date.today().isoformat(), job_id, note_type, stage, model,
+                 prompt_tokens, completion_tokens, cached_tokens, latency, int(cache_hit))
+            )
+
+    def record_compaction(self, job_id: str, note_type: str, original_tokens: int, compact_tokens: int):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO compactions VALUES (?, ?, ?, ?)",
+                (job_id, note_type, original_tokens, compact_tokens)
+            )
+
+    def tokens_today(self) -> int:
+        with self._connect() as db:
+            return db.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM calls WHERE day = ?",
+                (date.today().isoformat(),)
+            ).fetchone()[0]
+
+    def guard(self, note_type: str, priority: str):
+        """
+        Hold back a non-urgent request once today's budget is spent:
+        space requests out past the budget, refuse them past the hard limit.
+        """
+        if not self.daily_budget or priority == "urgent":
+            return
+        used = self.tokens_today()
+        if used < self.daily_budget:
+            return
+        if used >= self.daily_budget * HARD_FACTOR:
+            raise BudgetExceeded(
+                f"daily LLM budget exhausted ({used}/{self.daily_budget} tokens); "
+                f"{note_type} is {priority} priority"
+            )
+
+        # One shared slot every 60/THROTTLE_RPM seconds for all non-urgent requests
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = db.execute("SELECT next_slot FROM throttle WHERE name = 'budget'").fetchone()
+            slot = max(now, row[0] if row else now)
+            db.execute("INSERT OR REPLACE INTO throttle VALUES ('budget', ?)", (slot + 60 / THROTTLE_RPM,))
+            db.execute("COMMIT")
+        while slot - time.time() > 0:
+            # Keeps printing so the service watchdog sees the summarizer is alive
+            print(f"💸 Daily LLM budget spent ({used}/{self.daily_budget} tokens), "
+                  f"throttling {note_type}: {slot - time.time():.0f}s", file=sys.stderr, flush=True)
+            time.sleep(min(30, max(0.0, slot - time.time())))
+
+    def job_usage(self, job_id: str) -> Dict:
+        """Totals for one job, broken down by stage."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT note_type, stage, MAX(model), COUNT(*), SUM(cache_hit), SUM(prompt_tokens), "
+                "SUM(completion_tokens), SUM(cached_tokens), SUM(latency) FROM calls WHERE job_id = ? "
+                "GROUP BY stage ORDER BY MIN(id)",
+                (job_id,)
+            ).fetchall()
+        stages = {}
+        total = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                 "cached_tokens": 0, "latency_s": 0.0}
+        note_type = None
+        for note_type, stage, model, calls, hits, prompt, completion, cached, latency in rows:
+            stages[stage] = {
+                "model": model,
+                "calls": calls,
+                "cache_hits": hits,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "cached_tokens": cached,
+                "latency_s": round(latency, 2),
+            }
+            for key, value in (("calls", calls), ("cache_hits", hits), ("prompt_tokens", prompt),
+                               ("completion_tokens", completion), ("cached_tokens", cached),
+                               ("latency_s", latency)):
+                total[key] += value
+        total["latency_s"] = round(total["latency_s"], 2)
+        total["prefix_cache_rate"] = prefix_cache_rate(total["cached_tokens"], total["prompt_tokens"])
+        usage = {"job_id": job_id, "note_type": note_type, "total": total, "stages": stages}
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT original_tokens, compact_tokens FROM compactions WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row:
+            original, compacted = row
+            usage["compaction"] = {
+                "original_tokens": original,
+                "compact_tokens": compacted,
+                "ratio": round(compacted / original, 4) if original else 1.0,
+                "saved_tokens": original - compacted,
+            }
+        return usage
+
+    def write_sidecar(self, job_id: str, path: Path) -> Optional[Dict]:
+        """Write a job's usage as JSON next to its archived recording."""
+        usage = self.job_usage(job_id)
+        if not usage["stages"]:
+            return None
+        path.write_text(json.dumps(usage, indent=2), encoding="utf-8")
+        return usage
+
+    def stats(self, days: int = 7) -> Dict:
+        """Per-day, per-type token totals, prompt prefix cache rate and average call latency."""
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT day, note_type, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), "
+                "SUM(cached_tokens), AVG(latency) FROM calls WHERE day >= ? "
+                "GROUP BY day, note_type ORDER BY day",
+                (since,)
+            ).fetchall()
+        stats = {}
+        for day, note_type, calls, prompt, completion, cached, latency in rows:
+            stats.setdefault(day, {})[note_type] = {
+                "calls": calls,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "cached_tokens": cached,
+                "prefix_cache_rate": prefix_cache_rate(cached, prompt),
+                "avg_latency_s": round(latency, 2),
+            }
+        return stats
+
+
+_ledger = None
+
+
+def get_ledger() -> UsageLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = UsageLedger()
+    return _ledger
+
+
+def main():
+    args = sys.argv[1:] or ["stats"]
+    ledger = get_ledger()
+    if args[0] == "stats":
+        days = int(args[1]) if len(args) > 1 else 7
+        if ledger.daily_budget:
+            print(f"Today: {ledger.tokens_today()} / {ledger.daily_budget} tokens")
+        for day, by_type in ledger.stats(days).items():
+            print(day)
+            for note_type, stats in sorted(by_type.items()):
+                print(f"  {note_type}: {stats['calls']} calls, {stats['prompt_tokens']} prompt + "
+                      f"{stats['completion_tokens']} completion tokens, "
+                      f"{stats['prefix_cache_rate']:.0%} of prompt from prefix cache, "
+                      f"avg {stats['avg_latency_s']}s")
+    elif args[0] == "job" and len(args) > 1:
+        print(json.dumps(ledger.job_usage(args[1]), indent=2))
+    else:
+        print("Usage: python llm_usage.py {stats [days]|job JOB_ID}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Logseq Blocks: Parse, serialize and patch Logseq pages as block trees.
+
+A page is a list of top-level nodes. Bullets ("- text", nested by tabs or
+two-space steps) become Blocks with children; any other line (heading,
+"key:: value" page property, "---", HTML) is a top-level Block of its own.
+Lines under a bullet that are not bullets themselves ("  id:: ...") are
+kept as the block's body, and property lines in it as its properties.
+
+serialize(parse(text)) == text for any page, so a page patched with
+patch() keeps every block it did not change byte-for-byte: regenerating a
+note rewrites only the blocks whose text changed. Properties the user owns
+(USER_PROPERTIES: processed:: true, block ids, ...) and properties only
+present on disk keep their on-disk values; properties the pipeline writes
+(related::, sessions::, ...) take the regenerated value.
+
+Blocks the user added by hand are never dropped: given the previously
+generated version of the page, any on-disk block it does not contain is the
+user's and stays where it is. Without one, blocks with an id:: (referenced
+elsewhere in the graph) are kept rather than deleted.
+
+Usage:
+    python logseq_blocks.py page-on-disk.md regenerated.md   # print the patched page
+"""
+
+import re
+import sys
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+PROPERTY = re.compile(r"^\s*([A-Za-z0-9_-]+)::\s?(.*)$")
+BULLET = re.compile(r"^([ \t]*)-( ?)(.*)$")
+
+# Properties edited in Logseq (or fixed when the page was first written):
+# patch() keeps their on-disk values over regenerated ones
+USER_PROPERTIES = frozenset({"processed", "id", "collapsed", "tags", "recorded"})
+
+# List markers normalize() turns into "-" (besides "-" and "1." / "1)")
+BULLET_CHARS = "•◦▪‣●○*+"
+
+
+class Block:
+    """One bullet (with its body and children) or one top-level non-bullet line."""
+
+    def __init__(self, text: str, indent: str = "", bullet: bool = True, space: str = " "):
+        self.text = text
+        self.indent = indent
+        self.bullet = bullet
+        self.space = space
+        self.body: List[str] = []
+        self.children: List["Block"] = []
+
+    @property
+    def depth(self) -> int:
+        """Nesting level: one per tab or per two spaces."""
+        return self.indent.count("\t") + self.indent.count(" ") // 2
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        """Properties of the block (a non-bullet property line is its own)."""
+        lines = self.body if self.bullet else [self.text]
+        properties = {}
+        for line in lines:
+            match = PROPERTY.match(line)
+            if match:
+                properties[match.group(1)] = match.group(2)
+        return properties
+
+    def key(self) -> Tuple:
+        """Identity used to match blocks between two versions of a page."""
+        if not self.bullet:
+            match = PROPERTY.match(self.text)
+            if match:
+                # Same property whatever its value: the value is merged, not diffed
+                return ("property", match.group(1))
+        return (self.bullet, self.text)
+
+    def lines(self) -> List[str]:
+        if self.bullet:
+            head = [f"{self.indent}-{self.space}{self.text}"]
+        else:
+            head = [self.text]
+        out = head + self.body
+        for child in self.children:
+            out.extend(child.lines())
+        return out
+
+    def __repr__(self):
+        return f"Block({self.text!r}, depth={self.depth}, children={len(self.children)})"
+
+
+def normalize(text: str) -> str:
+    """
+    LLM markdown as Logseq bullets, in one pass over the text:
+    - headings and non-bullet "-" lines ("---") kept as-is
+    - "-", numbered ("1." / "1)") and "•◦▪*+" items, and plain text, become
+      "- " bullets indented one tab per nesting level
+    - empty lines dropped
+
+    Nesting depth is exact rather than guessed from the indent width: each
+    line is one level deeper than the nearest less-indented line above it
+    (a tab counts as two columns), so 2-space, 4-space and tab indents nest
+    the same way.
+    """
+    out = []
+    append = out.append
+    widths: List[int] = []  # Indent width of each open nesting level
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        first = stripped[0]
+
+        if first == "#":
+            # Heading: kept as-is, and starts a new outline
+            append(line.rstrip())
+            widths = []
+            continue
+
+        second = stripped[1:2]
+        if first == "-":
+            if second == " ":
+                body = stripped[2:].lstrip()
+            elif not second or second == "\t":
+                body = stripped[1:].lstrip()
+            else:
+                # "---" separator or "-word": not a list item
+                append(line.rstrip())
+                continue
+        elif first in BULLET_CHARS and (second == " " or second == "\t"):
+            body = stripped[1:].lstrip()
+        elif "0" <= first <= "9":
+            end = 1
+            length = len(stripped)
+            while end < length and "0" <= stripped[end] <= "9":
+                end += 1
+            if end < length and stripped[end] in ".)" and (end + 1 == length or stripped[end + 1] in " \t"):
+                body = stripped[end + 1:].lstrip()
+            else:
+                body = stripped
+        else:
+            body = stripped
+
+        if first == line[0]:
+            width = 0
+        else:
+            indent = line[:line.index(first)]
+            width = len(indent) + indent.count("\t")
+        if not widths or widths[-1] != width:
+            while widths and widths[-1] > width:
+                widths.pop()
+            if not widths or widths[-1] < width:
+                widths.append(width)
+        tabs = "\t" * (len(widths) - 1)
+        append(tabs + "- " + body if body else tabs + "-")
+    return "\n".join(out)
+
+
+def parse(text: str, lenient: bool = False) -> List[Block]:
+    """
+    Parse a page into top-level blocks. With lenient=True, the text is first
+    normalized (normalize) as for LLM output.
+    """
+    lines = (normalize(text) if lenient else text).split("\n")
+
+    roots: List[Block] = []
+    stack: List[Block] = []
+    for line in lines:
+        match = BULLET.match(line)
+        # "---" is a separator, not an empty bullet
+        if match and not line.strip().startswith("--"):
+            block = Block(match.group(3), match.group(1), space=match.group(2))
+            while stack and stack[-1].depth >= block.depth:
+                stack.pop()
+            (stack[-1].children if stack else roots).append(block)
+            stack.append(block)
+        elif stack and line[:1] in (" ", "\t") and line.strip():
+            # Continuation of the current bullet (properties, wrapped text)
+            stack[-1].body.append(line)
+        else:
+            roots.append(Block(line, bullet=False))
+            stack = []
+    return roots
+
+
+def serialize(blocks: List[Block]) -> str:
+    out = []
+    for block in blocks:
+        out.extend(block.lines())
+    return "\n".join(out)
+
+
+def _kept_properties(current: Block, new: Block, keep: frozenset) -> Dict[str, str]:
+    """Properties of current that win over new: user-owned ones, and those new does not set."""
+    regenerated = new.properties
+    return {
+        key: value for key, value in current.properties.items()
+        if key in keep or key not in regenerated
+    }
+
+
+def _merge_properties(current: Block, new: Block, keep: frozenset = USER_PROPERTIES) -> Block:
+    """new bullet, carrying over the property values of current that win (see _kept_properties)."""
+    kept = _kept_properties(current, new, keep)
+    if not kept or not (current.bullet and new.bullet):
+        return new
+    body = []
+    seen = set()
+    for line in new.body:
+        match = PROPERTY.match(line)
+        if match and match.group(1) in kept:
+            key = match.group(1)
+            seen.add(key)
+            line = f"{line[:len(line) - len(line.lstrip())]}{key}:: {kept[key]}"
+        body.append(line)
+    pad = new.indent + "  "
+    body.extend(f"{pad}{key}:: {value}" for key, value in kept.items() if key not in seen)
+    new.body = body
+    return new
+
+
+def generated_keys(blocks: List[Block]) -> Set[Tuple]:
+    """Keys of every block in a generated page, at any depth (see patch's previous)."""
+    keys = set()
+    for block in blocks:
+        keys.add(block.key())
+        keys |= generated_keys(block.children)
+    return keys
+
+
+def _users(block: Block, generated: Optional[Set[Tuple]]) -> bool:
+    """Whether an on-disk block was added by the user (not in the previous generated page)."""
+    return generated is not None and block.key() not in generated
+
+
+def patch(
+    current: List[Block],
+    regenerated: List[Block],
+    keep: frozenset = USER_PROPERTIES,
+    generated: Optional[Set[Tuple]] = None
+) -> Tuple[List[Block], int]:
+    """
+    Patch the blocks on disk towards a regenerated version.
+    Blocks whose text matches keep their on-disk form (and recurse into
+    children); replaced blocks take the new text but keep the old block's
+    user-owned properties (keep), so block references (id::) survive. A
+    page property line keeps its on-disk value only if its name is in keep.
+
+    generated holds the keys of the previously generated page
+    (generated_keys()): on-disk blocks not in it were added by the user and
+    are kept in place, as are blocks with an id:: that no regenerated block
+    takes over. Returns (blocks, number of blocks changed).
+    """
+    matcher = SequenceMatcher(None, [b.key() for b in current], [b.key() for b in regenerated], autojunk=False)
+    result: List[Block] = []
+    changed = 0
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            for old, new in zip(current[i1:i2], regenerated[j1:j2]):
+                kind, name = old.key()
+                if kind == "property" and name not in keep and old.text != new.text:
+                    # Page property the pipeline owns: regenerated value wins
+                    result.append(new)
+                    changed += 1
+                    continue
+                old.children, child_changes = patch(old.children, new.children, keep, generated)
+                if old.bullet:
+                    merged = _merge_properties(old, new, keep)
+                    if merged.body != old.body:
+                        old.body = merged.body
+                        child_changes += 1
+                result.append(old)
+                changed += child_changes
+            continue
+        new_blocks = iter(regenerated[j1:j2])
+        for old in current[i1:i2]:
+            if _users(old, generated):
+                result.append(old)
+                continue
+            new = next(new_blocks, None)
+            if new is None:
+                if "id" in old.properties:
+                    # Referenced elsewhere: keep it rather than break the reference
+                    result.append(old)
+                else:
+                    changed += 1
+                continue
+            if old.bullet and new.bullet:
+                new.children, _ = patch(old.children, new.children, keep, generated)
+            result.append(_merge_properties(old, new, keep))
+            changed += 1
+        for new in new_blocks:
+            result.append(new)
+            changed += 1
+    return result, changed
+
+
+def patch_text(
+    current: str,
+    regenerated: str,
+    keep: frozenset = USER_PROPERTIES,
+    previous: Optional[str] = None
+) -> Tuple[str, int]:
+    """
+    patch() on page text, given the previously generated text if known;
+    returns (patched text, number of blocks changed).
+    """
+    generated = generated_keys(parse(previous)) if previous is not None else None
+    blocks, changed = patch(parse(current), parse(regenerated), keep, generated)
+    return (serialize(blocks) if changed else current), changed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__.strip().split("Usage:")[1], file=sys.stderr)
+        sys.exit(1)
+    text, changed = patch_text(Path(sys.argv[1]).read_text(encoding="utf-8"),
+                               Path(sys.argv[2]).read_text(encoding="utf-8"))
+    print(text)
+    print(f"{changed} block(s) changed", file=sys.stderr)
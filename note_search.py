@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Note Search: SQLite FTS5 full-text index over transcripts and summaries.
+
+Every finished job indexes its note: each transcript segment with its start
+time, plus the summary, tagged with the note type and Logseq page. Queries
+return page links and jump-to timestamps (milliseconds into the recording)
+instead of grepping thousands of pages. Re-indexing a note (an appended
+recording) replaces its rows in one transaction.
+
+backfill indexes everything already processed: the audio ledger's entries,
+with the full segments from the archive's .segments sidecars where present,
+then the voice note pages in the Logseq graph the ledger does not know
+(notes from before it existed): their Summary section and "(M:SS)"
+transcript bullets, including linked "(transcript N)" pages.
+
+Usage:
+    python note_search.py search "guard pass" [--type bjj] [--limit 20]
+    python note_search.py backfill [--rebuild] [--pages DIR]
+    python note_search.py stats
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import audio_ledger
+import type_manager
+
+BASE_DIR = Path(__file__).parent
+DB_PATH = Path(os.getenv("NOTE_SEARCH_PATH") or BASE_DIR / "state" / "note_search.sqlite")
+ARCHIVE_DIR = BASE_DIR / "archive"
+LOGSEQ_PAGES = Path("/srv/logseq_graph/pages")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    note_key TEXT UNIQUE,
+    note_type TEXT,
+    audio TEXT,
+    page TEXT,
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(
+    text,
+    kind UNINDEXED,
+    note_id UNINDEXED,
+    start_ms UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+TERM = re.compile(r"\w[\w'-]*")
+
+# Page parsing for backfill
+PROPERTY = re.compile(r"^([A-Za-z0-9_-]+)::\s*(.*)$")
+TIMESTAMPED = re.compile(r"^\s*(?:-\s*)?\((\d+):(\d{2})\)\s*(.*)$")
+TRANSCRIPT_PAGE = re.compile(r"^(.*) \(transcript(?: (\d+))?\)$")
+
+# Entry rowids are note_id << ROWID_BITS | n, so a note's rows are one rowid
+# range (deleting by the UNINDEXED note_id column would scan the whole table)
+ROWID_BITS = 24
+
+
+def match_expression(query: str) -> str:
+    """
+    Plain words as an FTS5 query: every word must match (prefix with a
+    trailing "*"), "quoted phrases" are kept as phrases.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        if phrase:
+            terms = TERM.findall(phrase)
+            if terms:
+                parts.append('"' + " ".join(terms) + '"')
+            continue
+        prefix = word.endswith("*")
+        for term in TERM.findall(word):
+            parts.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(parts)
+
+
+def format_ms(ms: Optional[int]) -> str:
+    if ms is None:
+        return ""
+    seconds = ms // 1000
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class NoteIndex:
+    """Full-text index of notes (segments and summaries)."""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _replace_note(
+        self,
+        db,
+        note_type: str,
+        audio: Optional[str],
+        page: str,
+        segments: List[Dict],
+        summary: Optional[str]
+    ):
+        """
+        Delete and re-insert one note's rows (caller holds the transaction).
+        Notes known only from their page (audio None) are keyed by page name.
+        """
+        note_key = _note_key(note_type, audio, page)
+        row = db.execute("SELECT id FROM notes WHERE note_key = ?", (note_key,)).fetchone()
+        if row:
+            note_id = row[0]
+            db.execute("DELETE FROM entries WHERE rowid BETWEEN ? AND ?",
+                       (note_id << ROWID_BITS, ((note_id + 1) << ROWID_BITS) - 1))
+            db.execute("UPDATE notes SET page = ?, indexed_at = ? WHERE id = ?", (page, time.time(), note_id))
+        else:
+            note_id = db.execute(
+                "INSERT INTO notes (note_key, note_type, audio, page, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (note_key, note_type, audio, page, time.time())
+            ).lastrowid
+        rows = [
+            (segment["text"], "segment", note_id,
+             None if segment["start"] is None else int(round(segment["start"] * 1000)))
+            for segment in segments if segment["text"].strip()
+        ]
+        if summary:
+            rows.append((summary, "summary", note_id, None))
+        db.executemany(
+            "INSERT INTO entries (rowid, text, kind, note_id, start_ms) VALUES (?, ?, ?, ?, ?)",
+            [((note_id << ROWID_BITS) + n, *row) for n, row in enumerate(rows)]
+        )
+
+    def index_note(
+        self,
+        note_type: str,
+        audio: str,
+        page: str,
+        segments: List[Dict],
+        summary: Optional[str] = None
+    ):
+        """Index (or re-index) one note: its transcript segments and summary."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._replace_note(db, note_type, audio, page, segments, summary)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def search(self, query: str, note_type: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Best matches first: page, note type, timestamp (ms, None for summaries), snippet."""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            "SELECT notes.page, notes.note_type, notes.audio, entries.kind, entries.start_ms, "
+            "snippet(entries, 0, '**', '**', '…', 12) "
+            "FROM entries JOIN notes ON notes.id = entries.note_id "
+            "WHERE entries MATCH ?"
+        )
+        params = [expression]
+        if note_type:
+            sql += " AND notes.note_type = ?"
+            params.append(note_type)
+        sql += " ORDER BY bm25(entries) LIMIT ?"
+        params.append(limit)
+        with self._connect() as db:
+            rows = db.execute(sql, params).fetchall()
+        return [
+            {"page": page, "note_type": note_type, "audio": audio, "kind": kind,
+             "start_ms": None if start_ms is None else int(start_ms), "snippet": snippet}
+            for page, note_type, audio, kind, start_ms, snippet in rows
+        ]
+
+    def indexed_notes(self) -> set:
+        with self._connect() as db:
+            return {row[0] for row in db.execute("SELECT note_key FROM notes")}
+
+    def backfill(
+        self,
+        ledger: audio_ledger.AudioLedger,
+        rebuild: bool = False,
+        pages_dir: Optional[Path] = LOGSEQ_PAGES
+    ) -> int:
+        """
+        Index every ledger entry, then every voice note page of pages_dir the
+        ledger does not cover, that is not indexed yet (all of them with
+        rebuild); returns the count.
+        """
+        done = set() if rebuild else self.indexed_notes()
+        ledger_pages = set()
+        count = 0
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for note_type, audio, entry in ledger.entries():
+                    if not entry.get("page"):
+                        continue
+                    page = Path(entry["page"]).stem
+                    ledger_pages.add(page)
+                    if _note_key(note_type, audio, page) in done:
+                        continue
+                    segments = _archived_segments(note_type, audio) or audio_ledger.stored_segments(entry)
+                    self._replace_note(db, note_type, audio, page, segments, entry.get("summary"))
+                    count += 1
+                if pages_dir and Path(pages_dir).is_dir():
+                    for page, note_type, summary, segments in _page_notes(Path(pages_dir)):
+                        if page in ledger_pages or _note_key(note_type, None, page) in done:
+                            continue
+                        self._replace_note(db, note_type, None, page, segments, summary)
+                        count += 1
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return count
+
+    def stats(self) -> Dict:
+        with self._connect() as db:
+            notes = dict(db.execute("SELECT note_type, COUNT(*) FROM notes GROUP BY note_type").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"notes": notes, "entries": entries, "size_mb": round(self.path.stat().st_size / 2**20, 1)}
+
+
+def _note_key(note_type: str, audio: Optional[str], page: str) -> str:
+    return f"{note_type}/{audio}" if audio else f"{note_type}/page:{page}"
+
+
+def _page_note(text: str, known_types: set) -> Optional[Tuple[str, Optional[str], List[Dict]]]:
+    """
+    (note type, summary, segments) of a voice note page, None for other pages.
+    Segments are the "(M:SS) text" bullets; pages from before timestamps
+    yield their Transcript section lines (start None).
+    """
+    properties = {}
+    for line in text.split("\n"):
+        match = PROPERTY.match(line)
+        if match:
+            properties.setdefault(match.group(1), match.group(2))
+    tags = re.findall(r"#([\w-]+)", properties.get("tags", ""))
+    if "voice-note" not in tags and "type" not in properties:
+        return None
+    note_type = properties.get("type") or next((tag for tag in tags if tag in known_types), "voice-note")
+
+    summary_lines, transcript_lines, segments = [], [], []
+    section = None
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            heading = stripped.lstrip("#").strip().lower()
+            section = "summary" if "summary" in heading else "transcript" if "transcript" in heading else None
+            continue
+        if stripped == "---":
+            section = None
+            continue
+        match = TIMESTAMPED.match(line)
+        if match:
+            minutes, seconds, body = match.groups()
+            segments.append({"start": int(minutes) * 60 + int(seconds), "text": body})
+        elif section == "summary" and stripped:
+            summary_lines.append(line)
+        elif section == "transcript" and stripped and not stripped.startswith("<") and not stripped.startswith("[["):
+            transcript_lines.append(stripped[2:] if stripped.startswith("- ") else stripped)
+    if not segments:
+        segments = [{"start": None, "text": line} for line in transcript_lines]
+    return note_type, "\n".join(summary_lines) or None, segments
+
+
+def _page_notes(pages_dir: Path) -> Iterator[Tuple[str, str, Optional[str], List[Dict]]]:
+    """(page, note type, summary, segments) of the voice note pages in a graph."""
+    known_types = set(type_manager.list_available_types())
+    transcripts: Dict[str, List[Tuple[int, Path]]] = {}
+    pages = []
+    for path in sorted(pages_dir.glob("*.md")):
+        match = TRANSCRIPT_PAGE.match(path.stem)
+        if match:
+            transcripts.setdefault(match.group(1), []).append((int(match.group(2) or 1), path))
+        else:
+            pages.append(path)
+    for path in pages:
+        try:
+            note = _page_note(path.read_text(encoding="utf-8"), known_types)
+        except (OSError, UnicodeDecodeError):
+            continue
+        if note is None:
+            continue
+        note_type, summary, segments = note
+        # "pages" transcript mode: the bullets are on the linked transcript pages
+        for _, part in sorted(transcripts.get(path.stem, [])):
+            try:
+                lines = part.read_text(encoding="utf-8").split("\n")
+            except (OSError, UnicodeDecodeError):
+                continue
+            for match in filter(None, map(TIMESTAMPED.match, lines)):
+                minutes, seconds, body = match.groups()
+                segments.append({"start": int(minutes) * 60 + int(seconds), "text": body})
+        yield path.stem, note_type, summary, segments
+
+
+def _archived_segments(note_type: str, audio: str) -> Optional[List[Dict]]:
+    """Full segments from the archive sidecar, if the recording has one."""
+    path = ARCHIVE_DIR / note_type / "done" / f"{Path(audio).stem}.segments"
+    if not path.exists():
+        return None
+    try:
+        import segment_store
+        return list(segment_store.load(path))
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+_index = None
+
+
+def get_index() -> NoteIndex:
+    global _index
+    if _index is None:
+        _index = NoteIndex()
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over voice notes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="find notes")
+    search.add_argument("query")
+    search.add_argument("--type", dest="note_type")
+    search.add_argument("--limit", type=int, default=20)
+    backfill = commands.add_parser("backfill", help="index the existing archive")
+    backfill.add_argument("--rebuild", action="store_true", help="re-index notes already indexed")
+    backfill.add_argument("--pages", type=Path, default=LOGSEQ_PAGES, help="Logseq pages directory")
+    commands.add_parser("stats", help="index size")
+    args = parser.parse_args()
+
+    index = get_index()
+    if args.command == "search":
+        hits = index.search(args.query, args.note_type, args.limit)
+        if not hits:
+            print("No matches")
+        for hit in hits:
+            if hit["kind"] == "summary":
+                where = "(summary)"
+            elif hit["start_ms"] is None:
+                where = "(transcript)"
+            else:
+                where = f"@ {format_ms(hit['start_ms'])} ({hit['start_ms']} ms)"
+            print(f"[[{hit['page']}]] {where} #{hit['note_type']}\n    {hit['snippet']}")
+    elif args.command == "backfill":
+        started = time.monotonic()
+        ledger = audio_ledger.AudioLedger(audio_ledger.LEDGER_PATH)
+        count = index.backfill(ledger, rebuild=args.rebuild, pages_dir=args.pages)
+        print(f"Indexed {count} note(s) in {time.monotonic() - started:.1f}s")
+    else:
+        stats = index.stats()
+        print(f"{sum(stats['notes'].values())} notes ({stats['notes']}), "
+              f"{stats['entries']} entries, {stats['size_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
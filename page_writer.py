@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Page Writer: Crash-safe, collision-free writes into the Logseq pages directory.
+
+Pages are written to a temp file in the same directory and moved into place,
+so Logseq never indexes a truncated page:
+- updates replace the page atomically (os.replace)
+- new pages are linked into place exclusively (os.link), so a page that
+  appeared since startup is never overwritten
+
+Page names are checked against an index of the directory, listed once with
+os.scandir and kept up to date as pages are created, so picking a free name
+("2025-01-20-note", "2025-01-20-note-2", ...) does not re-list a graph of
+tens of thousands of pages.
+
+Durability (PAGE_FSYNC):
+    always  fsync each page and the directory before returning (default)
+    batch   defer fsyncs to flush(), called periodically by the service
+    off     leave it to the OS
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+PAGE_FSYNC = os.getenv("PAGE_FSYNC", "always").lower()
+
+# Page text, or chunks of it (e.g. from a streaming renderer)
+Content = Union[str, Iterable[str]]
+
+
+def _fsync_path(path: Path):
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path: Path, content: Content, fsync: bool) -> Path:
+    """Write content to a temp file next to path (not *.md, so Logseq skips it)."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        try:
+            f.writelines([content] if isinstance(content, str) else content)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return tmp_path
+
+
+def atomic_write(path: Path, content: Content, fsync: bool = True):
+    """Replace path with content atomically (readers see old or new, never partial)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _write_temp(path, content, fsync)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_path(path.parent)
+
+
+class PageWriter:
+    """Atomic page writes plus an in-memory index of taken page names."""
+
+    def __init__(self, pages_dir: Path, fsync: str = PAGE_FSYNC):
+        self.pages_dir = Path(pages_dir)
+        self.fsync = fsync
+        self._names: Optional[Set[str]] = None
+        self._next_suffix: Dict[str, int] = {}
+        self._unsynced: List[Path] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(stem: str) -> str:
+        # Logseq page names are case-insensitive
+        return stem.casefold()
+
+    def _load_names(self) -> Set[str]:
+        """Stems of the existing pages (listed once, caller holds _lock)."""
+        if self._names is None:
+            self.pages_dir.mkdir(parents=True, exist_ok=True)
+            with os.scandir(self.pages_dir) as entries:
+                self._names = {
+                    self._key(entry.name[:-3]) for entry in entries
+                    if entry.name.endswith(".md")
+                }
+            logger.info(f"Page index: {len(self._names)} pages")
+        return self._names
+
+    def reserve(self, stem: str) -> str:
+        """Claim a free page name for stem, adding "-2", "-3", ... on collision."""
+        with self._lock:
+            names = self._load_names()
+            candidate = stem
+            suffix = self._next_suffix.get(stem, 2)
+            while self._key(candidate) in names:
+                candidate = f"{stem}-{suffix}"
+                suffix += 1
+            if candidate != stem:
+                self._next_suffix[stem] = suffix
+            names.add(self._key(candidate))
+            return candidate
+
+    def _synced(self, path: Path):
+        """Apply the fsync policy to a page that was just moved into place."""
+        if self.fsync == "always":
+            _fsync_path(self.pages_dir)
+        elif self.fsync == "batch":
+            with self._lock:
+                self._unsynced.append(path)
+
+    def create(self, stem: str, content: Content, reserved: bool = False) -> Path:
+        """
+        Write a new page under a free name derived from stem; returns its path.
+        With reserved=True, stem came from reserve() and is tried as-is first.
+        """
+        name = stem if reserved else self.reserve(stem)
+        path = self.pages_dir / f"{name}.md"
+        tmp_path = _write_temp(path, content, self.fsync == "always")
+        try:
+            while True:
+                try:
+                    # Fails instead of overwriting a page created after the index was built
+                    os.link(tmp_path, path)
+                    break
+                except FileExistsError:
+                    logger.debug(f"Page appeared since startup: {path.name}")
+                    path = self.pages_dir / f"{self.reserve(stem)}.md"
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._synced(path)
+        return path
+
+    def create_exact(self, stem: str, content: Content) -> Path:
+        """
+        Write a new page named exactly stem (e.g. a note's transcript page,
+        whose name is linked); raises FileExistsError rather than overwrite
+        or rename it.
+        """
+        path = self.pages_dir / f"{stem}.md"
+        tmp_path = _write_temp(path, content, self.fsync == "always")
+        try:
+            os.link(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        with self._lock:
+            if self._names is not None:
+                self._names.add(self._key(stem))
+        self._synced(path)
+        return path
+
+    def write(self, path: Path, content: Content):
+        """Atomically replace an existing page (e.g. an updated summary)."""
+        atomic_write(path, content, fsync=self.fsync == "always")
+        if self.fsync == "batch":
+            with self._lock:
+                self._unsynced.append(path)
+        with self._lock:
+            if self._names is not None and path.parent == self.pages_dir:
+                self._names.add(self._key(path.stem))
+
+    def flush(self):
+        """fsync pages written since the last flush (batch mode)."""
+        with self._lock:
+            pending, self._unsynced = self._unsynced, []
+        if not pending:
+            return
+        for path in pending:
+            try:
+                _fsync_path(path)
+            except OSError as e:
+                logger.warning(f"fsync failed for {path.name}: {e}")
+        _fsync_path(self.pages_dir)
+        logger.debug(f"Synced {len(pending)} page(s)")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Related Notes: link each new note to its most similar past notes, locally.
+
+Every summary becomes a sparse TF-IDF vector over hashed features (words
+and word pairs hashed into 2^20 buckets with crc32, so there is no
+vocabulary to grow or rebuild). The vectors are one CSR matrix kept in
+growable numpy arrays and mirrored in append-only files:
+
+    state/related/indices.i4   feature ids of every row, concatenated
+    state/related/weights.f4   their log term frequencies
+    state/related/notes.jsonl  one line per row: note key, type, page, row end
+
+Adding a note appends one row (amortized O(1) per feature, document
+frequencies updated in place). IDF weights are applied at query time, so
+old rows never need rewriting; a query scores every row at once
+(np.bincount over the nonzeros), normalizes, and takes the top k with
+np.argpartition. A re-indexed note (appended recording) gets a new row and
+its old one is masked out.
+
+Usage:
+    python related_notes.py query "knee slice from half guard" [--type bjj]
+    python related_notes.py backfill
+    python related_notes.py stats
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import audio_ledger
+
+BASE_DIR = Path(__file__).parent
+STORE_DIR = Path(os.getenv("RELATED_NOTES_DIR") or BASE_DIR / "state" / "related")
+
+# Links per page, and the cosine similarity a note needs to be linked
+RELATED_NOTES = int(os.getenv("RELATED_NOTES", "5"))
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.15"))
+
+FEATURE_BITS = 20
+WORD = re.compile(r"[a-z0-9][a-z0-9'-]+")
+STOPWORDS = set("""
+the and for that this with was were are but not you your have has had from they them
+their what when where which who will would can could should into about there then than
+also just like very some more most other over only our out all any been being its it's
+she her his him i'm we're don't did does doing done get got going one two lot really
+summary transcript note notes discussed talked mentioned
+""".split())
+
+
+def features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed feature ids (sorted, unique) and log term frequencies of a text."""
+    words = [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not terms:
+        return np.zeros(0, dtype="<i4"), np.zeros(0, dtype="<f4")
+    mask = (1 << FEATURE_BITS) - 1
+    ids = np.fromiter((zlib.crc32(t.encode("utf-8")) & mask for t in terms), dtype="<i4", count=len(terms))
+    ids, counts = np.unique(ids, return_counts=True)
+    return ids, (1.0 + np.log(counts)).astype("<f4")
+
+
+class RelatedNotes:
+    """Append-only hashed TF-IDF matrix of note summaries."""
+
+    def __init__(self, store_dir: Path = STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self._lock = threading.Lock()
+        self._notes: List[Dict] = []          # Row metadata, in row order
+        self._latest: Dict[str, int] = {}     # Note key -> its current row
+        self._indices = np.zeros(1024, dtype="<i4")
+        self._weights = np.zeros(1024, dtype="<f4")
+        self._rows = np.zeros(1024, dtype="<i4")  # Row of each nonzero
+        self._nnz = 0
+        self._live = np.zeros(64, dtype=bool)     # Row is its note's current row
+        self._row_type = np.zeros(64, dtype=np.int16)
+        self._type_codes: Dict[str, int] = {}
+        self._page_rows: Dict[str, int] = {}
+        self._df = np.zeros(1 << FEATURE_BITS, dtype=np.int32)
+        self._load()
+
+    def _load(self):
+        notes_path = self.store_dir / "notes.jsonl"
+        if not notes_path.exists():
+            return
+        notes = []
+        good = 0
+        with open(notes_path, "rb") as f:
+            for line in f:
+                try:
+                    notes.append(json.loads(line))
+                except ValueError:
+                    break
+                good += len(line)
+        if good < notes_path.stat().st_size:
+            # Torn last line (crash mid-append): that row was never completed
+            os.truncate(notes_path, good)
+        nnz = notes[-1]["end"] if notes else 0
+        indices = np.fromfile(self.store_dir / "indices.i4", dtype="<i4", count=nnz)
+        weights = np.fromfile(self.store_dir / "weights.f4", dtype="<f4", count=nnz)
+        if len(indices) < nnz or len(weights) < nnz:
+            raise ValueError(f"related notes store is truncated: {self.store_dir}")
+        starts = [0] + [note["end"] for note in notes[:-1]]
+        rows = np.repeat(np.arange(len(notes), dtype="<i4"), [note["end"] - start for note, start in zip(notes, starts)])
+        self._grow(nnz)
+        self._indices[:nnz], self._weights[:nnz], self._rows[:nnz] = indices, weights, rows
+        self._nnz = nnz
+        for note in notes:
+            self._add_row(note)
+        live = self._live[rows]
+        self._df += np.bincount(indices[live], minlength=len(self._df)).astype(np.int32)
+
+    def _add_row(self, note: Dict):
+        """Row bookkeeping for a note appended to _notes (caller holds _lock)."""
+        row = len(self._notes)
+        if row == len(self._live):
+            self._live = np.concatenate((self._live, np.zeros(row, dtype=bool)))
+            self._row_type = np.concatenate((self._row_type, np.zeros(row, dtype=np.int16)))
+        previous = self._latest.get(note["key"])
+        if previous is not None:
+            self._live[previous] = False
+        self._live[row] = True
+        self._row_type[row] = self._type_codes.setdefault(note["type"], len(self._type_codes))
+        self._latest[note["key"]] = row
+        self._page_rows[note["page"]] = row
+        self._notes.append(note)
+
+    def _grow(self, needed: int):
+        """Make room for `needed` nonzeros (capacity doubles: amortized O(1) appends)."""
+        capacity = len(self._indices)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_indices", "_weights", "_rows"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._nnz] = old[:self._nnz]
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def add(self, note_type: str, audio: str, page: str, text: str):
+        """Append a note's row (replacing the note's previous row, if any)."""
+        ids, weights = features(text)
+        key = f"{note_type}/{audio}"
+        with self._lock:
+            start = self._nnz
+            end = start + len(ids)
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.store_dir / "indices.i4", "ab") as f:
+                f.seek(start * 4)
+                f.truncate()
+                f.write(ids.tobytes())
+            with open(self.store_dir / "weights.f4", "ab") as f:
+                f.seek(start * 4)
+                f.truncate()
+                f.write(weights.tobytes())
+            note = {"key": key, "type": note_type, "page": page, "end": end}
+            with open(self.store_dir / "notes.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(note) + "\n")
+
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous_start = self._notes[previous - 1]["end"] if previous else 0
+                self._df[self._indices[previous_start:self._notes[previous]["end"]]] -= 1
+            self._grow(end)
+            self._indices[start:end] = ids
+            self._weights[start:end] = weights
+            self._rows[start:end] = len(self._notes)
+            self._df[ids] += 1
+            self._nnz = end
+            self._add_row(note)
+
+    def query(
+        self,
+        text: str,
+        note_type: Optional[str] = None,
+        k: int = RELATED_NOTES,
+        min_score: float = RELATED_MIN_SCORE,
+        exclude: Tuple[str, ...] = ()
+    ) -> List[Tuple[str, float]]:
+        """Pages of the k notes most similar to text, as (page, cosine), best first."""
+        ids, weights = features(text)
+        with self._lock:
+            nnz = self._nnz
+            count = len(self._notes)
+            if not len(ids) or not count:
+                return []
+            indices = self._indices[:nnz]
+            rows = self._rows[:nnz]
+            documents = len(self._latest)
+            idf = np.log((1.0 + documents) / (1.0 + self._df)).astype(np.float32) + 1.0
+
+            query = np.zeros(len(idf), dtype=np.float32)
+            query[ids] = weights * idf[ids]
+            query /= np.linalg.norm(query[ids])
+
+            weighted = self._weights[:nnz] * idf[indices]
+            dots = np.bincount(rows, weights=weighted * query[indices], minlength=count)
+            norms = np.sqrt(np.bincount(rows, weights=weighted * weighted, minlength=count))
+            scores = np.divide(dots, norms, out=np.zeros(count), where=norms > 0)
+
+            live = self._live[:count].copy()
+            if note_type:
+                live &= self._row_type[:count] == self._type_codes.get(note_type, -1)
+            for page in exclude:
+                if page in self._page_rows:
+                    live[self._page_rows[page]] = False
+            scores[~live] = -1.0  # Below any min_score: masked rows are never returned
+            notes = self._notes
+
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(notes[row]["page"], float(scores[row])) for row in top if scores[row] >= min_score]
+
+    def backfill(self, ledger: audio_ledger.AudioLedger) -> int:
+        """Add every ledger entry with a summary that is not in the matrix yet."""
+        count = 0
+        for note_type, audio, entry in ledger.entries():
+            if f"{note_type}/{audio}" in self._latest or not entry.get("page") or not entry.get("summary"):
+                continue
+            self.add(note_type, audio, Path(entry["page"]).stem, entry["summary"])
+            count += 1
+        return count
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"notes": len(self._latest), "rows": len(self._notes), "nonzeros": self._nnz}
+
+
+_related = None
+
+
+def get_related() -> RelatedNotes:
+    global _related
+    if _related is None:
+        _related = RelatedNotes()
+    return _related
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Related notes (hashed TF-IDF)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="notes most similar to a text")
+    query.add_argument("text")
+    query.add_argument("--type", dest="note_type")
+    query.add_argument("--limit", type=int, default=RELATED_NOTES)
+    commands.add_parser("backfill", help="add the summaries in the audio ledger")
+    commands.add_parser("stats", help="matrix size")
+    args = parser.parse_args()
+
+    related = get_related()
+    if args.command == "query":
+        hits = related.query(args.text, args.note_type, args.limit, min_score=0.0)
+        if not hits:
+            print("No related notes")
+        for page, score in hits:
+            print(f"{score:.3f}  [[{page}]]")
+    elif args.command == "backfill":
+        count = related.backfill(audio_ledger.AudioLedger(audio_ledger.LEDGER_PATH))
+        print(f"Added {count} note(s)")
+    else:
+        stats = related.stats()
+        print(f"{stats['notes']} notes ({stats['rows']} rows), {stats['nonzeros']} nonzeros")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Resource Governor: Keep Whisper jobs from starving interactive use of the host.
+
+Sets the torch intra-op thread count per job, applies nice/CPU-affinity
+policies to worker processes, and backs off while the host is busy (load
+average) or someone is using it interactively, ramping back up when idle.
+
+Job priority comes from the type config ("priority": "background" | "normal"
+| "urgent"). Urgent jobs are never throttled; background jobs are deferred
+and squeezed onto fewer cores while the governor is backed off.
+"""
+
+import os
+import math
+import time
+import errno
+import resource
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Threads per job at full speed (0 = all cores)
+MAX_THREADS = int(os.getenv("GOVERNOR_MAX_THREADS") or 0) or CPU_COUNT
+
+# Load average per core above which we back off, and below which we ramp up
+LOAD_HIGH = float(os.getenv("GOVERNOR_LOAD_HIGH", "0.75"))
+LOAD_LOW = float(os.getenv("GOVERNOR_LOAD_LOW", "0.40"))
+
+# File touched by a desktop/idle hook while the machine is in interactive use
+INTERACTIVE_FILE = os.getenv("GOVERNOR_INTERACTIVE_FILE", "")
+INTERACTIVE_WINDOW = float(os.getenv("GOVERNOR_INTERACTIVE_WINDOW", "120"))
+
+# How long a background job waits for the host to calm down before starting
+MAX_DEFER = float(os.getenv("GOVERNOR_MAX_DEFER", "900"))
+
+POLL_INTERVAL = 5
+
+# Time constant of the kernel's 1-minute load average
+LOAD_WINDOW = 60.0
+
+NICE = {"background": 15, "normal": 5, "urgent": 0}
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """Parse a CPU list like '0-3,6' into [0, 1, 2, 3, 6]."""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            low, high = part.split("-", 1)
+            cpus.extend(range(int(low), int(high) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def _allowed_cpus() -> List[int]:
+    spec = os.getenv("GOVERNOR_CPUS", "")
+    if spec:
+        return parse_cpu_list(spec)
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(CPU_COUNT))
+
+
+def _thread_ids(pid: int) -> List[int]:
+    """All thread ids of a process (nice and affinity are per-thread on Linux)."""
+    try:
+        return [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        return [pid]
+
+
+def lowest_nice() -> int:
+    """
+    Lowest nice value this process may set. Raising nice is always allowed;
+    lowering it needs CAP_SYS_NICE (root here) or stays above 20 - RLIMIT_NICE.
+    """
+    if os.geteuid() == 0:
+        return -20
+    try:
+        return 20 - resource.getrlimit(resource.RLIMIT_NICE)[0]
+    except (AttributeError, ValueError, OSError):
+        return 20
+
+
+def interactive_active() -> bool:
+    """True if the interactive-use signal file was touched recently."""
+    if not INTERACTIVE_FILE:
+        return False
+    try:
+        return time.time() - Path(INTERACTIVE_FILE).stat().st_mtime < INTERACTIVE_WINDOW
+    except OSError:
+        return False
+
+
+def host_load() -> float:
+    """1-minute load average per core."""
+    try:
+        return os.getloadavg()[0] / CPU_COUNT
+    except OSError:
+        return 0.0
+
+
+class ResourceGovernor:
+    """Decides per-job thread counts and throttles running workers."""
+
+    def __init__(self, max_threads: int = MAX_THREADS, cpus: Optional[List[int]] = None):
+        self.max_threads = max(1, max_threads)
+        self.cpus = cpus or _allowed_cpus()
+        self.backed_off = False
+        self._running = {}  # pid -> (priority, job settings)
+        self._own_load = 0.0  # Our workers' share of the load average (same decay)
+        self._updated = None
+        self._refused = set()  # (pid, nice) renices already reported as refused
+        self.lowest_nice = lowest_nice()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def own_load(self, now: Optional[float] = None) -> float:
+        """
+        Load per core our own workers account for: the threads of running
+        jobs, or, as the load average decays after a job, their decaying share.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            threads = sum(settings.get("threads", 0) for _, settings in self._running.values())
+            current = threads / CPU_COUNT
+            if self._updated is not None:
+                # Same exponential moving average as the kernel's loadavg
+                decay = math.exp(-max(0.0, now - self._updated) / LOAD_WINDOW)
+                self._own_load = self._own_load * decay + current * (1 - decay)
+            self._updated = now
+            return max(current, self._own_load)
+
+    def update(self, load: Optional[float] = None, now: Optional[float] = None) -> bool:
+        """
+        Re-evaluate host pressure (with hysteresis); returns backed_off.
+        Only load from outside the service counts: our own jobs must not
+        make the governor back off from (and then defer) our own jobs.
+        """
+        load = (host_load() if load is None else load) - self.own_load(now)
+        interactive = interactive_active()
+        if not self.backed_off and (interactive or load > LOAD_HIGH):
+            self.backed_off = True
+            logger.info(f"🐢 Backing off (load/core {load:.2f}, interactive={interactive})")
+        elif self.backed_off and not interactive and load < LOAD_LOW:
+            self.backed_off = False
+            logger.info(f"🐇 Ramping up (load/core {load:.2f})")
+        return self.backed_off
+
+    def job_settings(self, priority: str = "normal") -> Dict:
+        """
+        Thread count and CPU set for a job about to start. Both hold for the
+        whole job: the worker sets its torch threads once, so narrowing its
+        CPUs mid-job would oversubscribe them (nice is applied by track()).
+        """
+        threads = self.max_threads
+        if self.backed_off and priority != "urgent":
+            divisor = 4 if priority == "background" else 2
+            threads = max(1, self.max_threads // divisor)
+        return {"threads": threads, "cpus": self._cpus_for(priority)}
+
+    def wait_turn(self, priority: str = "normal"):
+        """Defer background jobs while backed off (up to MAX_DEFER seconds)."""
+        if priority != "background":
+            return
+        deadline = time.monotonic() + MAX_DEFER
+        while self.update() and time.monotonic() < deadline and not self._stop.is_set():
+            self._stop.wait(POLL_INTERVAL)
+
+    def _cpus_for(self, priority: str) -> List[int]:
+        if not self.backed_off or priority == "urgent":
+            return self.cpus
+        share = 4 if priority == "background" else 2
+        return self.cpus[:max(1, len(self.cpus) // share)]
+
+    def nice_for(self, priority: str = "normal") -> int:
+        return NICE.get(priority, NICE["normal"])
+
+    def can_renice(self, current: int, priority: str = "normal") -> bool:
+        """Whether a process at nice `current` can be set to the nice of priority."""
+        nice = self.nice_for(priority)
+        return nice >= current or nice >= self.lowest_nice
+
+    def apply(self, pid: int, priority: str = "normal", cpus: Optional[List[int]] = None) -> bool:
+        """
+        Apply nice and CPU affinity (default: the priority's current share)
+        to every thread of a worker process. Returns False if the nice value
+        was refused (the worker keeps its current one; WhisperPool recycles
+        workers it cannot renice).
+        """
+        nice = self.nice_for(priority)
+        cpus = cpus or self._cpus_for(priority)
+        reniced = True
+        for tid in _thread_ids(pid):
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except (OSError, AttributeError):
+                pass
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, nice)
+            except OSError as e:
+                if e.errno == errno.ESRCH:
+                    continue  # Thread exited meanwhile
+                reniced = False
+                if (pid, nice) not in self._refused:
+                    self._refused.add((pid, nice))
+                    logger.warning(f"Could not set nice {nice} on worker {pid} ({priority} job): {e}")
+        return reniced
+
+    def track(self, pid: int, priority: str = "normal", settings: Optional[Dict] = None) -> bool:
+        """
+        Start governing a worker running a job with settings (from
+        job_settings()); returns apply()'s result.
+        """
+        settings = settings or self.job_settings(priority)
+        with self._lock:
+            self._running[pid] = (priority, settings)
+        return self.apply(pid, priority, settings.get("cpus"))
+
+    def untrack(self, pid: int):
+        with self._lock:
+            self._running.pop(pid, None)
+            self._refused = {refused for refused in self._refused if refused[0] != pid}
+
+    def _monitor(self):
+        # Re-apply every tick: worker thread pools may have grown since track().
+        # A running job keeps the CPUs it started with (see job_settings)
+        while not self._stop.wait(POLL_INTERVAL):
+            self.update()
+            with self._lock:
+                running = list(self._running.items())
+            for pid, (priority, settings) in running:
+                self.apply(pid, priority, settings.get("cpus"))
+
+    def start(self):
+        """Start the background monitor thread."""
+        self.update()
+        self._thread = threading.Thread(target=self._monitor, name="governor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Response Cache: On-disk, content-addressed cache of LLM responses.
+
+Keyed on (model, messages, temperature, max_tokens) so re-running a note,
+retrying after a downstream failure or reprocessing the archive replays
+identical prompts from disk instead of calling the API again. Entries
+expire after a TTL and the least recently used are evicted once the cache
+exceeds its size limit. Hit/miss counts are kept per note type.
+
+The cache's total size is kept as a running sum in the meta table (updated
+by triggers on every insert, update and delete), so the size check on each
+put is a single-row read rather than a SUM over the whole table.
+
+SQLite is used so the summarizer subprocesses can share it safely.
+
+Usage:
+    python response_cache.py stats
+    python response_cache.py prune
+    python response_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH") or Path(__file__).parent / "state" / "llm_cache.sqlite")
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT,
+    size INTEGER,
+    created REAL,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    note_type TEXT PRIMARY KEY,
+    hits INTEGER DEFAULT 0,
+    misses INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+# Seeds the running size of caches created before it existed, then keeps it
+# current; run in one transaction so no write slips in between
+SIZE_SCHEMA = """
+BEGIN IMMEDIATE;
+INSERT OR IGNORE INTO meta VALUES ('size', (SELECT COALESCE(SUM(size), 0) FROM responses));
+CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'size';
+END;
+COMMIT;
+"""
+
+
+def make_key(model: str, messages: List[Dict], temperature=None, max_tokens=None, extra: Optional[Dict] = None) -> str:
+    """Content address for a request (`extra`: any other parameters that shape the response)."""
+    request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if extra:
+        request["extra"] = extra
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU size-bounded response store."""
+
+    def __init__(self, path: Path = CACHE_PATH, ttl: float = TTL_SECONDS, max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            db.executescript(SIZE_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads and processes
+        db = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, db, note_type: str, column: str):
+        db.execute("INSERT OR IGNORE INTO stats (note_type) VALUES (?)", (note_type,))
+        db.execute(f"UPDATE stats SET {column} = {column} + 1 WHERE note_type = ?", (note_type,))
+
+    def get(self, key: str, note_type: str = "unknown") -> Optional[str]:
+        """Return a cached response (and count the hit or miss)."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(db, note_type, "misses")
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count(db, note_type, "hits")
+            return row[0]
+
+    def put(self, key: str, response: str, model: str = ""):
+        """Store a response and evict least recently used entries if over size."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._connect() as db:
+            # An upsert, not INSERT OR REPLACE: REPLACE's implicit delete skips the size trigger
+            db.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "model = excluded.model, response = excluded.response, size = excluded.size, "
+                "created = excluded.created, last_used = excluded.last_used",
+                (key, model, response, size, now, now)
+            )
+            self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def prune(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        if not self.ttl:
+            return 0
+        with self._connect() as db:
+            cursor = db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            return cursor.rowcount
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM stats")
+
+    def stats(self) -> Dict:
+        """Entry count, size and per-type hit/miss counts."""
+        with self._connect() as db:
+            entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+            by_type = {
+                note_type: {"hits": hits, "misses": misses}
+                for note_type, hits, misses in db.execute("SELECT note_type, hits, misses FROM stats")
+            }
+        return {"entries": entries, "size_mb": round(size / 1024 / 1024, 2), "by_type": by_type}
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = ResponseCache()
+    if command == "stats":
+        stats = cache.stats()
+        print(f"Entries: {stats['entries']} ({stats['size_mb']} MB)")
+        for note_type, counts in sorted(stats["by_type"].items()):
+            total = counts["hits"] + counts["misses"]
+            rate = counts["hits"] / total * 100 if total else 0
+            print(f"  {note_type}: {counts['hits']} hits / {counts['misses']} misses ({rate:.0f}% hit rate)")
+    elif command == "prune":
+        print(f"Removed {cache.prune()} expired entries")
+    elif command == "clear":
+        cache.clear()
+        print("Cache cleared")
+    else:
+        print("Usage: python response_cache.py {stats|prune|clear}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
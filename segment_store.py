@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Segment Store: Whisper segments as a compact, memory-mapped columnar sidecar.
+
+The page only keeps "(M:SS) text" lines; the full segments (end times, token
+ids, avg_logprob, no_speech_prob, compression_ratio) are saved next to the
+archived audio as <audio stem>.segments, so chunkers, search and clip
+export can read them without re-parsing text.
+
+Layout (Arrow-style, little endian, every column 8-byte aligned):
+    b"VNSEG001"  magic
+    uint32       header length
+    header       JSON: {"count": n, "columns": {name: [dtype, offset, length]}}
+    columns      start, end (float64 seconds: float32 drifts by more than a
+                 millisecond after ~4.5 hours); avg_logprob, no_speech_prob,
+                 compression_ratio (float32 per segment); text_offsets /
+                 token_offsets (int64, n + 1) into text (concatenated UTF-8)
+                 and tokens (int32)
+
+Each column's dtype is stored in the header, so files written with float32
+times still load.
+
+load() maps the file and returns numpy views into it, and Segments.between()
+slices by time range without copying: it binary-searches the start/end
+columns and returns views over the same buffer.
+
+Usage:
+    python segment_store.py recording.segments [from_seconds to_seconds]
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+MAGIC = b"VNSEG001"
+ALIGN = 8
+
+FLOAT_COLUMNS = ("start", "end", "avg_logprob", "no_speech_prob", "compression_ratio")
+TIME_COLUMNS = ("start", "end")
+
+
+def sidecar_path(audio_path: Path) -> Path:
+    """Where the segments of an archived recording are stored."""
+    return audio_path.with_name(f"{audio_path.stem}.segments")
+
+
+class Segments:
+    """Columnar view over stored segments (numpy arrays, usually mmapped)."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], text: np.ndarray, tokens: np.ndarray):
+        # text_offsets / token_offsets have one more entry than the segments
+        # and index into the full text / tokens buffers (not rebased on slicing)
+        self.columns = columns
+        self._text = text
+        self._tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self.columns["start"])
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def text(self, index: int) -> str:
+        offsets = self.columns["text_offsets"]
+        return self._text[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+    def tokens(self, index: int) -> np.ndarray:
+        offsets = self.columns["token_offsets"]
+        return self._tokens[offsets[index]:offsets[index + 1]]
+
+    def slice(self, first: int, last: int) -> "Segments":
+        """Segments first..last-1, as views (no copy)."""
+        columns = {name: column[first:last] for name, column in self.columns.items() if not name.endswith("_offsets")}
+        columns["text_offsets"] = self.columns["text_offsets"][first:last + 1]
+        columns["token_offsets"] = self.columns["token_offsets"][first:last + 1]
+        return Segments(columns, self._text, self._tokens)
+
+    def between(self, start: float, end: float) -> "Segments":
+        """Segments overlapping [start, end) seconds, as views (no copy)."""
+        first = int(np.searchsorted(self.columns["end"], start, side="right"))
+        last = int(np.searchsorted(self.columns["start"], end, side="left"))
+        return self.slice(first, max(first, last))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.segment(i)
+
+    def segment(self, index: int) -> Dict:
+        """One segment as the dict shape WhisperPool.transcribe() returns."""
+        segment = {name: float(self.columns[name][index]) for name in FLOAT_COLUMNS}
+        segment["text"] = self.text(index)
+        segment["tokens"] = self.tokens(index).tolist()
+        return segment
+
+
+def _columns(segments: List[Dict]) -> Dict[str, np.ndarray]:
+    """Segment dicts as columns (missing scores stored as NaN)."""
+    columns = {
+        name: np.array([
+            np.nan if segment.get(name) is None else segment[name] for segment in segments
+        ], dtype="<f8" if name in TIME_COLUMNS else "<f4")
+        for name in FLOAT_COLUMNS
+    }
+    texts = [segment["text"].encode("utf-8") for segment in segments]
+    tokens = [segment.get("tokens") or [] for segment in segments]
+    columns["text_offsets"] = np.concatenate(([0], np.cumsum([len(t) for t in texts]))).astype("<i8")
+    columns["token_offsets"] = np.concatenate(([0], np.cumsum([len(t) for t in tokens]))).astype("<i8")
+    columns["text"] = np.frombuffer(b"".join(texts), dtype=np.uint8)
+    columns["tokens"] = np.array([token for t in tokens for token in t], dtype="<i4")
+    return columns
+
+
+def save(path: Path, segments: List[Dict]):
+    """Write segments to path atomically."""
+    columns = _columns(segments)
+
+    layout = {}
+    offset = 0
+    for name, column in columns.items():
+        layout[name] = [column.dtype.str, offset, len(column)]
+        offset += -(-column.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"count": len(segments), "columns": layout}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGN)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for column in columns.values():
+            data = column.tobytes()
+            f.write(data + b"\0" * (-len(data) % ALIGN))
+    os.replace(tmp_path, path)
+
+
+def load(path: Path) -> Segments:
+    """Map a sidecar file; the returned arrays are read-only views into it."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"not a segments file: {path}")
+    (header_length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    base = len(MAGIC) + 4 + header_length
+    header = json.loads(bytes(buffer[len(MAGIC) + 4:base]))
+
+    columns = {
+        name: np.frombuffer(buffer, dtype=dtype, count=length, offset=base + offset)
+        for name, (dtype, offset, length) in header["columns"].items()
+    }
+    text = columns.pop("text")
+    tokens = columns.pop("tokens")
+    return Segments(columns, text, tokens)
+
+
+def with_previous_details(segments: List[Dict], kept: int, path: Path) -> List[Dict]:
+    """
+    For an appended recording whose first `kept` segments came from an older
+    ledger entry (start/end/text only), take their tokens and scores from the
+    sidecar the previous transcription left at path, where they still line up.
+    """
+    if not kept or not path.exists():
+        return segments
+    try:
+        previous = load(path)
+    except (OSError, ValueError):
+        return segments
+    merged = list(segments)
+    for i in range(min(kept, len(previous))):
+        if "tokens" not in merged[i] and abs(previous.start[i] - merged[i]["start"]) < 1e-3:
+            merged[i] = {**previous.segment(i), **merged[i]}
+    return merged
+
+
+def _format_timestamp(seconds: float) -> str:
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 4):
+        print(__doc__.strip().split("Usage:")[1], file=sys.stderr)
+        sys.exit(1)
+    segments = load(Path(sys.argv[1]))
+    if len(sys.argv) == 4:
+        segments = segments.between(float(sys.argv[2]), float(sys.argv[3]))
+    for i in range(len(segments)):
+        print(f"({_format_timestamp(float(segments.start[i]))}) {segments.text(i)}  "
+              f"[logprob {segments.avg_logprob[i]:.2f}, no-speech {segments.no_speech_prob[i]:.2f}]")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Structured Output: One JSON-schema-constrained completion for many sections.
+
+The multi-stage summarizers normally make one call per section. In fused
+mode the same section tasks are sent as a single task and the model returns
+every section as a field of one JSON object, constrained by a strict JSON
+schema (response_format) and validated before it is rendered.
+
+Backends that reject response_format (older models, some local servers) are
+remembered per backend and model in state/structured_unsupported.json, so
+later notes go straight to staged mode instead of failing first.
+"""
+
+import os
+import sys
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_backend
+import llm_usage
+
+UNSUPPORTED_PATH = Path(
+    os.getenv("STRUCTURED_UNSUPPORTED_PATH") or Path(__file__).parent / "state" / "structured_unsupported.json"
+)
+
+# Status codes a backend answers an unsupported request parameter with
+REJECTED_STATUS = {400, 422}
+
+_unsupported: Optional[Set[str]] = None
+_unsupported_lock = threading.Lock()
+
+
+class InvalidSections(ValueError):
+    """The model's JSON did not match the section schema."""
+
+
+def response_format(name: str, sections: List[str]) -> Dict:
+    """Strict json_schema response_format: one required string per section."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {section: {"type": "string"} for section in sections},
+                "required": list(sections),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def fused_task(tasks: Dict[str, str]) -> str:
+    """Combine per-section tasks into one task asking for a JSON object."""
+    parts = [
+        "Return a single JSON object with one field per section below. Each field's value is "
+        "that section's markdown, written exactly as the section's own instructions ask "
+        "(use \\n for line breaks)."
+    ]
+    for section, task in tasks.items():
+        parts.append(f'=== Field "{section}" ===\n{task.strip()}')
+    return "\n\n".join(parts)
+
+
+def parse_sections(text: str, sections: List[str]) -> Dict[str, str]:
+    """Parse and validate the model's JSON; raises InvalidSections."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[text.find("{"):text.rfind("}") + 1]
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise InvalidSections(f"response is not JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise InvalidSections("response is not a JSON object")
+    missing = [s for s in sections if not isinstance(data.get(s), str) or not data[s].strip()]
+    if missing:
+        raise InvalidSections(f"missing or empty sections: {missing}")
+    return {section: data[section].strip() for section in sections}
+
+
+def is_rejection(error: Exception) -> bool:
+    """Whether an API error is the backend refusing response_format itself."""
+    if getattr(error, "status_code", None) not in REJECTED_STATUS:
+        return False
+    message = str(error).lower()
+    return any(word in message for word in ("response_format", "json_schema", "schema"))
+
+
+def _endpoint(config: Optional[Dict], stage: str) -> str:
+    """Backend and model a call of this stage is routed to (as llm_gateway.chat routes it)."""
+    rule = llm_backend.length_rule(config, llm_usage.current_job().transcript_tokens)
+    backend, model = llm_backend.route(config, stage, None, rule)
+    return f"{backend.name}/{model}"
+
+
+def _load_unsupported() -> Set[str]:
+    global _unsupported
+    if _unsupported is None:
+        try:
+            _unsupported = set(json.loads(UNSUPPORTED_PATH.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            _unsupported = set()
+    return _unsupported
+
+
+def supported(config: Optional[Dict], stage: str = "fused") -> bool:
+    """False once the endpoint this stage routes to has rejected response_format."""
+    with _unsupported_lock:
+        return _endpoint(config, stage) not in _load_unsupported()
+
+
+def mark_unsupported(config: Optional[Dict], stage: str = "fused"):
+    """Remember that the endpoint this stage routes to rejects response_format."""
+    with _unsupported_lock:
+        unsupported = _load_unsupported()
+        unsupported.add(_endpoint(config, stage))
+        UNSUPPORTED_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = UNSUPPORTED_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(sorted(unsupported)), encoding="utf-8")
+        os.replace(tmp_path, UNSUPPORTED_PATH)
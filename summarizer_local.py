@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Local Summarizer: Standalone AI summarization using OpenAI API.
+Local Summarizer: Standalone AI summarization via the LLM gateway
+(hosted OpenAI API or a local OpenAI-compatible server, see llm_backend.py).
 No project_wizard dependency. Generates Logseq-formatted summaries.
 
 Output follows strict Logseq markdown rules:
@@ -17,111 +18,165 @@ import json
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
 # Add voice_notes to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
 import type_manager
-
+import llm_gateway
+import llm_usage
+import transcript_compactor
+import logseq_blocks
 
 
 # Load environment variables
 load_dotenv(Path(__file__).parent / ".env")
 
+# Output budget for the summary call (the service scales its deadline by this)
+MAX_TOKENS = 2000
+
+# Marker placed under a summary whose stream was cut off
+PARTIAL_NOTE = "⚠️ Summary incomplete: generation was cut off, see raw transcript below."
+
+# Text of the summary used when the LLM call fails outright
+FALLBACK_NOTE = "Unable to generate AI summary. See raw transcript below."
+
+# Raw transcript placement: "inline" (collapsed <details> on the summary page)
+# or "pages" (separate transcript pages linked from the summary page, so long
+# transcripts are only parsed when opened). Per type: "transcript": {"mode": ...}
+TRANSCRIPT_MODE = os.getenv("TRANSCRIPT_MODE", "inline")
+TRANSCRIPT_PAGE_LINES = 300
+
+
 def correct_transcript_with_domain(transcript: str, domain_dict: Dict) -> str:
     """
     Apply domain-specific corrections to transcript.
     Replaces common Whisper misrecognitions with correct terms.
     """
-    corrected = transcript
-    
+    return domain_corrector(domain_dict)(transcript)
+
+
+def _domain_pattern(domain_dict: Dict) -> Tuple[Dict[str, str], Optional[re.Pattern]]:
+    """Domain terms (lowercase -> correct spelling) and one pattern matching any of them."""
     # Process all domain categories (techniques, positions, concepts, terminology)
-    for category, terms in domain_dict.items():
-        if not isinstance(terms, list):
+    terms = {}
+    for category, category_terms in domain_dict.items():
+        if not isinstance(category_terms, list):
             continue
-        
-        for term in terms:
-            # Case-insensitive search and replace
-            # Use word boundaries to avoid partial matches
-            pattern = r'\b' + re.escape(term) + r'\b'
-            # Find matches and preserve original case where possible
-            matches = re.finditer(pattern, corrected, re.IGNORECASE)
-            for match in matches:
-                original_text = match.group(0)
-                # Replace with the term from our domain dict (correct spelling)
-                corrected = corrected[:match.start()] + term + corrected[match.end():]
+        for term in category_terms:
+            terms.setdefault(term.lower(), term)
+    if not terms:
+        return terms, None
     
-    return corrected
+    # Case-insensitive, whole words only; longest first so phrases win
+    pattern = re.compile(
+        r"\b(?:" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")\b",
+        re.IGNORECASE
+    )
+    return terms, pattern
+
+
+def domain_corrector(domain_dict: Dict) -> Callable[[str], str]:
+    """
+    Build the domain correction as one compiled pattern, so it can be applied
+    line by line (e.g. while a page is streamed) without re-scanning per term.
+    """
+    terms, pattern = _domain_pattern(domain_dict)
+    if pattern is None:
+        return lambda text: text
+    # Replace with the term from our domain dict (correct spelling)
+    return lambda text: pattern.sub(lambda match: terms.get(match.group(0).lower(), match.group(0)), text)
+
+
+def domain_matcher(domain_dict: Dict) -> Callable[[str], Dict[str, int]]:
+    """
+    The domain terms a text mentions, with counts (same matching as the
+    correction: whole words, longest term first), keyed by correct spelling.
+    """
+    terms, pattern = _domain_pattern(domain_dict)
+    if pattern is None:
+        return lambda text: {}
+    return lambda text: dict(Counter(terms[match.lower()] for match in pattern.findall(text)))
 
 
 def generate_summary(
     transcript: str,
     note_type: str,
     config: Dict,
-    filename: str = "unknown"
+    filename: str = "unknown",
+    previous_summary: Optional[str] = None,
+    on_token: Optional[Callable[[str], None]] = None
 ) -> str:
     """
-    Generate type-specific summary using OpenAI API.
+    Generate type-specific summary using the configured LLM backend.
     
     Args:
         transcript: Raw transcript text
         note_type: Type of note (bjj, meeting, etc.)
         config: Type configuration dict
         filename: Original audio filename
+        previous_summary: Summary of the earlier part of a recording that has
+            grown; `transcript` is then only the newly appended portion
+        on_token: Called with each chunk of summary text as it streams in
     
     Returns:
         Logseq markdown summary
     """
-    try:
-        from openai import OpenAI
-    except ImportError:
-        print("ERROR: openai package not installed. Install with: pip install openai", file=sys.stderr)
-        return _fallback_summary(transcript, config)
-    
-    # Initialize OpenAI client (uses OPENAI_API_KEY env var)
-    try:
-        client = OpenAI()
-    except Exception as e:
-        print(f"ERROR: Failed to initialize OpenAI client: {e}", file=sys.stderr)
-        return _fallback_summary(transcript, config)
-    
     prompts = type_manager.get_prompts(config)
     system_prompt = prompts.get("system", "You are a helpful summarizer.")
     user_prompt_template = prompts.get("user", "Summarize: {{transcript}}")
     
     # Substitute transcript into prompt
-    user_prompt = user_prompt_template.replace("{{transcript}}", transcript[:4000])
+    user_prompt = user_prompt_template.replace("{{transcript}}", transcript)
+    
+    if previous_summary:
+        user_prompt = (
+            "The earlier part of this recording was already summarized as:\n\n"
+            f"{previous_summary}\n\n"
+            "The transcript below is only the continuation of the recording. "
+            "Return the complete updated summary covering both parts.\n\n"
+            + user_prompt
+        )
     
     # Add Logseq formatting requirements to system prompt
     enhanced_system = system_prompt + "\n\nIMPORTANT OUTPUT FORMAT:\n- Output must use markdown outline format\n- Each bullet on SEPARATE LINE starting with dash (-)\n- Use tab indentation for nested points (one tab = one level)\n- Do NOT use bullet symbols like •, ◦, or *\n- Do NOT put multiple points in single paragraph\n- Do NOT leave empty lines between bullets"
     
     try:
-        print(f"🤖 Calling OpenAI API for {note_type} summary...", file=sys.stderr)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        print(f"🤖 Calling LLM for {note_type} summary...", file=sys.stderr)
+        summary_text = llm_gateway.chat(
             messages=[
                 {"role": "system", "content": enhanced_system},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.7,
-            max_tokens=2000
-        )
-        
-        summary_text = response.choices[0].message.content.strip()
+            max_tokens=MAX_TOKENS,
+            config=config,
+            on_token=on_token
+        ).strip()
         print(f"✓ Summary generated ({len(summary_text.split())} words)", file=sys.stderr)
         return summary_text
         
+    except llm_gateway.PartialResponse as e:
+        # Keep what was generated rather than discarding it for the fallback
+        print(f"⚠️  {e}", file=sys.stderr)
+        return f"{e.text.strip()}\n- {PARTIAL_NOTE}"
+    except ImportError:
+        print("ERROR: openai package not installed. Install with: pip install openai", file=sys.stderr)
+        return _fallback_summary(transcript, config)
     except Exception as e:
-        print(f"ERROR: OpenAI API call failed: {e}", file=sys.stderr)
+        print(f"ERROR: LLM call failed: {e}", file=sys.stderr)
         return _fallback_summary(transcript, config)
 
 
 def _fallback_summary(transcript: str, config: Dict) -> str:
     """Generate minimal fallback summary when LLM fails."""
     return f"""## Summary
-- Unable to generate AI summary. See raw transcript below."""
+- {FALLBACK_NOTE}"""
 
 
 def format_output_logseq(
@@ -129,8 +184,43 @@ def format_output_logseq(
     transcript: str,
     filename: str,
     note_type: str,
-    config: Dict
+    config: Dict,
+    page_stem: Optional[str] = None,
+    related: Sequence[str] = ()
 ) -> str:
+    """Whole page as one string (see render_page)."""
+    return "".join(render_page(summary, transcript.split("\n"), filename, note_type, config, page_stem, related))
+
+
+def render_page(
+    summary: str,
+    transcript_lines: Sequence[str],
+    filename: str,
+    note_type: str,
+    config: Dict,
+    page_stem: Optional[str] = None,
+    related: Sequence[str] = ()
+) -> Iterator[str]:
+    """
+    Render the page as chunks, for writing straight into the page file.
+    Transcript lines are read one at a time, so a lazy sequence (e.g. over
+    Whisper segments) is never joined into one string.
+    """
+    first = True
+    for line in _page_lines(summary, transcript_lines, filename, note_type, config, page_stem, related):
+        yield line if first else "\n" + line
+        first = False
+
+
+def _page_lines(
+    summary: str,
+    transcript_lines: Sequence[str],
+    filename: str,
+    note_type: str,
+    config: Dict,
+    page_stem: Optional[str],
+    related: Sequence[str]
+) -> Iterator[str]:
     """
     Format final output as Logseq markdown following strict rules:
     - Proper metadata (processed:: false)
@@ -139,6 +229,8 @@ def format_output_logseq(
     - Correct heading structure
     - Transcript formatted as Logseq bullets
     - Long transcripts split into multiple sections
+    - In "pages" transcript mode (page_stem given), links to transcript pages
+    - related:: links to the most similar past notes (related_notes.py)
     """
     
     # Create title from filename
@@ -149,71 +241,97 @@ def format_output_logseq(
     date = datetime.now().strftime("%Y-%m-%d")
     note_type_tag = note_type  # Passed as parameter
     
-    # Build output following Logseq rules
-    output_lines = []
-    
     # Header (H1)
-    output_lines.append(f"# 🎙️ {title}")
-    output_lines.append("")  # Blank line after header
+    yield f"# 🎙️ {title}"
+    yield ""  # Blank line after header
     
     # Metadata properties (must come before content)
-    output_lines.append(f"tags:: #voice-note #{note_type_tag} #inbox")
-    output_lines.append(f"recorded:: [[{date}]]")
-    output_lines.append(f"processed:: false")
-    output_lines.append("")  # Blank line after metadata
+    yield f"tags:: #voice-note #{note_type_tag} #inbox"
+    yield f"recorded:: [[{date}]]"
+    yield f"processed:: false"
+    if related:
+        yield "related:: " + ", ".join(f"[[{page}]]" for page in related)
+    yield ""  # Blank line after metadata
     
     # Separator
-    output_lines.append("---")
-    output_lines.append("")  # Blank line after separator
+    yield "---"
+    yield ""  # Blank line after separator
     
     # Summary content (ensure proper formatting)
-    output_lines.append("## Summary")
+    yield "## Summary"
     
     # Process summary to ensure Logseq bullet format
-    summary_formatted = _ensure_logseq_format(summary)
-    output_lines.append(summary_formatted)
+    yield _ensure_logseq_format(summary)
     
-    output_lines.append("")  # Blank line before next section
-    output_lines.append("---")
-    output_lines.append("")  # Blank line
+    yield ""  # Blank line before next section
+    yield "---"
+    yield ""  # Blank line
     
-    # Raw transcript - format as bullets and split if too long
-    output_lines.append("## 📄 Raw Transcript")
-    output_lines.append("")
+    # Raw transcript - linked pages or inline bullets split if too long
+    yield from iter_transcript_section(transcript_lines, config, page_stem)
+
+
+def transcript_pages(page_stem: str, transcript_lines: Sequence[str], config: Dict) -> List[Tuple[str, str]]:
+    """
+    Transcript pages for a summary page: (page name, content) per part.
+    Names only depend on the summary page and part number, so an appended
+    recording rewrites the same pages and adds new parts.
+    """
+    settings = type_manager.get_transcript_settings(config)
+    lines_per_page = settings.get("lines_per_page", TRANSCRIPT_PAGE_LINES)
+    bullets = [f"- {line}" for line in transcript_lines if line.strip()]
+    pages = []
+    for part, start in enumerate(range(0, max(len(bullets), 1), lines_per_page), start=1):
+        name = f"{page_stem} (transcript)" if part == 1 else f"{page_stem} (transcript {part})"
+        content = "\n".join(["tags:: #voice-transcript", ""] + bullets[start:start + lines_per_page])
+        pages.append((name, content))
+    return pages
+
+
+def iter_transcript_section(
+    transcript_lines: Sequence[str],
+    config: Dict,
+    page_stem: Optional[str] = None
+) -> Iterator[str]:
+    """Lines of the "Raw Transcript" section: page links, or inline <details> blocks."""
+    yield "## 📄 Raw Transcript"
+    yield ""
+    
+    settings = type_manager.get_transcript_settings(config)
+    if page_stem and settings.get("mode", TRANSCRIPT_MODE) == "pages":
+        # Written alongside the summary page by the service
+        total_lines = sum(1 for line in transcript_lines if line.strip())
+        lines_per_page = settings.get("lines_per_page", TRANSCRIPT_PAGE_LINES)
+        for part in range(1, max(1, -(-total_lines // lines_per_page)) + 1):
+            yield f"- [[{page_stem} (transcript)]]" if part == 1 else f"- [[{page_stem} (transcript {part})]]"
+        return
     
-    # Format transcript lines as Logseq bullets
-    transcript_lines = transcript.split("\n")
-    transcript_bullets = [f"- {line}" for line in transcript_lines if line.strip()]
+    # Format transcript lines as Logseq bullets (two passes: count, then emit)
+    transcript_bullets = (f"- {line}" for line in transcript_lines if line.strip())
     
     # Split into chunks if too long (100 lines per section to avoid performance issues)
     LINES_PER_SECTION = 100
-    total_lines = len(transcript_bullets)
+    total_lines = sum(1 for line in transcript_lines if line.strip())
     
     if total_lines <= LINES_PER_SECTION:
         # Single section
-        output_lines.append("<details>")
-        output_lines.append("<summary>Click to expand full transcript</summary>")
-        output_lines.append("")
-        output_lines.extend(transcript_bullets)
-        output_lines.append("")
-        output_lines.append("</details>")
+        yield "<details>"
+        yield "<summary>Click to expand full transcript</summary>"
+        yield ""
+        yield from transcript_bullets
+        yield ""
+        yield "</details>"
     else:
         # Multiple sections
         num_sections = (total_lines + LINES_PER_SECTION - 1) // LINES_PER_SECTION
         for section_num in range(num_sections):
-            start_idx = section_num * LINES_PER_SECTION
-            end_idx = min((section_num + 1) * LINES_PER_SECTION, total_lines)
-            section_lines = transcript_bullets[start_idx:end_idx]
-            
-            output_lines.append("<details>")
-            output_lines.append(f"<summary>Click to expand transcript (Part {section_num + 1} of {num_sections})</summary>")
-            output_lines.append("")
-            output_lines.extend(section_lines)
-            output_lines.append("")
-            output_lines.append("</details>")
-            output_lines.append("")  # Blank line between sections
-    
-    return "\n".join(output_lines)
+            yield "<details>"
+            yield f"<summary>Click to expand transcript (Part {section_num + 1} of {num_sections})</summary>"
+            yield ""
+            yield from islice(transcript_bullets, LINES_PER_SECTION)
+            yield ""
+            yield "</details>"
+            yield ""  # Blank line between sections
 
 
 def _ensure_logseq_format(text: str) -> str:
@@ -222,60 +340,40 @@ def _ensure_logseq_format(text: str) -> str:
     - Each line starts with dash (-)
     - Tab indentation for nesting
     - No empty lines between bullets
+    Single pass with exact nesting depth (see logseq_blocks.normalize).
     """
-    lines = text.split("\n")
-    output = []
-    
-    for line in lines:
-        line = line.rstrip()
-        
-        # Skip empty lines
-        if not line.strip():
-            continue
-        
-        # If it's a heading (##, ###), keep it as-is
-        if line.strip().startswith("#"):
-            output.append(line)
-            continue
-        
-        # Ensure bullet format
-        stripped = line.lstrip()
-        
-        # Count leading spaces/tabs for indentation
-        leading = len(line) - len(stripped)
-        indent_level = leading // 2  # Approximate tab level
-        
-        # If already a bullet, keep as-is
-        if stripped.startswith("-"):
-            output.append(line)
-        # If starts with number (1., 2.), convert to bullet
-        elif re.match(r"^\d+\.", stripped):
-            bullet_text = re.sub(r"^\d+\.\s*", "", stripped)
-            tabs = "\t" * indent_level if indent_level > 0 else ""
-            output.append(f"{tabs}- {bullet_text}")
-        # If starts with •, ◦, etc., convert to dash
-        elif re.match(r"^[•◦▪]\s", stripped):
-            bullet_text = re.sub(r"^[•◦▪]\s*", "", stripped)
-            tabs = "\t" * indent_level if indent_level > 0 else ""
-            output.append(f"{tabs}- {bullet_text}")
-        # Otherwise, make it a bullet
-        else:
-            tabs = "\t" * indent_level if indent_level > 0 else ""
-            output.append(f"{tabs}- {stripped}")
-    
-    return "\n".join(output)
+    return logseq_blocks.normalize(text)
+
+
+def _pop_option(args: list, name: str) -> Optional[str]:
+    """Remove `name value` from args and return value (None if absent)."""
+    if name not in args:
+        return None
+    index = args.index(name)
+    value = args[index + 1] if index + 1 < len(args) else None
+    del args[index:index + 2]
+    return value
 
 
 def main():
     """Main entry point for CLI usage."""
     
     if sys.stdin.isatty():
-        print("Usage: cat transcript.txt | python summarizer_local.py bjj filename.wav", file=sys.stderr)
+        print("Usage: cat transcript.txt | python summarizer_local.py bjj filename.wav "
+              "[--previous-summary summary.md --new-from LINE] [--partial partial.md] [--page PAGE] "
+              "[--result result.json]",
+              file=sys.stderr)
         sys.exit(1)
     
     # Parse arguments
-    note_type = sys.argv[1] if len(sys.argv) > 1 else "meeting"
-    filename = sys.argv[2] if len(sys.argv) > 2 else "unknown.wav"
+    args = sys.argv[1:]
+    previous_summary_path = _pop_option(args, "--previous-summary")
+    new_from = _pop_option(args, "--new-from")
+    partial_path = _pop_option(args, "--partial")
+    page_stem = _pop_option(args, "--page")
+    result_path = _pop_option(args, "--result")
+    note_type = args[0] if len(args) > 0 else "meeting"
+    filename = args[1] if len(args) > 1 else "unknown.wav"
     
     # Read transcript from stdin
     transcript = sys.stdin.read().strip()
@@ -295,11 +393,46 @@ def main():
             print(f"📖 Applying domain corrections...", file=sys.stderr)
             transcript = correct_transcript_with_domain(transcript, domain_dict)
         
-        # Step 2: Generate summary
-        summary = generate_summary(transcript, note_type, config, filename)
+        # Token/latency accounting (and length-based routing) for this job
+        llm_usage.begin_job(note_type, transcript, filename)
+        
+        # Stream summary tokens to the partial file so the caller can watch
+        # progress and salvage them if we are cut off
+        with (open(partial_path, "w", encoding="utf-8") if partial_path else nullcontext()) as partial_file:
+            on_token = None
+            if partial_file:
+                def on_token(token: str):
+                    partial_file.write(token)
+                    partial_file.flush()
+            
+            # Step 2: Generate summary (extend the previous one for appended recordings)
+            if previous_summary_path:
+                previous_summary = Path(previous_summary_path).read_text(encoding="utf-8")
+                new_lines = transcript.split("\n")[int(new_from or 0):]
+                print(f"⏩ Updating summary with {len(new_lines)} new lines...", file=sys.stderr)
+                summary = generate_summary(
+                    transcript_compactor.compact_for_llm("\n".join(new_lines), config), note_type, config,
+                    filename, previous_summary=previous_summary, on_token=on_token
+                )
+            else:
+                summary = generate_summary(
+                    transcript_compactor.compact_for_llm(transcript, config), note_type, config, filename,
+                    on_token=on_token
+                )
+        
+        # Step 3 (service): hand over just the summary; the service renders the
+        # page itself from its segments (no page-sized stdout round trip)
+        if result_path:
+            result = {
+                "summary": _ensure_logseq_format(summary),
+                "partial": PARTIAL_NOTE in summary,
+                "fallback": FALLBACK_NOTE in summary
+            }
+            Path(result_path).write_text(json.dumps(result), encoding="utf-8")
+            return
         
         # Step 3: Format output for Logseq
-        output = format_output_logseq(summary, transcript, filename, note_type, config)
+        output = format_output_logseq(summary, transcript, filename, note_type, config, page_stem)
         
         # Output to stdout
         print(output)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Shared prompt prefix of the v2 multi-stage summarizers (summarizer_v2_revised
+and summarizer_v2_multistage).
+
+Every extract_* stage sends the system prompt and transcript first, byte-
+identical across stages, so the provider's prompt-prefix cache (or a local
+server's KV cache) reuses them; only the task differs. Keeping the prompt in
+one place keeps both summarizers on the same cached prefix.
+"""
+
+import sys
+import json
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import type_manager
+import llm_gateway
+
+SYSTEM_PROMPT = """You are an experienced BJJ instructor turning a recorded class into \
+teachable, system-focused class notes. The class transcript is given first, followed \
+by one task. Answer only that task, in the format it asks for, using only what was \
+actually taught in the transcript."""
+
+
+def stage_messages(transcript: str, config: Dict, task: str) -> List[Dict]:
+    """Messages for one extraction stage: shared prefix, then the stage's task."""
+    domains = type_manager.get_domain_dictionary(config)
+    system = SYSTEM_PROMPT
+    if domains:
+        system += f"\n\nDOMAIN CONTEXT (use these terms):\n{json.dumps(domains, indent=2)}"
+    return llm_gateway.prefix_messages(system, transcript, task)
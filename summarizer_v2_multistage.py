@@ -2,6 +2,7 @@
 """
 Multi-stage summarizer for BJJ class notes.
 Uses specialized prompts for each section to create teachable, system-focused notes.
+Stages share a byte-identical system + transcript prefix so it is cached.
 """
 
 import sys
@@ -9,27 +10,22 @@ import os
 from pathlib import Path
 from datetime import datetime
 from typing import Dict
-import json
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from openai import OpenAI
 import type_manager
+import llm_gateway
+import llm_usage
+import structured_output
+import transcript_compactor
 
-# Initialize OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared system prompt + transcript prefix (cached across stages)
+from summarizer_v2_common import stage_messages
 
-def extract_techniques(transcript: str, config: Dict) -> str:
-    """Extract techniques demonstrated with minimal, teach-friendly descriptions."""
-    prompt = f"""Extract the techniques demonstrated in this BJJ class transcript.
-
-Format as a bulleted list with brief descriptions (1 sentence max each).
 
-DOMAIN CONTEXT:
-{json.dumps(config.get('domain_dictionary', {}), indent=2)}
+TECHNIQUES_TASK = """Extract the techniques demonstrated in this BJJ class transcript.
 
-Transcript:
-{transcript}
+Format as a bulleted list with brief descriptions (1 sentence max each).
 
 Output format:
 - Technique Name
@@ -37,17 +33,18 @@ Output format:
 
 List only the major techniques, 4-6 items."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_techniques(transcript: str, config: Dict) -> str:
+    """Extract techniques demonstrated with minimal, teach-friendly descriptions."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, TECHNIQUES_TASK),
         max_tokens=500,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="techniques"
     )
-    return response.choices[0].message.content
 
 
-def extract_key_positions(transcript: str, config: Dict) -> str:
-    """Extract key positions with descriptions."""
-    prompt = f"""Extract the key positions described in this BJJ transcript.
+KEY_POSITIONS_TASK = """Extract the key positions described in this BJJ transcript.
 
 These are the main positional milestones students will reach during the lesson.
 
@@ -55,22 +52,20 @@ Format each position with:
 - Position Name
   - What it is and how you know you're in it (1-2 sentences)
 
-Transcript:
-{transcript}
-
 List 4-6 key positions that represent major waypoints in the system."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_key_positions(transcript: str, config: Dict) -> str:
+    """Extract key positions with descriptions."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, KEY_POSITIONS_TASK),
         max_tokens=500,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="key_positions"
     )
-    return response.choices[0].message.content
 
 
-def extract_primary_sequence(transcript: str, config: Dict) -> str:
-    """Extract the primary attack sequence in step-by-step format."""
-    prompt = f"""Extract the PRIMARY attack sequence from this BJJ transcript.
+PRIMARY_SEQUENCE_TASK = """Extract the PRIMARY attack sequence from this BJJ transcript.
 This is the main entry and first technique the instructor emphasizes.
 
 Format as numbered steps:
@@ -81,22 +76,20 @@ Format as numbered steps:
 
 Keep to 5-7 steps maximum.
 Each step should be 1 sentence.
-Include at each step: what you're looking for / how you know you're doing it right.
+Include at each step: what you're looking for / how you know you're doing it right."""
 
-Transcript:
-{transcript}"""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+def extract_primary_sequence(transcript: str, config: Dict) -> str:
+    """Extract the primary attack sequence in step-by-step format."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, PRIMARY_SEQUENCE_TASK),
         max_tokens=800,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="primary_sequence"
     )
-    return response.choices[0].message.content
 
 
-def extract_follow_ups(transcript: str, config: Dict) -> str:
-    """Extract follow-up techniques based on opponent reactions."""
-    prompt = f"""Extract the follow-up techniques from this BJJ transcript.
+FOLLOW_UPS_TASK = """Extract the follow-up techniques from this BJJ transcript.
 These are reactions to what the opponent does after the primary attack.
 
 Format each follow-up as:
@@ -107,22 +100,20 @@ Format each follow-up as:
 2. [Step]
 (Keep to 3-5 steps max)
 
-List the main follow-ups (typically 2-4 options).
+List the main follow-ups (typically 2-4 options)."""
 
-Transcript:
-{transcript}"""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+def extract_follow_ups(transcript: str, config: Dict) -> str:
+    """Extract follow-up techniques based on opponent reactions."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, FOLLOW_UPS_TASK),
         max_tokens=1200,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="follow_ups"
     )
-    return response.choices[0].message.content
 
 
-def extract_drills(transcript: str, config: Dict) -> str:
-    """Extract drills with progression (entry → detail → reaction)."""
-    prompt = f"""Extract the drills and training progressions from this BJJ transcript.
+DRILLS_TASK = """Extract the drills and training progressions from this BJJ transcript.
 
 Each drill should follow this structure:
 ### Drill N: [Name]
@@ -135,22 +126,20 @@ Each drill should follow this structure:
 
 Create 3-4 drills in teaching progression order.
 Keep each to 3-5 steps.
-Structure as: Basic entry → Add detail → React to opponent
+Structure as: Basic entry → Add detail → React to opponent"""
 
-Transcript:
-{transcript}"""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+def extract_drills(transcript: str, config: Dict) -> str:
+    """Extract drills with progression (entry → detail → reaction)."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, DRILLS_TASK),
         max_tokens=1500,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="drills"
     )
-    return response.choices[0].message.content
 
 
-def extract_core_concepts(transcript: str, config: Dict) -> str:
-    """Extract principles, key insights, and teaching notes."""
-    prompt = f"""Extract the core concepts, principles, and key teaching points from this BJJ transcript.
+CORE_CONCEPTS_TASK = """Extract the core concepts, principles, and key teaching points from this BJJ transcript.
 
 Organize into three subsections:
 
@@ -164,20 +153,20 @@ Organize into three subsections:
 - Things students commonly do wrong (max 3-4)
 
 Keep each point to 1-2 sentences max.
-Remove any redundancy between sections.
+Remove any redundancy between sections."""
 
-Transcript:
-{transcript}"""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+def extract_core_concepts(transcript: str, config: Dict) -> str:
+    """Extract principles, key insights, and teaching notes."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, CORE_CONCEPTS_TASK),
         max_tokens=800,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="core_concepts"
     )
-    return response.choices[0].message.content
 
 
-def generate_overview(techniques: str, positions: str, primary: str, followups: str, drills: str) -> str:
+def generate_overview(techniques: str, positions: str, primary: str, followups: str, drills: str, config: Dict = None) -> str:
     """Synthesize overview after all content is extracted."""
     prompt = f"""Write a brief Overview section for BJJ class notes.
 This is written LAST after all other content is extracted.
@@ -210,12 +199,118 @@ Drills Overview:
 The overview should connect these pieces into a coherent teaching narrative.
 Do not repeat details - just tie them together."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    return llm_gateway.chat(
+        messages=[{"role": "user", "content": prompt}],
         max_tokens=400,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="overview"
+    )
+
+
+OVERVIEW_TASK = """Write a brief Overview section for BJJ class notes, written LAST
+after all the other sections so it can tie them together.
+
+**Primary Attack**
+A 2-3 sentence intro explaining the main entry point and why it matters.
+
+**Overview of Options**
+2-3 sentences explaining the follow-ups and decision tree.
+
+Connect the other sections into a coherent teaching narrative.
+Do not repeat details - just tie them together."""
+
+# Fused mode: all sections from one structured call, overview last as in staged mode
+FUSED_TASKS = {
+    "techniques": TECHNIQUES_TASK,
+    "key_positions": KEY_POSITIONS_TASK,
+    "primary_sequence": PRIMARY_SEQUENCE_TASK,
+    "follow_ups": FOLLOW_UPS_TASK,
+    "drills": DRILLS_TASK,
+    "core_concepts": CORE_CONCEPTS_TASK,
+    "overview": OVERVIEW_TASK,
+}
+FUSED_MAX_TOKENS = 5700  # Sum of the staged budgets
+
+# "staged" (one call per section) or "fused" (one JSON-schema call); --mode overrides
+DEFAULT_MODE = os.getenv("SUMMARIZER_V2_MODE", "staged")
+
+
+def extract_staged(transcript: str, config: Dict) -> Dict[str, str]:
+    """Staged mode: one call per section, overview synthesized last."""
+    print(f"📖 Extracting techniques...", file=sys.stderr)
+    techniques = extract_techniques(transcript, config)
+    
+    print(f"📍 Extracting key positions...", file=sys.stderr)
+    positions = extract_key_positions(transcript, config)
+    
+    print(f"🎯 Extracting primary sequence...", file=sys.stderr)
+    primary = extract_primary_sequence(transcript, config)
+    
+    print(f"🔄 Extracting follow-ups...", file=sys.stderr)
+    followups = extract_follow_ups(transcript, config)
+    
+    print(f"🏋️ Extracting drills...", file=sys.stderr)
+    drills = extract_drills(transcript, config)
+    
+    print(f"💡 Extracting core concepts...", file=sys.stderr)
+    concepts = extract_core_concepts(transcript, config)
+    
+    print(f"📋 Synthesizing overview...", file=sys.stderr)
+    overview = generate_overview(techniques, positions, primary, followups, drills, config)
+    
+    return {
+        "techniques": techniques,
+        "key_positions": positions,
+        "primary_sequence": primary,
+        "follow_ups": followups,
+        "drills": drills,
+        "core_concepts": concepts,
+        "overview": overview,
+    }
+
+
+def extract_fused(transcript: str, config: Dict) -> Dict[str, str]:
+    """Fused mode: every section from one JSON-schema-constrained call, validated."""
+    print(f"🧩 Extracting all sections in one structured call...", file=sys.stderr)
+    sections = list(FUSED_TASKS)
+    text = llm_gateway.chat(
+        messages=stage_messages(transcript, config, structured_output.fused_task(FUSED_TASKS)),
+        max_tokens=FUSED_MAX_TOKENS,
+        config=config,
+        stage="fused",
+        response_format=structured_output.response_format("bjj_note", sections)
+    )
+    return structured_output.parse_sections(text, sections)
+
+
+def extract_sections(transcript: str, config: Dict, mode: str = DEFAULT_MODE) -> Dict[str, str]:
+    """
+    All sections in the given mode. Fused falls back to staged if its output
+    is unusable, or if the backend rejects response_format (remembered, so
+    later notes skip straight to staged).
+    """
+    if mode == "fused" and not structured_output.supported(config):
+        print(f"ℹ️  Backend does not support structured output, using staged mode", file=sys.stderr)
+    elif mode == "fused":
+        try:
+            return extract_fused(transcript, config)
+        except (structured_output.InvalidSections, llm_gateway.PartialResponse) as e:
+            print(f"⚠️  Fused extraction failed ({e}), falling back to staged mode", file=sys.stderr)
+        except Exception as e:
+            if not structured_output.is_rejection(e):
+                raise
+            structured_output.mark_unsupported(config)
+            print(f"⚠️  Backend rejected structured output ({e}), falling back to staged mode", file=sys.stderr)
+    return extract_staged(transcript, config)
+
+
+def render(sections: Dict[str, str], transcript: str, filename: str) -> str:
+    """format_output over a sections dict from either mode."""
+    return format_output(
+        sections["overview"], sections["techniques"], sections["key_positions"],
+        sections["core_concepts"], sections["primary_sequence"], sections["follow_ups"],
+        sections["drills"], transcript, filename
     )
-    return response.choices[0].message.content
 
 
 def format_output(
@@ -283,12 +378,18 @@ def main():
     """Main entry point."""
     
     if sys.stdin.isatty():
-        print("Usage: cat transcript.txt | python summarizer_v2_multistage.py bjj filename.wav", file=sys.stderr)
+        print("Usage: cat transcript.txt | python summarizer_v2_multistage.py bjj filename.wav [--mode staged|fused]", file=sys.stderr)
         sys.exit(1)
     
     # Parse arguments
-    note_type = sys.argv[1] if len(sys.argv) > 1 else "bjj"
-    filename = sys.argv[2] if len(sys.argv) > 2 else "unknown.wav"
+    args = sys.argv[1:]
+    mode = DEFAULT_MODE
+    if "--mode" in args:
+        index = args.index("--mode")
+        mode = args[index + 1] if index + 1 < len(args) else mode
+        del args[index:index + 2]
+    note_type = args[0] if len(args) > 0 else "bjj"
+    filename = args[1] if len(args) > 1 else "unknown.wav"
     
     # Read transcript from stdin
     transcript = sys.stdin.read().strip()
@@ -301,40 +402,12 @@ def main():
         # Load type config
         config = type_manager.load_config(note_type)
         print(f"📋 Processing {note_type} note: {filename}", file=sys.stderr)
+        llm_usage.begin_job(note_type, transcript, filename)
         
-        # Stage 1: Extract techniques
-        print(f"📖 Extracting techniques...", file=sys.stderr)
-        techniques = extract_techniques(transcript, config)
-        
-        # Stage 2: Extract key positions
-        print(f"📍 Extracting key positions...", file=sys.stderr)
-        positions = extract_key_positions(transcript, config)
-        
-        # Stage 3: Extract primary sequence
-        print(f"🎯 Extracting primary sequence...", file=sys.stderr)
-        primary = extract_primary_sequence(transcript, config)
-        
-        # Stage 4: Extract follow-ups
-        print(f"🔄 Extracting follow-ups...", file=sys.stderr)
-        followups = extract_follow_ups(transcript, config)
-        
-        # Stage 5: Extract drills
-        print(f"🏋️ Extracting drills...", file=sys.stderr)
-        drills = extract_drills(transcript, config)
-        
-        # Stage 6: Extract core concepts
-        print(f"💡 Extracting core concepts...", file=sys.stderr)
-        concepts = extract_core_concepts(transcript, config)
-        
-        # Stage 7: Generate overview (LAST)
-        print(f"📋 Synthesizing overview...", file=sys.stderr)
-        overview = generate_overview(techniques, positions, primary, followups, drills)
-        
-        # Format final output
-        output = format_output(
-            overview, techniques, positions, concepts,
-            primary, followups, drills, transcript, filename
-        )
+        # Every stage reads the compacted transcript; the page keeps the full one
+        llm_input = transcript_compactor.compact_for_llm(transcript, config)
+        sections = extract_sections(llm_input, config, mode)
+        output = render(sections, transcript, filename)
         
         print(output)
         print(f"✓ Summary generated", file=sys.stderr)
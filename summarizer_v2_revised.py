@@ -3,6 +3,7 @@
 Multi-stage summarizer v2 (REVISED) for BJJ class notes.
 Uses specialized prompts for each section to create teachable, system-focused notes.
 Adapted for any BJJ system/class.
+Stages share a byte-identical system + transcript prefix so it is cached.
 """
 
 import sys
@@ -10,19 +11,20 @@ import os
 from pathlib import Path
 from typing import Dict
 from datetime import datetime
-import json
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from openai import OpenAI
 import type_manager
+import llm_gateway
+import llm_usage
+import structured_output
+import transcript_compactor
 
-# Initialize OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared system prompt + transcript prefix (cached across stages)
+from summarizer_v2_common import stage_messages
 
-def extract_techniques(transcript: str, config: Dict) -> str:
-    """Extract techniques demonstrated with teaching overview focus."""
-    prompt = f"""YOUR TASK: Generate a list of techniques demonstrated in this BJJ class to provide 
+
+TECHNIQUES_TASK = """YOUR TASK: Generate a list of techniques demonstrated in this BJJ class to provide 
 a quick reference for what students will learn.
 
 PURPOSE: Help instructors and students understand the scope of techniques covered. 
@@ -36,25 +38,20 @@ POSITIVE EXAMPLE:
 - Single Leg X-Guard
   - A leg entanglement position for sweeps and leg lock attacks
 
-DOMAIN CONTEXT (use these terms):
-{json.dumps(config.get('domain_dictionary', {}), indent=2)}
-
-Transcript:
-{transcript[:3000]}
-
 Generate 4-6 key techniques only. Be specific to what was actually taught."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_techniques(transcript: str, config: Dict) -> str:
+    """Extract techniques demonstrated with teaching overview focus."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, TECHNIQUES_TASK),
         max_tokens=400,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="techniques"
     )
-    return response.choices[0].message.content
 
 
-def extract_key_positions(transcript: str, config: Dict) -> str:
-    """Extract positional waypoints students will reach."""
-    prompt = f"""YOUR TASK: Extract the major positional waypoints students will reach during this 
+KEY_POSITIONS_TASK = """YOUR TASK: Extract the major positional waypoints students will reach during this 
 lesson, so they can recognize when they've achieved each milestone.
 
 PURPOSE: Create a positional roadmap for the system. Each position should be 
@@ -68,22 +65,20 @@ POSITIVE EXAMPLE:
 - Half Butterfly Guard
   - One hook deep near opponent's hip, other leg creating space
 
-Transcript:
-{transcript[:3000]}
-
 List 4-5 key positions in the system. Describe how to recognize each one."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_key_positions(transcript: str, config: Dict) -> str:
+    """Extract positional waypoints students will reach."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, KEY_POSITIONS_TASK),
         max_tokens=500,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="key_positions"
     )
-    return response.choices[0].message.content
 
 
-def extract_entry_to_position(transcript: str, config: Dict) -> str:
-    """Extract entry drill - how to get into the main position."""
-    prompt = f"""YOUR TASK: Generate step-by-step instructions for ENTERING the primary position 
+ENTRY_TO_POSITION_TASK = """YOUR TASK: Generate step-by-step instructions for ENTERING the primary position 
 of this system, so a student can follow the progression clearly.
 
 PURPOSE: This is the entry drill. Students learn to get into the starting position 
@@ -103,23 +98,21 @@ NEGATIVE EXAMPLE (avoid):
 ❌ 1. Get your knee shield going and maintain control of the opponent's upper body
    2. As the opponent starts to move, you're going to want to shift your leg position
 
-Transcript:
-{transcript}
-
 Find the ENTRY sequence - how to get into the main guard/position from a starting point.
 Keep steps concise and actionable. Each line should be ONE clear thing to do."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_entry_to_position(transcript: str, config: Dict) -> str:
+    """Extract entry drill - how to get into the main position."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, ENTRY_TO_POSITION_TASK),
         max_tokens=600,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="entry_to_position"
     )
-    return response.choices[0].message.content
 
 
-def extract_primary_sequence(transcript: str, config: Dict) -> str:
-    """Extract the primary attack sequence."""
-    prompt = f"""YOUR TASK: Generate the step-by-step PRIMARY attack sequence for this system, 
+PRIMARY_SEQUENCE_TASK = """YOUR TASK: Generate the step-by-step PRIMARY attack sequence for this system, 
 so instructors can teach the main technique clearly.
 
 PURPOSE: The primary sequence is the main technique students should practice first. 
@@ -142,23 +135,21 @@ NEGATIVE EXAMPLE (avoid):
    2. Your leg is going to move in a particular way that creates pressure
    3. You should end up in a good position from here
 
-Transcript:
-{transcript}
-
 Extract the PRIMARY/MAIN attack - the first sequence to learn after entry.
 Each step must be concrete and actionable, not vague."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_primary_sequence(transcript: str, config: Dict) -> str:
+    """Extract the primary attack sequence."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, PRIMARY_SEQUENCE_TASK),
         max_tokens=700,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="primary_sequence"
     )
-    return response.choices[0].message.content
 
 
-def extract_reactions(transcript: str, config: Dict) -> str:
-    """Extract follow-up techniques based on opponent reactions."""
-    prompt = f"""YOUR TASK: Extract the 2 main opponent reactions and the counter-technique for each, 
+REACTIONS_TASK = """YOUR TASK: Extract the 2 main opponent reactions and the counter-technique for each, 
 so students know how to adapt when the primary doesn't work.
 
 PURPOSE: Teach the decision tree: "If they do this, do that." This mirrors real rolling.
@@ -179,23 +170,21 @@ POSITIVE EXAMPLE:
 - Pull their shoulder tight to your chest and fall back
 - Flatten hips to secure the arm bar finish
 
-Transcript:
-{transcript}
-
 Find the main opponent reactions and how to counter each one.
 Use concrete, action-based steps. No vague descriptions."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_reactions(transcript: str, config: Dict) -> str:
+    """Extract follow-up techniques based on opponent reactions."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, REACTIONS_TASK),
         max_tokens=900,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="reactions"
     )
-    return response.choices[0].message.content
 
 
-def extract_core_concepts(transcript: str, config: Dict) -> str:
-    """Extract principles, key insights, and common mistakes."""
-    prompt = f"""YOUR TASK: Extract teaching principles, key insights, and common mistakes so 
+CORE_CONCEPTS_TASK = """YOUR TASK: Extract teaching principles, key insights, and common mistakes so 
 instructors can emphasize what matters and prevent bad habits.
 
 PURPOSE: Help students understand the "why" behind techniques, not just the "how."
@@ -219,23 +208,21 @@ POSITIVE EXAMPLE:
 - Using butterfly hook before establishing upper body control
 - Staying on your side instead of falling flat during primary sequence
 
-Transcript:
-{transcript}
-
 Extract the core teaching points from this class.
 Each bullet must be ONE clear sentence. No multi-sentence bullets."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_core_concepts(transcript: str, config: Dict) -> str:
+    """Extract principles, key insights, and common mistakes."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, CORE_CONCEPTS_TASK),
         max_tokens=700,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="core_concepts"
     )
-    return response.choices[0].message.content
 
 
-def extract_drills(transcript: str, config: Dict) -> str:
-    """Extract progressive drills for teaching."""
-    prompt = f"""YOUR TASK: Generate 3-4 progressive drills that build on each other, so students 
+DRILLS_TASK = """YOUR TASK: Generate 3-4 progressive drills that build on each other, so students 
 can practice incrementally from basic entry to complex reactions.
 
 PURPOSE: Create a class structure: drill entry → drill primary → drill reactions.
@@ -267,22 +254,22 @@ POSITIVE EXAMPLE:
 2. Shoot knee deep behind hips, bump weight forward
 3. Fall flat on back, maintain control, step on hip
 
-Transcript:
-{transcript}
-
 Create progressive drills showing the teaching sequence of this class.
 Each drill must have clear starting position and goal.
 Steps should be concrete and actionable (one sentence each)."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+def extract_drills(transcript: str, config: Dict) -> str:
+    """Extract progressive drills for teaching."""
+    return llm_gateway.chat(
+        messages=stage_messages(transcript, config, DRILLS_TASK),
         max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="drills"
     )
-    return response.choices[0].message.content
 
 
-def generate_overview(techniques: str, positions: str, entry: str, primary: str, reactions: str, drills: str) -> str:
+def generate_overview(techniques: str, positions: str, entry: str, primary: str, reactions: str, drills: str, config: Dict = None) -> str:
     """Synthesize overview after all content is extracted."""
     prompt = f"""YOUR TASK: Create a brief teaching overview that ties together the complete 
 system (entry → primary → reactions), so students understand the flow.
@@ -328,12 +315,129 @@ Drills Summary:
 
 Write a compelling, concise overview that connects entry → primary → reactions."""
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    return llm_gateway.chat(
+        messages=[{"role": "user", "content": prompt}],
         max_tokens=400,
-        messages=[{"role": "user", "content": prompt}]
+        config=config,
+        stage="overview"
+    )
+
+
+OVERVIEW_TASK = """YOUR TASK: Create a brief teaching overview that ties together the complete 
+system (entry → primary → reactions), so students understand the flow. Write it LAST, 
+from the other sections.
+
+PURPOSE: Opening remarks for class. Answer: "What are we learning and why?"
+
+OUTPUT FORMAT:
+**Primary Entry**
+1-2 sentences about the entry point
+
+**Main Technique**
+1-2 sentences about the primary sequence
+
+**Reaction Framework**
+1-2 sentences about how reactions work
+
+Write a compelling, concise overview that connects entry → primary → reactions."""
+
+# Fused mode: all sections from one structured call, overview last as in staged mode
+FUSED_TASKS = {
+    "techniques": TECHNIQUES_TASK,
+    "key_positions": KEY_POSITIONS_TASK,
+    "entry_to_position": ENTRY_TO_POSITION_TASK,
+    "primary_sequence": PRIMARY_SEQUENCE_TASK,
+    "reactions": REACTIONS_TASK,
+    "drills": DRILLS_TASK,
+    "core_concepts": CORE_CONCEPTS_TASK,
+    "overview": OVERVIEW_TASK,
+}
+FUSED_MAX_TOKENS = 5200  # Sum of the staged budgets
+
+# "staged" (one call per section) or "fused" (one JSON-schema call); --mode overrides
+DEFAULT_MODE = os.getenv("SUMMARIZER_V2_MODE", "staged")
+
+
+def extract_staged(transcript: str, config: Dict) -> Dict[str, str]:
+    """Staged mode: one call per section, overview synthesized last."""
+    print(f"📖 Extracting techniques...", file=sys.stderr)
+    techniques = extract_techniques(transcript, config)
+    
+    print(f"📍 Extracting key positions...", file=sys.stderr)
+    positions = extract_key_positions(transcript, config)
+    
+    print(f"🚪 Extracting entry to position...", file=sys.stderr)
+    entry = extract_entry_to_position(transcript, config)
+    
+    print(f"🎯 Extracting primary sequence...", file=sys.stderr)
+    primary = extract_primary_sequence(transcript, config)
+    
+    print(f"🔄 Extracting reactions...", file=sys.stderr)
+    reactions = extract_reactions(transcript, config)
+    
+    print(f"🏋️ Extracting drills...", file=sys.stderr)
+    drills = extract_drills(transcript, config)
+    
+    print(f"💡 Extracting core concepts...", file=sys.stderr)
+    concepts = extract_core_concepts(transcript, config)
+    
+    print(f"📋 Synthesizing overview...", file=sys.stderr)
+    overview = generate_overview(techniques, positions, entry, primary, reactions, drills, config)
+    
+    return {
+        "techniques": techniques,
+        "key_positions": positions,
+        "entry_to_position": entry,
+        "primary_sequence": primary,
+        "reactions": reactions,
+        "drills": drills,
+        "core_concepts": concepts,
+        "overview": overview,
+    }
+
+
+def extract_fused(transcript: str, config: Dict) -> Dict[str, str]:
+    """Fused mode: every section from one JSON-schema-constrained call, validated."""
+    print(f"🧩 Extracting all sections in one structured call...", file=sys.stderr)
+    sections = list(FUSED_TASKS)
+    text = llm_gateway.chat(
+        messages=stage_messages(transcript, config, structured_output.fused_task(FUSED_TASKS)),
+        max_tokens=FUSED_MAX_TOKENS,
+        config=config,
+        stage="fused",
+        response_format=structured_output.response_format("bjj_class_notes", sections)
+    )
+    return structured_output.parse_sections(text, sections)
+
+
+def extract_sections(transcript: str, config: Dict, mode: str = DEFAULT_MODE) -> Dict[str, str]:
+    """
+    All sections in the given mode. Fused falls back to staged if its output
+    is unusable, or if the backend rejects response_format (remembered, so
+    later notes skip straight to staged).
+    """
+    if mode == "fused" and not structured_output.supported(config):
+        print(f"ℹ️  Backend does not support structured output, using staged mode", file=sys.stderr)
+    elif mode == "fused":
+        try:
+            return extract_fused(transcript, config)
+        except (structured_output.InvalidSections, llm_gateway.PartialResponse) as e:
+            print(f"⚠️  Fused extraction failed ({e}), falling back to staged mode", file=sys.stderr)
+        except Exception as e:
+            if not structured_output.is_rejection(e):
+                raise
+            structured_output.mark_unsupported(config)
+            print(f"⚠️  Backend rejected structured output ({e}), falling back to staged mode", file=sys.stderr)
+    return extract_staged(transcript, config)
+
+
+def render(sections: Dict[str, str], transcript: str, filename: str) -> str:
+    """format_output over a sections dict from either mode."""
+    return format_output(
+        sections["overview"], sections["techniques"], sections["key_positions"],
+        sections["core_concepts"], sections["entry_to_position"], sections["primary_sequence"],
+        sections["reactions"], sections["drills"], transcript, filename
     )
-    return response.choices[0].message.content
 
 
 def format_output(
@@ -406,12 +510,18 @@ def main():
     """Main entry point."""
     
     if sys.stdin.isatty():
-        print("Usage: cat transcript.txt | python summarizer_v2_revised.py bjj filename.wav", file=sys.stderr)
+        print("Usage: cat transcript.txt | python summarizer_v2_revised.py bjj filename.wav [--mode staged|fused]", file=sys.stderr)
         sys.exit(1)
     
     # Parse arguments
-    note_type = sys.argv[1] if len(sys.argv) > 1 else "bjj"
-    filename = sys.argv[2] if len(sys.argv) > 2 else "unknown.wav"
+    args = sys.argv[1:]
+    mode = DEFAULT_MODE
+    if "--mode" in args:
+        index = args.index("--mode")
+        mode = args[index + 1] if index + 1 < len(args) else mode
+        del args[index:index + 2]
+    note_type = args[0] if len(args) > 0 else "bjj"
+    filename = args[1] if len(args) > 1 else "unknown.wav"
     
     # Read transcript from stdin
     transcript = sys.stdin.read().strip()
@@ -424,44 +534,12 @@ def main():
         # Load type config
         config = type_manager.load_config(note_type)
         print(f"📋 Processing {note_type} class notes: {filename}", file=sys.stderr)
+        llm_usage.begin_job(note_type, transcript, filename)
         
-        # Stage 1: Extract techniques
-        print(f"📖 Extracting techniques...", file=sys.stderr)
-        techniques = extract_techniques(transcript, config)
-        
-        # Stage 2: Extract key positions
-        print(f"📍 Extracting key positions...", file=sys.stderr)
-        positions = extract_key_positions(transcript, config)
-        
-        # Stage 3: Extract entry to position
-        print(f"🚪 Extracting entry to position...", file=sys.stderr)
-        entry = extract_entry_to_position(transcript, config)
-        
-        # Stage 4: Extract primary sequence
-        print(f"🎯 Extracting primary sequence...", file=sys.stderr)
-        primary = extract_primary_sequence(transcript, config)
-        
-        # Stage 5: Extract reactions
-        print(f"🔄 Extracting reactions...", file=sys.stderr)
-        reactions = extract_reactions(transcript, config)
-        
-        # Stage 6: Extract drills
-        print(f"🏋️ Extracting drills...", file=sys.stderr)
-        drills = extract_drills(transcript, config)
-        
-        # Stage 7: Extract core concepts
-        print(f"💡 Extracting core concepts...", file=sys.stderr)
-        concepts = extract_core_concepts(transcript, config)
-        
-        # Stage 8: Generate overview (LAST)
-        print(f"📋 Synthesizing overview...", file=sys.stderr)
-        overview = generate_overview(techniques, positions, entry, primary, reactions, drills)
-        
-        # Format final output
-        output = format_output(
-            overview, techniques, positions, concepts,
-            entry, primary, reactions, drills, transcript, filename
-        )
+        # Every stage reads the compacted transcript; the page keeps the full one
+        llm_input = transcript_compactor.compact_for_llm(transcript, config)
+        sections = extract_sections(llm_input, config, mode)
+        output = render(sections, transcript, filename)
         
         print(output)
         print(f"✓ BJJ class notes generated", file=sys.stderr)
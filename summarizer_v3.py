@@ -3,17 +3,21 @@
 Voice Transcript Summarizer v3 - Simplified Three-Stage Pipeline
 
 Orchestrates:
-1. Outline Generation: Extract key topics from raw transcript
-2. Section Expansion: Generate sections sequentially with deduplication
+1. Outline Generation: Map over transcript chunks, reduce to one outline
+2. Section Expansion: Expand all sections in parallel against the outline,
+   then deduplicate content across sections (or sequentially with
+   project_wizard's SectionAgentController)
 3. Format for Logseq: Clean markdown structure
 
-Uses project_wizard AI agents.
+Uses project_wizard blueprints/prompts and AI agents.
 """
 
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, List, Optional
 import json
 
 # Add project_wizard to path
@@ -23,11 +27,55 @@ from app.services.blueprint_registry import BlueprintRegistry
 from app.services.ai_agents.llm_client import LLMClient
 from app.services.ai_agents.section_agent import SectionAgentController
 
+# Voice notes modules (LLM gateway: backend routing, cache, rate limits)
+sys.path.insert(0, str(Path(__file__).parent))
+import llm_gateway
+import llm_usage
+import transcript_compactor
+import type_manager
+
+# Section expansion: "parallel" (concurrent, via the gateway) or "sequential"
+# (project_wizard SectionAgentController)
+EXPANSION_MODE = os.getenv("SUMMARIZER_V3_EXPANSION", "parallel")
+MAX_WORKERS = int(os.getenv("SUMMARIZER_V3_WORKERS", "4"))
+
+# Outline map step: transcript chunk size
+OUTLINE_CHUNK_TOKENS = int(os.getenv("SUMMARIZER_V3_CHUNK_TOKENS", "3000"))
+
+SECTION_ORDER = ["overview", "key_points", "detailed_notes", "next_steps"]
+
+# Used when the transcript_summary prompts do not define a section
+DEFAULT_SECTIONS = {
+    "overview": ("Overview", "Write a 2-3 sentence overview of what this recording is about and why it matters."),
+    "key_points": ("Key Points", "List the main ideas as bullets, one idea per bullet (5-8 bullets)."),
+    "detailed_notes": (
+        "Detailed Notes",
+        "Write an organized breakdown following the outline's key topics, one bullet per topic "
+        "with indented sub-bullets for the details."
+    ),
+    "next_steps": (
+        "Next Steps",
+        "List the action items and follow-ups as bullets, with owners and dates if mentioned. "
+        "Write '- None identified' if there are none."
+    ),
+}
+
+
+class ExpandedSection:
+    """A generated section, shaped like project_wizard's section results."""
+
+    def __init__(self, section_id: str, section_title: str, content: str):
+        self.section_id = section_id
+        self.section_title = section_title
+        self.content = content
+        self.word_count = len(content.split())
+
 
 def generate_transcript_summary(
     transcript: str,
     audio_filename: str = "unknown.m4a",
-    verify: bool = False
+    verify: bool = False,
+    config: Optional[Dict] = None
 ) -> str:
     """
     Generate transcript summary using simplified 2-stage pipeline.
@@ -36,6 +84,8 @@ def generate_transcript_summary(
         transcript: Raw transcript text from Whisper
         audio_filename: Original audio filename
         verify: If True, run verification (currently disabled due to timeout)
+        config: Note type config, for the gateway's per-type routing, cache
+            and budget settings
         
     Returns:
         Final markdown summary
@@ -47,7 +97,6 @@ def generate_transcript_summary(
     
     try:
         # Initialize components
-        llm_client = LLMClient()
         blueprint_registry = BlueprintRegistry()
         
         # Load blueprint and prompts
@@ -58,30 +107,34 @@ def generate_transcript_summary(
         print("-" * 80, file=sys.stderr)
         
         # Stage 1: Generate outline to guide section expansion
-        outline = generate_outline(transcript, llm_client, prompts.get("outline_generation", {}))
+        outline = generate_outline(transcript, prompts.get("outline_generation", {}), config)
         print(f"✅ Outline: {len(outline.get('key_topics', []))} topics identified", file=sys.stderr)
         
-        # Stage 2: Expand sections sequentially
-        print("\n🔧 STAGE 2: Section Expansion", file=sys.stderr)
+        # Stage 2: Expand sections against the outline
+        print(f"\n🔧 STAGE 2: Section Expansion ({EXPANSION_MODE})", file=sys.stderr)
         print("-" * 80, file=sys.stderr)
         
-        user_inputs = {
-            "transcript": transcript,
-            "audio_filename": audio_filename,
-            "outline": json.dumps(outline)
-        }
-        
-        section_controller = SectionAgentController(
-            llm_client=llm_client,
-            blueprint=blueprint,
-            pattern_name="transcript_summary"
-        )
-        
-        sections = section_controller.generate_all_sections(
-            user_inputs=user_inputs,
-            prompts=prompts,
-            max_regenerations=1  # Reduced for speed
-        )
+        if EXPANSION_MODE == "parallel":
+            sections = expand_sections_parallel(transcript, outline, prompts, config)
+            sections = dedupe_sections(sections)
+        else:
+            user_inputs = {
+                "transcript": transcript,
+                "audio_filename": audio_filename,
+                "outline": json.dumps(outline)
+            }
+            
+            section_controller = SectionAgentController(
+                llm_client=LLMClient(),
+                blueprint=blueprint,
+                pattern_name="transcript_summary"
+            )
+            
+            sections = section_controller.generate_all_sections(
+                user_inputs=user_inputs,
+                prompts=prompts,
+                max_regenerations=1  # Reduced for speed
+            )
         
         # Assemble final markdown
         summary_markdown = assemble_summary_markdown(
@@ -99,35 +152,91 @@ def generate_transcript_summary(
         return create_fallback_summary(transcript, audio_filename)
 
 
-def generate_outline(transcript: str, llm_client, config: dict) -> dict:
-    """Extract key topics and structure from transcript."""
+def chunk_transcript(transcript: str, max_tokens: int = OUTLINE_CHUNK_TOKENS) -> List[str]:
+    """Split a transcript on line boundaries into chunks of about max_tokens."""
+    chunks, lines, size = [], [], 0
+    for line in transcript.splitlines():
+        tokens = llm_usage.count_tokens(line) + 1
+        if lines and size + tokens > max_tokens:
+            chunks.append("\n".join(lines))
+            lines, size = [], 0
+        lines.append(line)
+        size += tokens
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def _outline_call(system_message: str, prompt: str, stage: str, config: Optional[Dict] = None) -> dict:
+    """One outline-shaped JSON completion."""
+    content = llm_gateway.chat(
+        messages=[
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=1500,
+        config=config,
+        stage=stage
+    ).strip()
+    if content.startswith("```"):
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start >= 0 and end > start:
+            content = content[start:end]
+    return json.loads(content)
+
+
+def generate_outline(transcript: str, outline_prompts: dict, config: Optional[Dict] = None) -> dict:
+    """
+    Extract key topics and structure from the whole transcript: outline each
+    chunk in parallel (map), then merge the partial outlines (reduce).
+    A chunk whose outline fails twice is summarized as plain bullets instead,
+    which stand in for its key topics, so no part of the transcript is lost.
+    """
     
-    system_message = config.get("identity", "You are an outline architect.")
-    instructions = config.get("instructions", "Create an outline.")
+    system_message = outline_prompts.get("identity", "You are an outline architect.")
+    instructions = outline_prompts.get("instructions", "Create an outline.")
+    chunks = chunk_transcript(transcript)
     
-    prompt = f"""{instructions}
+    def outline_chunk(index: int) -> dict:
+        part = f" (part {index + 1} of {len(chunks)})" if len(chunks) > 1 else ""
+        prompt = f"""{instructions}
 
-Transcript:
-{transcript[:3000]}
+Transcript{part}:
+{chunks[index]}
 
 Return JSON with main_topic, key_topics[], decisions[], action_items[]."""
+        for attempt in range(2):
+            try:
+                return _outline_call(system_message, prompt, "outline", config)
+            except Exception as e:
+                print(f"⚠️  Outline of part {index + 1} failed (attempt {attempt + 1}): {e}", file=sys.stderr)
+        try:
+            return summarize_chunk(chunks[index], config)
+        except Exception as e:
+            print(f"⚠️  Summary of part {index + 1} failed, leaving it out of the outline: {e}", file=sys.stderr)
+            return None
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        partials = [p for p in executor.map(outline_chunk, range(len(chunks))) if p]
     
     try:
-        response = llm_client.generate(
-            prompt=prompt,
-            system_message=system_message,
-            temperature=0.5,
-            max_tokens=1500
-        )
-        
-        content = response.content.strip()
-        if content.startswith("```"):
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start >= 0 and end > start:
-                content = content[start:end]
-        
-        return json.loads(content)
+        if not partials:
+            raise ValueError("no part of the transcript could be outlined")
+        if len(partials) == 1:
+            return partials[0]
+        print(f"🧮 Merging {len(partials)} partial outlines...", file=sys.stderr)
+        prompt = f"""These are outlines of consecutive parts of ONE transcript, in order:
+
+{json.dumps(partials, indent=2)}
+
+Merge them into a single outline of the whole transcript. Keep topics in the order
+they were discussed, merge topics that are the same, and deduplicate decisions and
+action items.
+
+Return JSON with main_topic, key_topics[], decisions[], action_items[]."""
+        return _outline_call(system_message, prompt, "outline_reduce", config)
     except Exception as e:
         print(f"⚠️  Outline generation failed: {e}", file=sys.stderr)
         return {
@@ -138,6 +247,107 @@ Return JSON with main_topic, key_topics[], decisions[], action_items[]."""
         }
 
 
+def summarize_chunk(chunk: str, config: Optional[Dict] = None) -> dict:
+    """Fallback partial outline: the chunk summarized as plain bullets, used as its key topics."""
+    content = llm_gateway.chat(
+        messages=[
+            {"role": "system", "content": "You summarize part of a recorded voice note."},
+            {"role": "user", "content": f"Summarize this part of the transcript as 3-8 short bullets:\n\n{chunk}"}
+        ],
+        temperature=0.3,
+        max_tokens=600,
+        config=config,
+        stage="outline_fallback"
+    )
+    bullets = [line.strip().lstrip("-* ").strip() for line in content.splitlines()]
+    bullets = [bullet for bullet in bullets if bullet]
+    if not bullets:
+        raise ValueError("empty summary")
+    return {"key_topics": bullets, "decisions": [], "action_items": []}
+
+
+def expand_sections_parallel(
+    transcript: str,
+    outline: dict,
+    prompts: dict,
+    config: Optional[Dict] = None
+) -> Dict[str, ExpandedSection]:
+    """
+    Expand every section concurrently. Each call shares the same system
+    prompt (carrying the outline) and transcript prefix, so sections agree on
+    structure and the prefix is cached; only the section's task differs.
+    """
+    system = (
+        "You are writing one section of structured notes for a recorded voice note. "
+        "Every section is written from the same outline, given below; stay within your "
+        "section and do not repeat what other sections of the outline will cover.\n\n"
+        f"OUTLINE:\n{json.dumps(outline, indent=2)}"
+    )
+    
+    def expand(section_id: str) -> ExpandedSection:
+        section_prompts = prompts.get(section_id, {})
+        title, default_task = DEFAULT_SECTIONS[section_id]
+        title = section_prompts.get("title", title)
+        task = (
+            f"Write the \"{title}\" section.\n\n"
+            f"{section_prompts.get('instructions', default_task)}\n\n"
+            "Output markdown bullets only, without the section heading."
+        )
+        content = llm_gateway.chat(
+            messages=llm_gateway.prefix_messages(system, transcript, task),
+            temperature=0.5,
+            max_tokens=1200,
+            config=config,
+            stage=section_id
+        ).strip()
+        print(f"✓ {title}: {len(content.split())} words", file=sys.stderr)
+        return ExpandedSection(section_id, title, content)
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        expanded = list(executor.map(expand, SECTION_ORDER))
+    return {section.section_id: section for section in expanded}
+
+
+def dedupe_sections(sections: Dict[str, ExpandedSection]) -> Dict[str, ExpandedSection]:
+    """
+    Drop bullets (with their sub-bullets) that near-duplicate a bullet of an
+    earlier section, since parallel sections cannot see each other's output.
+    Bullets are only compared across sections (a section's own similar
+    bullets are left alone), and bullets without words are always kept.
+    """
+    seen = []
+    deduped = {}
+    dropped = 0
+    for section_id in SECTION_ORDER:
+        if section_id not in sections:
+            continue
+        section = sections[section_id]
+        section_seen = []
+        kept = []
+        skip_below = None
+        for line in section.content.splitlines():
+            indent = len(line) - len(line.lstrip())
+            if skip_below is not None and line.strip() and indent > skip_below:
+                continue
+            skip_below = None
+            stripped = line.strip()
+            if stripped.startswith(("-", "*")):
+                text = stripped.lstrip("-* ").strip()
+                words = transcript_compactor.word_set(text)
+                if words and transcript_compactor.is_repeat(text, seen):
+                    skip_below = indent
+                    dropped += 1
+                    continue
+                if words:
+                    section_seen.append(words)
+            kept.append(line)
+        seen.extend(section_seen)
+        deduped[section_id] = ExpandedSection(section_id, section.section_title, "\n".join(kept))
+    if dropped:
+        print(f"🧹 Removed {dropped} bullet(s) repeated across sections", file=sys.stderr)
+    return deduped
+
+
 def assemble_summary_markdown(sections, transcript: str, audio_filename: str) -> str:
     """Assemble sections into final Logseq-formatted markdown."""
     
@@ -195,6 +405,7 @@ def create_fallback_summary(transcript: str, audio_filename: str) -> str:
 if __name__ == "__main__":
     if not sys.stdin.isatty():
         input_data = sys.stdin.read()
+        config = type_manager.load_config(sys.argv[1]) if len(sys.argv) > 1 else None
         
         # Parse input: "transcript\n---FILENAME---\nfilename.m4a"
         parts = input_data.split("\n---FILENAME---\n")
@@ -206,7 +417,8 @@ if __name__ == "__main__":
                 summary = generate_transcript_summary(
                     transcript=transcript,
                     audio_filename=audio_filename,
-                    verify=False  # Verification disabled due to timeout
+                    verify=False,  # Verification disabled due to timeout
+                    config=config
                 )
                 print(summary)
             except Exception as e:
@@ -216,5 +428,5 @@ if __name__ == "__main__":
             print("ERROR: No transcript provided", file=sys.stderr)
             sys.exit(1)
     else:
-        print("Usage: echo 'transcript\\n---FILENAME---\\nfile.m4a' | python summarizer_v3.py")
+        print("Usage: echo 'transcript\\n---FILENAME---\\nfile.m4a' | python summarizer_v3.py [note_type]")
         sys.exit(1)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Technique Index: incremental cross-session aggregates of domain terms.
+
+For note types with a technique_index page configured (BJJ), every job
+records which domain terms (techniques, positions, concepts) the transcript
+mentions, as found by the domain matcher, and folds them into running
+aggregates instead of re-reading every page:
+- per term: mentions, sessions (notes), first and last seen
+- per term and quarter: mentions and sessions ("what did we drill this quarter")
+- per pair of terms: sessions mentioning both (co-occurrence)
+
+Re-indexing a note (an appended recording) applies only the difference to
+its previous hits, so aggregates stay exact. update() reports whether
+anything changed, and the generated Logseq index page is only re-rendered
+(and patched block by block) when it did.
+
+Usage:
+    python technique_index.py show bjj     # print the index page
+    python technique_index.py stats
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+BASE_DIR = Path(__file__).parent
+DB_PATH = Path(os.getenv("TECHNIQUE_INDEX_PATH") or BASE_DIR / "state" / "technique_index.sqlite")
+
+# Terms listed for the latest quarter, and co-occurring terms per term
+QUARTER_TOP = 15
+PAIR_TOP = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    note_key TEXT PRIMARY KEY,
+    note_type TEXT,
+    page TEXT,
+    day TEXT
+);
+CREATE TABLE IF NOT EXISTS note_terms (
+    note_key TEXT,
+    note_type TEXT,
+    term TEXT,
+    mentions INTEGER,
+    day TEXT,
+    PRIMARY KEY (note_key, term)
+);
+CREATE INDEX IF NOT EXISTS note_terms_term ON note_terms (note_type, term, day);
+CREATE TABLE IF NOT EXISTS terms (
+    note_type TEXT,
+    term TEXT,
+    mentions INTEGER,
+    notes INTEGER,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (note_type, term)
+);
+CREATE TABLE IF NOT EXISTS quarters (
+    note_type TEXT,
+    quarter TEXT,
+    term TEXT,
+    mentions INTEGER,
+    notes INTEGER,
+    PRIMARY KEY (note_type, quarter, term)
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    note_type TEXT,
+    a TEXT,
+    b TEXT,
+    notes INTEGER,
+    PRIMARY KEY (note_type, a, b)
+);
+"""
+
+
+def quarter_of(day: str) -> str:
+    """"2025-05-14" -> "2025-Q2"."""
+    return f"{day[:4]}-Q{(int(day[5:7]) - 1) // 3 + 1}"
+
+
+class TechniqueIndex:
+    """Running per-type aggregates of the domain terms notes mention."""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def update(
+        self,
+        note_type: str,
+        audio: str,
+        page: str,
+        hits: Dict[str, int],
+        day: Optional[str] = None
+    ) -> bool:
+        """
+        Record a note's term hits (term -> mentions), replacing its previous
+        hits if it was indexed before. Returns whether any aggregate changed.
+        """
+        note_key = f"{note_type}/{audio}"
+        hits = {term: count for term, count in hits.items() if count > 0}
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT day FROM notes WHERE note_key = ?", (note_key,)).fetchone()
+                # A re-indexed note keeps the day it was first recorded
+                day = row[0] if row else (day or date.today().isoformat())
+                old = dict(db.execute(
+                    "SELECT term, mentions FROM note_terms WHERE note_key = ?", (note_key,)
+                ).fetchall())
+                db.execute(
+                    "INSERT INTO notes (note_key, note_type, page, day) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (note_key) DO UPDATE SET page = excluded.page",
+                    (note_key, note_type, page, day)
+                )
+                changed = row is None or old != hits
+                if old != hits:
+                    self._apply(db, note_type, note_key, day, old, hits)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def _apply(self, db, note_type: str, note_key: str, day: str, old: Dict[str, int], new: Dict[str, int]):
+        """Move the aggregates from a note's old hits to its new ones (caller holds the transaction)."""
+        db.execute("DELETE FROM note_terms WHERE note_key = ?", (note_key,))
+        db.executemany(
+            "INSERT INTO note_terms (note_key, note_type, term, mentions, day) VALUES (?, ?, ?, ?, ?)",
+            [(note_key, note_type, term, count, day) for term, count in new.items()]
+        )
+
+        quarter = quarter_of(day)
+        deltas = []
+        for term in old.keys() | new.keys():
+            mentions = new.get(term, 0) - old.get(term, 0)
+            notes = (term in new) - (term in old)
+            if mentions or notes:
+                deltas.append((term, mentions, notes))
+        db.executemany(
+            "INSERT INTO terms (note_type, term, mentions, notes, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (note_type, term) DO UPDATE SET "
+            "mentions = mentions + excluded.mentions, notes = notes + excluded.notes, "
+            "first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen)",
+            [(note_type, term, mentions, notes, day, day) for term, mentions, notes in deltas]
+        )
+        db.executemany(
+            "INSERT INTO quarters (note_type, quarter, term, mentions, notes) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (note_type, quarter, term) DO UPDATE SET "
+            "mentions = mentions + excluded.mentions, notes = notes + excluded.notes",
+            [(note_type, quarter, term, mentions, notes) for term, mentions, notes in deltas]
+        )
+
+        # Terms this note no longer mentions: drop them, or re-derive their span
+        dropped = [term for term in old if term not in new]
+        for term in dropped:
+            first, last = db.execute(
+                "SELECT min(day), max(day) FROM note_terms WHERE note_type = ? AND term = ?", (note_type, term)
+            ).fetchone()
+            if first is None:
+                db.execute("DELETE FROM terms WHERE note_type = ? AND term = ?", (note_type, term))
+            else:
+                db.execute("UPDATE terms SET first_seen = ?, last_seen = ? WHERE note_type = ? AND term = ?",
+                           (first, last, note_type, term))
+        db.execute("DELETE FROM quarters WHERE note_type = ? AND quarter = ? AND notes <= 0", (note_type, quarter))
+
+        old_pairs = set(combinations(sorted(old), 2))
+        new_pairs = set(combinations(sorted(new), 2))
+        db.executemany(
+            "INSERT INTO pairs (note_type, a, b, notes) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (note_type, a, b) DO UPDATE SET notes = notes + 1",
+            [(note_type, a, b) for a, b in new_pairs - old_pairs]
+        )
+        db.executemany(
+            "UPDATE pairs SET notes = notes - 1 WHERE note_type = ? AND a = ? AND b = ?",
+            [(note_type, a, b) for a, b in old_pairs - new_pairs]
+        )
+        if old_pairs - new_pairs:
+            db.execute("DELETE FROM pairs WHERE note_type = ? AND notes <= 0", (note_type,))
+
+    def render(self, note_type: str, domain_dict: Dict) -> str:
+        """The Logseq index page: latest quarter, then every term by category."""
+        with self._connect() as db:
+            sessions = db.execute("SELECT COUNT(*) FROM notes WHERE note_type = ?", (note_type,)).fetchone()[0]
+            terms = db.execute(
+                "SELECT term, mentions, notes, first_seen, last_seen FROM terms "
+                "WHERE note_type = ? ORDER BY notes DESC, mentions DESC, term", (note_type,)
+            ).fetchall()
+            quarter = db.execute(
+                "SELECT max(quarter) FROM quarters WHERE note_type = ?", (note_type,)
+            ).fetchone()[0]
+            quarter_terms = db.execute(
+                "SELECT term, mentions, notes FROM quarters WHERE note_type = ? AND quarter = ? "
+                "ORDER BY notes DESC, mentions DESC, term LIMIT ?", (note_type, quarter, QUARTER_TOP)
+            ).fetchall()
+            pairs = db.execute("SELECT a, b, notes FROM pairs WHERE note_type = ?", (note_type,)).fetchall()
+
+        partners: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        for a, b, notes in pairs:
+            partners[a].append((notes, b))
+            partners[b].append((notes, a))
+
+        categories = {}
+        for category, category_terms in domain_dict.items():
+            if isinstance(category_terms, list):
+                for term in category_terms:
+                    categories.setdefault(term, category)
+
+        lines = [f"tags:: #voice-note-index #{note_type}", f"sessions:: {sessions}", ""]
+        if quarter:
+            lines.append(f"## {quarter}")
+            for term, mentions, notes in quarter_terms:
+                lines.append(f"- {term} — {notes} session(s), {mentions} mention(s)")
+            lines.append("")
+
+        by_category: Dict[str, List[Tuple]] = defaultdict(list)
+        for row in terms:
+            by_category[categories.get(row[0], "other")].append(row)
+        for category in [c for c in domain_dict if c in by_category] + (["other"] if "other" in by_category else []):
+            lines.append(f"## {category.replace('_', ' ').title()}")
+            for term, mentions, notes, first_seen, last_seen in by_category[category]:
+                lines.append(f"- {term} — {notes} session(s), {mentions} mention(s), "
+                             f"[[{first_seen}]] → [[{last_seen}]]")
+                top = sorted(partners.get(term, []), key=lambda p: (-p[0], p[1]))[:PAIR_TOP]
+                if top:
+                    lines.append("\t- with: " + ", ".join(f"{other} ({notes})" for notes, other in top))
+            lines.append("")
+        return "\n".join(lines).rstrip("\n")
+
+    def stats(self) -> Dict:
+        with self._connect() as db:
+            notes = dict(db.execute("SELECT note_type, COUNT(*) FROM notes GROUP BY note_type").fetchall())
+            terms = dict(db.execute("SELECT note_type, COUNT(*) FROM terms GROUP BY note_type").fetchall())
+            pairs = db.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+        return {"notes": notes, "terms": terms, "pairs": pairs}
+
+
+_index = None
+
+
+def get_index() -> TechniqueIndex:
+    global _index
+    if _index is None:
+        _index = TechniqueIndex()
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-session technique index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print a type's index page")
+    show.add_argument("note_type")
+    commands.add_parser("stats", help="aggregate sizes")
+    args = parser.parse_args()
+
+    index = get_index()
+    if args.command == "show":
+        import type_manager
+        config = type_manager.load_config(args.note_type)
+        print(index.render(args.note_type, type_manager.get_domain_dictionary(config)))
+    else:
+        stats = index.stats()
+        print(f"notes {stats['notes']}, terms {stats['terms']}, {stats['pairs']} co-occurring pairs")
+
+
+if __name__ == "__main__":
+    main()
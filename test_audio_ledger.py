@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Test resuming appended recordings from the audio ledger (audio_ledger.py)."""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import audio_ledger
+import segment_store
+
+RATE = audio_ledger.SAMPLE_RATE
+
+
+def audio(seconds: float, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(int(seconds * RATE)).astype(np.float32)
+
+
+def segments(seconds: float):
+    return [{"start": float(t), "end": float(t + 10), "text": f"segment {t}"} for t in range(0, int(seconds), 10)]
+
+
+def recorded(tmp: Path, recording: np.ndarray, recording_segments, name: str = "a.m4a"):
+    """Ledger with the recording transcribed and its sidecar saved, and its entry."""
+    sidecar = tmp / "a.segments"
+    segment_store.save(sidecar, recording_segments)
+    ledger = audio_ledger.AudioLedger(tmp / "ledger.json")
+    ledger.record("bjj", name, audio_ledger.fingerprint(recording), recording_segments, tmp / "A.md",
+                  summary="- Guard", segments_path=sidecar)
+    return ledger, ledger.get("bjj", name)
+
+
+def test_no_entry_transcribes_everything():
+    assert audio_ledger.resume_point(None, audio(5)) == ([], 0)
+
+
+def test_unchanged_recording_keeps_every_segment():
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = audio(75)
+        _, entry = recorded(Path(tmp), recording, segments(75))
+        kept, resume = audio_ledger.resume_point(entry, recording)
+    assert [s["text"] for s in kept] == [s["text"] for s in segments(75)]
+    assert resume == len(recording)
+
+
+def test_appended_recording_resumes_before_last_segment():
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = audio(75)
+        _, entry = recorded(Path(tmp), recording, segments(75))
+        longer = np.concatenate((recording, audio(40, seed=1)))
+        kept, resume = audio_ledger.resume_point(entry, longer)
+    # The old final segment (70-80 s) may have been cut off: it is redone
+    assert len(kept) == len(segments(75)) - 1
+    assert resume == 70 * RATE
+
+
+def test_changed_recording_starts_over():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, entry = recorded(Path(tmp), audio(75), segments(75))
+        assert audio_ledger.resume_point(entry, audio(90, seed=2)) == ([], 0)
+
+
+def test_missing_or_mismatched_sidecar_starts_over():
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = audio(75)
+        _, entry = recorded(Path(tmp), recording, segments(75))
+        segment_store.save(Path(entry["segments_path"]), segments(40))
+        assert audio_ledger.resume_point(entry, recording) == ([], 0)
+        Path(entry["segments_path"]).unlink()
+        assert audio_ledger.resume_point(entry, recording) == ([], 0)
+
+
+def test_ledger_keeps_metadata_only():
+    with tempfile.TemporaryDirectory() as tmp:
+        recorded(Path(tmp), audio(75), segments(75))
+        saved = json.loads((Path(tmp) / "ledger.json").read_text(encoding="utf-8"))["bjj/a.m4a"]
+    assert "segments" not in saved
+    assert saved["segment_count"] == 8
+    assert saved["last_end"] == 80.0
+
+
+def test_inline_segments_of_old_entries_still_resume():
+    recording = audio(75)
+    entry = {**audio_ledger.fingerprint(recording), "segments": segments(75), "page": "A.md"}
+    kept, resume = audio_ledger.resume_point(entry, recording)
+    assert len(kept) == 8 and resume == len(recording)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
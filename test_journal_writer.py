@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Test batched, lock-protected journal appends (journal_writer.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import journal_writer
+
+DAY = "2025_05_14"
+
+
+def test_link_is_appended_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Path(tmp) / f"{DAY}.md"
+        journal.write_text("- Morning class\n- [[2025-05-14-Class]]", encoding="utf-8")
+        writer = journal_writer.JournalWriter(Path(tmp))
+        writer.add_link("2025-05-14-Class", day=DAY)
+        writer.add_link("2025-05-14-Meeting", day=DAY)
+        writer.add_link("2025-05-14-Meeting", day=DAY)
+        assert journal.read_text(encoding="utf-8") == (
+            "- Morning class\n- [[2025-05-14-Class]]\n- [[2025-05-14-Meeting]]\n"
+        )
+
+
+def test_append_keeps_edits_made_after_the_index_was_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Path(tmp) / f"{DAY}.md"
+        writer = journal_writer.JournalWriter(Path(tmp))
+        writer.add_link("A", day=DAY)
+        with open(journal, "a", encoding="utf-8") as f:
+            f.write("- typed in Logseq meanwhile")
+        writer.add_link("B", day=DAY)
+        assert journal.read_text(encoding="utf-8") == "- [[A]]\n- typed in Logseq meanwhile\n- [[B]]\n"
+
+
+def test_running_writer_coalesces_links_into_one_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = journal_writer.JournalWriter(Path(tmp), flush_interval=60)
+        writer.start()
+        writes = []
+        append = writer._append
+        writer._append = lambda path, text: (writes.append(text), append(path, text))
+        writer.add_link("A", day=DAY)
+        writer.add_link("B", day=DAY)
+        writer.close()
+        assert writes == ["- [[A]]\n- [[B]]\n"]
+
+
+def test_failed_write_is_retried_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = journal_writer.JournalWriter(Path(tmp))
+        append = writer._append
+
+        def disk_full(path, text):
+            writer._append = append
+            raise OSError("No space left on device")
+
+        writer._append = disk_full
+        writer.add_link("A", day=DAY)
+        assert writer._pending == {DAY: ["A"]}
+        writer.add_link("B", day=DAY)
+        assert (Path(tmp) / f"{DAY}.md").read_text(encoding="utf-8") == "- [[A]]\n- [[B]]\n"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
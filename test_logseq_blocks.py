@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Test block-level patching of regenerated Logseq pages (logseq_blocks.py)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import logseq_blocks
+import summarizer_local
+
+
+PAGE = """# 🎙️ Note
+
+tags:: #voice-note #bjj #inbox
+processed:: false
+related:: [[A]]
+
+---
+
+## Summary
+- Guard passing
+  id:: 6650c0de-0000-4000-8000-000000000001
+\t- Knee slice"""
+
+
+def test_round_trip():
+    assert logseq_blocks.serialize(logseq_blocks.parse(PAGE)) == PAGE
+
+
+def test_pipeline_property_takes_regenerated_value():
+    regenerated = PAGE.replace("related:: [[A]]", "related:: [[B]], [[C]]")
+    patched, changed = logseq_blocks.patch_text(PAGE, regenerated)
+    assert changed == 1
+    assert "related:: [[B]], [[C]]" in patched
+
+
+def test_user_properties_keep_disk_value():
+    on_disk = PAGE.replace("processed:: false", "processed:: true").replace("#inbox", "#reviewed")
+    patched, changed = logseq_blocks.patch_text(on_disk, PAGE)
+    assert changed == 0
+    assert patched == on_disk
+
+
+def test_block_id_survives_rewrite():
+    regenerated = PAGE.replace(
+        "- Guard passing\n  id:: 6650c0de-0000-4000-8000-000000000001", "- Guard passing drills"
+    )
+    patched, changed = logseq_blocks.patch_text(PAGE, regenerated)
+    assert changed == 1
+    assert "- Guard passing drills\n  id:: 6650c0de-0000-4000-8000-000000000001" in patched
+
+
+def test_keep_nothing_regenerates_every_property():
+    regenerated = PAGE.replace("processed:: false", "processed:: true")
+    patched, _ = logseq_blocks.patch_text(PAGE, regenerated, keep=frozenset())
+    assert patched == regenerated
+
+
+def test_reprocessed_page_refreshes_related_links():
+    # What the service's _patch_page does with a re-rendered existing page
+    args = ("- Knee slice from half guard", "(0:01) knee slice", "Class.m4a", "bjj", {}, "2025-05-14-Class")
+    first = summarizer_local.format_output_logseq(*args, related=["2025-05-01-Class"])
+    on_disk = first.replace("processed:: false", "processed:: true")
+    regenerated = summarizer_local.format_output_logseq(*args, related=["2025-05-01-Class", "2025-05-08-Class"])
+    patched, changed = logseq_blocks.patch_text(on_disk, regenerated)
+    assert changed == 1
+    assert "related:: [[2025-05-01-Class]], [[2025-05-08-Class]]" in patched
+    assert "processed:: true" in patched
+
+
+def test_hand_added_bullet_survives_regeneration():
+    on_disk = PAGE + "\n- My own note: drill this Friday"
+    regenerated = PAGE.replace("\t- Knee slice", "\t- Knee slice to back take").replace(
+        "- Guard passing\n  id:: 6650c0de-0000-4000-8000-000000000001\n", "- Guard passing drills\n"
+    )
+    patched, changed = logseq_blocks.patch_text(on_disk, regenerated, previous=PAGE)
+    assert changed == 1
+    assert "- My own note: drill this Friday" in patched
+    assert "\t- Knee slice to back take" in patched
+    assert "\t- Knee slice\n" not in patched + "\n"
+
+
+def test_hand_added_child_of_replaced_block_survives():
+    on_disk = PAGE + "\n\t- Ask coach about the crossface"
+    regenerated = PAGE.replace("- Guard passing", "- Guard passing drills")
+    patched, _ = logseq_blocks.patch_text(on_disk, regenerated, previous=PAGE)
+    assert patched.endswith(
+        "- Guard passing drills\n  id:: 6650c0de-0000-4000-8000-000000000001\n"
+        "\t- Knee slice\n\t- Ask coach about the crossface"
+    )
+
+
+def test_removed_generated_block_with_id_kept_without_previous():
+    regenerated = PAGE.replace("- Guard passing\n  id:: 6650c0de-0000-4000-8000-000000000001\n\t- Knee slice", "")
+    patched, _ = logseq_blocks.patch_text(PAGE, regenerated.rstrip("\n"))
+    assert "id:: 6650c0de-0000-4000-8000-000000000001" in patched
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test the full-text note index (note_search.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import audio_ledger
+import note_search
+import segment_store
+
+SEGMENTS = [
+    {"start": 0.0, "text": "Today we worked the knee slice from half guard."},
+    {"start": 65.4, "text": "Pin the far arm before you pass."},
+]
+
+PAGE = """# 🎙️ Class
+
+tags:: #voice-note #bjj #inbox
+recorded:: [[2025-05-14]]
+processed:: false
+
+---
+
+## Summary
+- Knee slice passing details
+
+---
+
+## 📄 Raw Transcript
+
+- [[2025-05-14-Class (transcript)]]"""
+
+TRANSCRIPT_PAGE = """tags:: #voice-transcript
+
+- (0:00) Today we worked the knee slice
+- (1:05) Underhook before the crossface"""
+
+
+def test_match_expression():
+    assert note_search.match_expression("guard pass") == '"guard" "pass"'
+    assert note_search.match_expression("slic*") == '"slic"*'
+    assert note_search.match_expression('"half guard" sweep') == '"half guard" "sweep"'
+    # FTS5 syntax in user input is quoted away, not interpreted
+    assert note_search.match_expression("NOT (arm-bar)") == '"NOT" "arm-bar"'
+    assert note_search.match_expression('"" ()') == ""
+
+
+def test_search_returns_page_and_timestamp():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = note_search.NoteIndex(Path(tmp) / "search.sqlite")
+        index.index_note("bjj", "class.m4a", "2025-05-14-Class", SEGMENTS, "- Knee slice summary")
+        hits = index.search("far arm")
+        assert [(h["page"], h["kind"], h["start_ms"]) for h in hits] == [("2025-05-14-Class", "segment", 65400)]
+        assert index.search("knee", note_type="meeting") == []
+        assert {h["kind"] for h in index.search("knee slice")} == {"segment", "summary"}
+
+
+def test_reindex_replaces_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = note_search.NoteIndex(Path(tmp) / "search.sqlite")
+        index.index_note("bjj", "class.m4a", "2025-05-14-Class", SEGMENTS)
+        index.index_note("bjj", "other.m4a", "2025-05-15-Other", [{"start": 1.0, "text": "Far arm again."}])
+        index.index_note("bjj", "class.m4a", "2025-05-14-Class", SEGMENTS[:1] + [{"start": 70.0, "text": "Back take."}])
+        assert [h["page"] for h in index.search("far arm")] == ["2025-05-15-Other"]
+        assert index.search("back take")[0]["start_ms"] == 70000
+        assert index.stats()["entries"] == 3
+
+
+def test_backfill_indexes_pages_the_ledger_does_not_know():
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = Path(tmp) / "pages"
+        pages.mkdir()
+        (pages / "2025-05-14-Class.md").write_text(PAGE, encoding="utf-8")
+        (pages / "2025-05-14-Class (transcript).md").write_text(TRANSCRIPT_PAGE, encoding="utf-8")
+        (pages / "Unrelated.md").write_text("- just a page", encoding="utf-8")
+        index = note_search.NoteIndex(Path(tmp) / "search.sqlite")
+        ledger = audio_ledger.AudioLedger(Path(tmp) / "ledger.json")
+
+        assert index.backfill(ledger, pages_dir=pages) == 1
+        hits = index.search("crossface")
+        assert [(h["page"], h["note_type"], h["start_ms"]) for h in hits] == [("2025-05-14-Class", "bjj", 65000)]
+        assert index.search("passing details")[0]["kind"] == "summary"
+        # Already indexed: nothing to do, unless rebuilding
+        assert index.backfill(ledger, pages_dir=pages) == 0
+        assert index.backfill(ledger, rebuild=True, pages_dir=pages) == 1
+
+
+def test_backfill_reads_ledger_segments_from_their_sidecar():
+    with tempfile.TemporaryDirectory() as tmp:
+        sidecar = Path(tmp) / "class.segments"
+        segments = [{**segment, "end": segment["start"] + 5} for segment in SEGMENTS]
+        segment_store.save(sidecar, segments)
+        ledger = audio_ledger.AudioLedger(Path(tmp) / "ledger.json")
+        ledger.record("bjj", "class.m4a", {}, segments, Path(tmp) / "2025-05-14-Class.md",
+                      summary="- Knee slice", segments_path=sidecar)
+        index = note_search.NoteIndex(Path(tmp) / "search.sqlite")
+
+        assert index.backfill(ledger, pages_dir=None) == 1
+        assert index.search("far arm")[0]["start_ms"] == 65400
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
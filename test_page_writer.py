@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Test crash-safe, collision-free page writes (page_writer.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import page_writer
+
+
+def writer(directory: str) -> page_writer.PageWriter:
+    return page_writer.PageWriter(Path(directory), fsync="off")
+
+
+def test_reserve_suffixes_taken_names_case_insensitively():
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "2025-05-14-Class.md").write_text("existing", encoding="utf-8")
+        pages = writer(tmp)
+        assert pages.reserve("2025-05-14-class") == "2025-05-14-class-2"
+        assert pages.reserve("2025-05-14-class") == "2025-05-14-class-3"
+        assert pages.reserve("2025-05-15-class") == "2025-05-15-class"
+
+
+def test_create_never_overwrites_a_page_that_appeared_since_startup():
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = writer(tmp)
+        stem = pages.reserve("note")
+        (Path(tmp) / "note.md").write_text("someone else's", encoding="utf-8")
+        path = pages.create(stem, ["- line 1\n", "- line 2"], reserved=True)
+        assert path.name == "note-2.md"
+        assert path.read_text(encoding="utf-8") == "- line 1\n- line 2"
+        assert (Path(tmp) / "note.md").read_text(encoding="utf-8") == "someone else's"
+        assert not [p for p in Path(tmp).iterdir() if p.name.endswith(".tmp")]
+
+
+def test_create_exact_refuses_an_existing_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = writer(tmp)
+        pages.create_exact("note (transcript)", "- first")
+        try:
+            pages.create_exact("note (transcript)", "- second")
+        except FileExistsError:
+            pass
+        else:
+            raise AssertionError("create_exact overwrote a page")
+        assert (Path(tmp) / "note (transcript).md").read_text(encoding="utf-8") == "- first"
+        assert pages.reserve("note (transcript)") == "note (transcript)-2"
+
+
+def test_write_replaces_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = writer(tmp)
+        path = pages.create("note", "- old")
+        pages.write(path, "- new")
+        assert path.read_text(encoding="utf-8") == "- new"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test the hashed TF-IDF related-notes matrix (related_notes.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import related_notes
+
+KNEE = "Knee slice from half guard, pin the far arm before passing."
+ARMBAR = "Armbar from closed guard, control the wrist and pivot the hips."
+BUDGET = "Quarterly budget review with the finance team and hiring plan."
+
+
+def store(tmp: str) -> related_notes.RelatedNotes:
+    related = related_notes.RelatedNotes(Path(tmp))
+    related.add("bjj", "knee.m4a", "2025-05-14-Knee", KNEE)
+    related.add("bjj", "armbar.m4a", "2025-05-15-Armbar", ARMBAR)
+    related.add("meeting", "budget.m4a", "2025-05-16-Budget", BUDGET)
+    return related
+
+
+def test_query_ranks_similar_notes_and_filters_by_type():
+    with tempfile.TemporaryDirectory() as tmp:
+        related = store(tmp)
+        hits = related.query("knee slice pass from half guard", min_score=0.0)
+        assert hits[0][0] == "2025-05-14-Knee"
+        assert [page for page, _ in related.query(KNEE, note_type="meeting", min_score=0.0)] == ["2025-05-16-Budget"]
+        assert related.query(KNEE, note_type="meeting") == []
+        assert "2025-05-14-Knee" not in [page for page, _ in related.query(KNEE, exclude=("2025-05-14-Knee",))]
+
+
+def test_readded_note_masks_its_old_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        related = store(tmp)
+        related.add("bjj", "knee.m4a", "2025-05-14-Knee-2", "Berimbolo entries from de la riva guard.")
+        assert (related.stats()["notes"], related.stats()["rows"]) == (3, 4)
+        pages = [page for page, _ in related.query(KNEE, min_score=0.0)]
+        assert "2025-05-14-Knee" not in pages
+        assert related.query("berimbolo de la riva")[0][0] == "2025-05-14-Knee-2"
+
+
+def test_document_frequencies_follow_the_live_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        related = store(tmp)
+        knee_ids, _ = related_notes.features(KNEE)
+        assert (related._df[knee_ids] >= 1).all()
+        related.add("bjj", "knee.m4a", "2025-05-14-Knee", "Berimbolo entries.")
+        only_knee = np.setdiff1d(knee_ids, related_notes.features(ARMBAR)[0])
+        assert (related._df[only_knee] == 0).all()
+        # A reload counts only the live rows, like the in-place updates did
+        reloaded = related_notes.RelatedNotes(Path(tmp))
+        assert np.array_equal(reloaded._df, related._df)
+
+
+def test_torn_last_line_is_dropped_on_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        store(tmp)
+        notes_path = Path(tmp) / "notes.jsonl"
+        complete = notes_path.stat().st_size
+        # Crash mid-append: the data files grew, the notes line did not finish
+        with open(notes_path, "a", encoding="utf-8") as f:
+            f.write('{"key": "bjj/torn.m4a", "ty')
+        with open(Path(tmp) / "indices.i4", "ab") as f:
+            f.write(np.arange(7, dtype="<i4").tobytes())
+
+        related = related_notes.RelatedNotes(Path(tmp))
+        assert notes_path.stat().st_size == complete
+        assert related.stats()["notes"] == 3
+        related.add("bjj", "sweep.m4a", "2025-05-17-Sweep", "Scissor sweep from closed guard.")
+        reloaded = related_notes.RelatedNotes(Path(tmp))
+        assert reloaded.query("scissor sweep")[0][0] == "2025-05-17-Sweep"
+        assert (Path(tmp) / "indices.i4").stat().st_size == reloaded.stats()["nonzeros"] * 4
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Test the resource governor's back-off decisions (resource_governor.py)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from resource_governor import CPU_COUNT, LOAD_HIGH, ResourceGovernor
+
+
+def test_own_workers_do_not_cause_back_off():
+    governor = ResourceGovernor(max_threads=CPU_COUNT, cpus=[0])
+    governor.track(-1, "normal", {"threads": CPU_COUNT, "cpus": [0]})
+    # Load made only of our job's threads (one per core)
+    for tick in range(30):
+        assert not governor.update(load=1.0, now=tick * 5.0)
+
+
+def test_own_load_decays_like_the_load_average():
+    governor = ResourceGovernor(max_threads=CPU_COUNT, cpus=[0])
+    governor.track(-1, "normal", {"threads": CPU_COUNT, "cpus": [0]})
+    for tick in range(60):
+        governor.update(load=1.0, now=tick * 5.0)
+    governor.untrack(-1)
+    # The job ended; loadavg still remembers it for a while
+    assert not governor.update(load=0.9, now=300.0)
+    assert not governor.update(load=0.8, now=305.0)
+
+
+def test_outside_load_still_backs_off():
+    governor = ResourceGovernor(max_threads=CPU_COUNT, cpus=[0])
+    governor.track(-1, "normal", {"threads": CPU_COUNT // 2 or 1, "cpus": [0]})
+    own = (CPU_COUNT // 2 or 1) / CPU_COUNT
+    assert governor.update(load=own + LOAD_HIGH + 0.1, now=0.0)
+
+
+def test_job_settings_fix_cpus_for_the_job():
+    governor = ResourceGovernor(max_threads=8, cpus=list(range(8)))
+    governor.backed_off = True
+    settings = governor.job_settings("normal")
+    assert settings == {"threads": 4, "cpus": [0, 1, 2, 3]}
+    assert governor.job_settings("urgent") == {"threads": 8, "cpus": list(range(8))}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Test the on-disk LLM response cache (response_cache.py)."""
+
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import response_cache
+
+
+def size_column_sum(path: Path) -> int:
+    db = sqlite3.connect(str(path))
+    try:
+        return db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_running_size_matches_the_entries():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite"
+        cache = response_cache.ResponseCache(path, ttl=0, max_bytes=10 ** 6)
+        cache.put("a", "x" * 100)
+        cache.put("b", "y" * 50)
+        cache.put("a", "z" * 10)  # Replaced, not added
+        assert cache.stats()["entries"] == 2
+        assert size_column_sum(path) == 60
+        with cache._connect() as db:
+            assert db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0] == 60
+        cache.clear()
+        with cache._connect() as db:
+            assert db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0] == 0
+
+
+def test_least_recently_used_are_evicted_over_the_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = response_cache.ResponseCache(Path(tmp) / "cache.sqlite", ttl=0, max_bytes=250)
+        for key in "abc":
+            cache.put(key, key * 100)
+        assert cache.get("a") is None
+        assert cache.get("b") == "b" * 100
+        cache.put("d", "d" * 100)  # b was just used: c goes
+        assert cache.get("c") is None
+        assert cache.get("b") and cache.get("d")
+
+
+def test_running_size_is_seeded_for_an_existing_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite"
+        db = sqlite3.connect(str(path))
+        # A cache written before the running size existed
+        db.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                   "size INTEGER, created REAL, last_used REAL)")
+        db.execute("INSERT INTO responses VALUES ('old', 'm', 'cached', 6, 0, 0)")
+        db.commit()
+        db.close()
+        cache = response_cache.ResponseCache(path, ttl=0, max_bytes=10 ** 6)
+        cache.put("new", "abcd")
+        with cache._connect() as db:
+            assert db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0] == 10
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Test the columnar segment sidecar (segment_store.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import segment_store
+
+SEGMENTS = [
+    {"start": 0.0, "end": 4.2, "text": "Knee slice from half guard.", "tokens": [1, 2, 3],
+     "avg_logprob": -0.2, "no_speech_prob": 0.01, "compression_ratio": 1.3},
+    {"start": 4.2, "end": 9.0, "text": "Pin the far arm — then pass.", "tokens": [],
+     "avg_logprob": None, "no_speech_prob": None, "compression_ratio": None},
+    {"start": 9.0, "end": 15.5, "text": "Underhook first.", "tokens": [4],
+     "avg_logprob": -0.4, "no_speech_prob": 0.2, "compression_ratio": 1.1},
+]
+
+
+def saved(segments):
+    directory = tempfile.TemporaryDirectory()
+    path = Path(directory.name) / "a.segments"
+    segment_store.save(path, segments)
+    return directory, path
+
+
+def test_round_trip():
+    directory, path = saved(SEGMENTS)
+    with directory:
+        loaded = list(segment_store.load(path))
+    assert [s["text"] for s in loaded] == [s["text"] for s in SEGMENTS]
+    assert [s["tokens"] for s in loaded] == [s["tokens"] for s in SEGMENTS]
+    assert loaded[0]["end"] == 4.2
+    assert np.isnan(loaded[1]["avg_logprob"])
+
+
+def test_between_slices_by_time():
+    directory, path = saved(SEGMENTS)
+    with directory:
+        window = segment_store.load(path).between(5.0, 10.0)
+        texts = [window.text(i) for i in range(len(window))]
+    assert texts == ["Pin the far arm — then pass.", "Underhook first."]
+
+
+def test_times_stay_exact_in_long_recordings():
+    # Five hours in, float32 times would be off by about a millisecond
+    start = 5 * 3600 + 0.123
+    segments = [{"start": start, "end": start + 2.001, "text": "Late point."}]
+    directory, path = saved(segments)
+    with directory:
+        loaded = segment_store.load(path)
+        assert loaded.start.dtype == np.float64
+        assert float(loaded.start[0]) == start
+        assert float(loaded.end[0]) == start + 2.001
+
+
+def test_previous_details_restored_for_kept_segments():
+    directory, path = saved(SEGMENTS)
+    with directory:
+        kept = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in SEGMENTS[:2]]
+        new = [{"start": 9.0, "end": 12.0, "text": "New tail.", "tokens": [9]}]
+        merged = segment_store.with_previous_details(kept + new, 2, path)
+    assert merged[0]["tokens"] == [1, 2, 3]
+    assert merged[2] == new[0]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test the incremental technique aggregates (technique_index.py)."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import technique_index
+
+
+def tables(index: technique_index.TechniqueIndex):
+    with index._connect() as db:
+        return {
+            table: sorted(db.execute(f"SELECT * FROM {table}").fetchall())
+            for table in ("terms", "quarters", "pairs")
+        }
+
+
+def test_quarter_of():
+    assert technique_index.quarter_of("2025-01-31") == "2025-Q1"
+    assert technique_index.quarter_of("2025-05-14") == "2025-Q2"
+    assert technique_index.quarter_of("2025-12-01") == "2025-Q4"
+
+
+def test_update_reports_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = technique_index.TechniqueIndex(Path(tmp) / "index.sqlite")
+        assert index.update("bjj", "a.m4a", "A", {"armbar": 2}, day="2025-05-14")
+        assert not index.update("bjj", "a.m4a", "A", {"armbar": 2, "kimura": 0})
+        assert index.update("bjj", "a.m4a", "A", {"armbar": 3})
+
+
+def test_reindex_with_fewer_terms_decrements_quarters_and_pairs():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = technique_index.TechniqueIndex(Path(tmp) / "index.sqlite")
+        index.update("bjj", "a.m4a", "A", {"armbar": 2, "kimura": 1, "guard": 1}, day="2025-05-14")
+        index.update("bjj", "b.m4a", "B", {"armbar": 1, "guard": 2}, day="2025-08-02")
+        # Appended recording re-transcribed: note A no longer mentions kimura
+        index.update("bjj", "a.m4a", "A", {"armbar": 3, "guard": 1})
+
+        state = tables(index)
+        assert ("bjj", "2025-Q2", "kimura", 1, 1) not in state["quarters"]
+        assert [row for row in state["quarters"] if row[1] == "2025-Q2"] == [
+            ("bjj", "2025-Q2", "armbar", 3, 1), ("bjj", "2025-Q2", "guard", 1, 1)
+        ]
+        assert state["pairs"] == [("bjj", "armbar", "guard", 2)]
+        assert [row[1] for row in state["terms"]] == ["armbar", "guard"]
+
+        # Same aggregates as indexing the final hits from scratch
+        fresh = technique_index.TechniqueIndex(Path(tmp) / "fresh.sqlite")
+        fresh.update("bjj", "a.m4a", "A", {"armbar": 3, "guard": 1}, day="2025-05-14")
+        fresh.update("bjj", "b.m4a", "B", {"armbar": 1, "guard": 2}, day="2025-08-02")
+        assert tables(fresh) == state
+
+
+def test_dropped_term_rederives_its_span():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = technique_index.TechniqueIndex(Path(tmp) / "index.sqlite")
+        index.update("bjj", "a.m4a", "A", {"armbar": 1}, day="2025-05-14")
+        index.update("bjj", "b.m4a", "B", {"armbar": 1}, day="2025-08-02")
+        index.update("bjj", "b.m4a", "B", {"guard": 1})
+        with index._connect() as db:
+            assert db.execute("SELECT notes, first_seen, last_seen FROM terms WHERE term = 'armbar'").fetchone() == (
+                1, "2025-05-14", "2025-05-14"
+            )
+
+
+def test_render_lists_latest_quarter_and_partners():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = technique_index.TechniqueIndex(Path(tmp) / "index.sqlite")
+        index.update("bjj", "a.m4a", "A", {"armbar": 2, "guard": 1}, day="2025-05-14")
+        page = index.render("bjj", {"submissions": ["armbar"], "positions": ["guard"]})
+        assert page.startswith("tags:: #voice-note-index #bjj\nsessions:: 1\n\n## 2025-Q2")
+        assert "## Submissions\n- armbar — 1 session(s), 2 mention(s), [[2025-05-14]] → [[2025-05-14]]" in page
+        assert "\t- with: guard (1)" in page
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
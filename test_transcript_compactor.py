@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test transcript compaction and windowed TextRank (transcript_compactor.py)."""
+
+import sys
+import random
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_usage
+import transcript_compactor
+
+WORDS = "guard pass knee slice armbar sweep mount frames grips underhook budget client review".split()
+
+
+def sentences(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8))) + "." for _ in range(count)]
+
+
+def dense_textrank(texts):
+    """Reference: PageRank over the full n x n similarity."""
+    indptr, indices, weights = transcript_compactor._tfidf_rows(texts)
+    tfidf = np.zeros((len(texts), int(indices.max()) + 1))
+    rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+    tfidf[rows, indices] = weights
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, totals, out=np.full_like(similarity, 1 / len(texts)), where=totals > 0)
+    scores = np.full(len(texts), 1 / len(texts))
+    for _ in range(100):
+        scores = (1 - transcript_compactor.DAMPING) / len(texts) + transcript_compactor.DAMPING * transition.T @ scores
+    return scores
+
+
+def test_windowed_textrank_matches_dense_when_short():
+    texts = sentences(150)
+    assert np.allclose(transcript_compactor.textrank(texts), dense_textrank(texts), atol=1e-6)
+
+
+def test_edges_stay_within_window():
+    texts = sentences(1000, seed=1)
+    rows, cols, _ = transcript_compactor.similarity_edges(texts, window=20, block=64)
+    assert len(rows) <= len(texts) * 40
+    assert np.all(np.abs(rows - cols) <= 20)
+    assert not np.any(rows == cols)
+    scores = transcript_compactor.textrank(texts, window=20)
+    assert len(scores) == len(texts)
+    assert abs(scores.sum() - 1.0) < 1e-3
+
+
+def test_fillers_stutters_and_repeats_removed():
+    transcript = "\n".join([
+        "(0:01) Um, so the the knee slice starts from half guard.",
+        "(0:05) The knee slice starts from half guard.",
+        "(0:09) Uh, then you you pin the far arm.",
+    ])
+    result = transcript_compactor.compact(transcript)
+    assert result.text == "So the knee slice starts from half guard.\nThen you pin the far arm."
+
+
+def test_timestamps_stripped():
+    result = transcript_compactor.compact("(0:01) First point.\n(1:02:03) Second point.")
+    assert result.text == "First point.\nSecond point."
+
+
+def test_target_tokens_respected():
+    transcript = "\n".join(f"({i // 60}:{i % 60:02d}) {text}" for i, text in enumerate(sentences(400, seed=2)))
+    result = transcript_compactor.compact(transcript, target_tokens=200)
+    kept = result.text.splitlines()
+    assert kept
+    assert sum(llm_usage.count_tokens(text, "gpt-4o-mini") + 1 for text in kept) <= 200
+    assert result.compact_tokens < result.original_tokens
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
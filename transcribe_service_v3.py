@@ -6,11 +6,17 @@ Watches multiple inbox folders, transcribes audio, generates summaries.
 
 import os
 import sys
+import json
 import time
 import logging
+import shutil
 import subprocess
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from dotenv import load_dotenv
@@ -19,6 +25,21 @@ from dotenv import load_dotenv
 sys.path.insert(0, str(Path(__file__).parent))
 
 import type_manager
+import audio_ledger
+import whisper_pool
+import resource_governor
+import autotune
+import llm_gateway
+import llm_backend
+import llm_usage
+import journal_writer
+import page_writer
+import logseq_blocks
+import segment_store
+import note_search
+import related_notes
+import technique_index
+import summarizer_local
 
 # Configure logging
 logging.basicConfig(
@@ -34,15 +55,60 @@ BASE_DIR = Path(__file__).parent.absolute()
 load_dotenv(BASE_DIR / ".env")
 INBOX_DIR = BASE_DIR / "inboxes"
 ARCHIVE_DIR = BASE_DIR / "archive"
+STATE_DIR = BASE_DIR / "state"
 LOGSEQ_PAGES = Path("/srv/logseq_graph/pages")
 LOGSEQ_JOURNALS = Path("/srv/logseq_graph/journals")
 AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".WAV", ".MP3", ".M4A"}
 
-# Load whisper model once at startup
-logger.info("🔄 Loading Whisper model (small)...")
-import whisper
-WHISPER_MODEL = whisper.load_model("small")
-logger.info("✓ Whisper model loaded")
+# Worker/thread profile from `--autotune` (explicit env settings win)
+TUNING = autotune.load_profile()
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS") or TUNING.get("workers", 1))
+TORCH_THREADS = int(os.getenv("GOVERNOR_MAX_THREADS") or TUNING.get("threads", 0)) or resource_governor.MAX_THREADS
+
+# Shared across handlers: remembers transcribed prefixes between restarts
+LEDGER = audio_ledger.AudioLedger(STATE_DIR / "ledger.json")
+
+# Journal links are batched and appended (started in main)
+JOURNAL = journal_writer.JournalWriter(LOGSEQ_JOURNALS)
+
+# Atomic page writes; the page-name index is listed on first use
+PAGES = page_writer.PageWriter(LOGSEQ_PAGES)
+
+# Last generated version of each page, so a patch can tell blocks the user
+# added by hand (kept) from stale generated ones (see logseq_blocks.patch)
+GENERATED_DIR = STATE_DIR / "generated"
+
+# Serializes technique index updates with the rewrite of its page
+TECHNIQUE_INDEX_LOCK = threading.Lock()
+
+# Summarizer watchdog: kill after this long with no progress (stderr output or
+# streamed summary tokens); once tokens flow, also enforce a deadline scaled
+# to the summary's output budget
+SUMMARY_INACTIVITY_TIMEOUT = float(os.getenv("SUMMARY_INACTIVITY_TIMEOUT", "120"))
+SUMMARY_DEADLINE_BASE = float(os.getenv("SUMMARY_DEADLINE_BASE", "30"))
+
+# Whisper worker processes (started in main) and the threads feeding them
+WHISPER_POOL = None
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=WHISPER_WORKERS, thread_name_prefix="job")
+
+
+class SegmentLines(Sequence):
+    """Transcript lines, "(M:SS) text", formatted from Whisper segments on access."""
+    
+    def __init__(self, segments: List[Dict], format_timestamp: Callable[[float], str],
+                 correct: Callable[[str], str]):
+        self.segments = segments
+        self.format_timestamp = format_timestamp
+        self.correct = correct
+    
+    def __len__(self):
+        return len(self.segments)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        segment = self.segments[index]
+        return self.correct(f"({self.format_timestamp(segment['start'])}) {segment['text']}")
 
 
 class VoiceNoteHandler(FileSystemEventHandler):
@@ -52,7 +118,9 @@ class VoiceNoteHandler(FileSystemEventHandler):
         self.note_type = note_type
         self.config = config
         self.processing = set()  # Track files being processed
-        self.processed_files = set()  # Track completed files
+        self._processing_lock = threading.Lock()  # Watchdog thread vs startup scan
+        self.processed_files = {}  # Track completed files: path -> (size, mtime)
+        self.ledger = LEDGER
     
     def on_created(self, event):
         """Process new audio file."""
@@ -78,8 +146,8 @@ class VoiceNoteHandler(FileSystemEventHandler):
         if audio_path.suffix.lower() not in AUDIO_EXTENSIONS:
             return
         
-        # Skip if already processed
-        if str(audio_path) in self.processed_files:
+        # Skip if already processed (a re-synced, grown file is processed again)
+        if self.processed_files.get(str(audio_path)) == self._file_signature(audio_path):
             return
         
         # Avoid duplicate processing
@@ -93,17 +161,26 @@ class VoiceNoteHandler(FileSystemEventHandler):
         if not self._is_file_stable(audio_path):
             return
         
-        self.processing.add(str(audio_path))
-        
+        # Claim the file (another event may have passed the checks meanwhile)
+        with self._processing_lock:
+            if str(audio_path) in self.processing:
+                return
+            self.processing.add(str(audio_path))
+        JOB_EXECUTOR.submit(self._run_job, audio_path)
+    
+    def _run_job(self, audio_path: Path):
+        """Process one audio file on a job thread."""
         try:
             logger.info(f"📥 New {self.note_type} audio: {audio_path.name}")
+            signature = self._file_signature(audio_path)
             self._process_audio(audio_path)
-            self.processed_files.add(str(audio_path))
+            self.processed_files[str(audio_path)] = signature
         except Exception as e:
             logger.error(f"❌ Error processing {audio_path.name}: {e}")
             self._move_to_failed(audio_path, self.note_type, str(e))
         finally:
-            self.processing.discard(str(audio_path))
+            with self._processing_lock:
+                self.processing.discard(str(audio_path))
     
     def _is_file_stable(self, file_path: Path, wait_seconds=3) -> bool:
         """Check if file is done being written by comparing size over time."""
@@ -117,51 +194,176 @@ class VoiceNoteHandler(FileSystemEventHandler):
         except Exception:
             return False
     
+    def _file_signature(self, file_path: Path) -> tuple:
+        """Size and mtime, used to notice a re-synced file at the same path."""
+        try:
+            stat = file_path.stat()
+            return (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            return None
+    
     def process_existing_file(self, audio_path: Path):
         """Process an existing file (called on startup)."""
         self._handle_audio_event(audio_path)
     def _process_audio(self, audio_path: Path):
         """Transcribe and summarize audio file."""
         filename = audio_path.stem
+        entry = self.ledger.get(self.note_type, audio_path.name)
         
-        # 1. Transcribe
+        # 1. Transcribe (only the appended tail if the ledger knows this recording)
         logger.info("🎤 Transcribing...")
-        transcript = self._transcribe(audio_path)
+        transcription = WHISPER_POOL.transcribe(
+            audio_path, entry, priority=type_manager.get_priority(self.config)
+        )
+        WHISPER_POOL.log_memory()
+        WHISPER_POOL.save_memory_report(STATE_DIR / "workers.json")
+        kept = transcription["kept"]
+        
+        if transcription["unchanged"]:
+            logger.info(f"✓ Unchanged since last transcription, skipping: {audio_path.name}")
+            done_path = self._move_to_done(audio_path, self.note_type)
+            logger.info(f"✓ Moved to done: {done_path.relative_to(BASE_DIR)}")
+            return
+        
+        if kept:
+            resume_seconds = transcription["resume_sample"] / audio_ledger.SAMPLE_RATE
+            logger.info(
+                f"⏩ Appended recording: reused {kept} segments, "
+                f"transcribed from {self._format_timestamp(resume_seconds)}"
+            )
+        segments = transcription["segments"]
+        transcript = self._format_segments(segments)
         logger.info(f"✓ Transcript: {len(transcript)} chars")
         
-        # 2. Generate summary
+        # 2. Generate summary (extend the previous one when resuming)
         logger.info(f"🤖 Generating {self.note_type} summary...")
-        summary = self._generate_summary(transcript, self.note_type, self.config, filename)
-        
-        # 3. Save to Logseq
-        page_path = self._save_to_logseq(summary, filename)
-        logger.info(f"✓ Created page: {page_path.name}")
+        previous_summary = entry.get("summary") if kept else None
+        if previous_summary and summarizer_local.FALLBACK_NOTE in previous_summary:
+            # Recorded before fallbacks were kept out of the ledger
+            previous_summary = None
+        existing_page = Path(entry["page"]) if kept and entry.get("page") else None
+        if existing_page and not existing_page.exists():
+            existing_page = None
+        # Claim the page name up front (final once the page is created)
+        page_stem = existing_page.stem if existing_page else self._reserve_page(filename)
+        job_id = llm_usage.new_job_id(self.note_type, filename)
+        summary, complete = self._generate_summary(
+            transcript, self.note_type, self.config, filename,
+            previous_summary=previous_summary,
+            new_from=kept if previous_summary else None,
+            job_id=job_id,
+            page_stem=page_stem
+        )
         
-        # 4. Add to journal
-        self._add_to_journal(filename, page_path.stem)
-        logger.info(f"✓ Added to journal: {datetime.now().strftime('%Y_%m_%d')}.md")
+        # 3. Save to Logseq (update the existing page in place when resuming);
+        # the page is rendered from the segments straight into the page file
+        transcript_lines = SegmentLines(segments, self._format_timestamp, self._domain_corrector())
+        related_text = summary if complete else transcript
+        related = self._related_notes(page_stem, related_text)
+        page = summarizer_local.render_page(
+            summary, transcript_lines, filename, self.note_type, self.config, page_stem, related
+        )
+        if existing_page:
+            page_path = existing_page
+            self._patch_page(page_path, "".join(page))
+            self._save_transcript_pages(page_stem, transcript_lines, new=False)
+        else:
+            page_path = PAGES.create(page_stem, page, reserved=True)
+            if page_path.stem != page_stem:
+                # A page took the reserved name since startup: link the transcript pages by the new one
+                page_stem = page_path.stem
+                PAGES.write(page_path, summarizer_local.render_page(
+                    summary, transcript_lines, filename, self.note_type, self.config, page_stem, related
+                ))
+            self._remember_generated(page_path)
+            logger.info(f"✓ Created page: {page_path.name}")
+            # Transcript pages only once the page name is final, never over existing pages
+            self._save_transcript_pages(page_stem, transcript_lines, new=True)
+            
+            # 4. Add to journal
+            self._add_to_journal(filename, page_path.stem)
+            logger.info(f"✓ Added to journal: {datetime.now().strftime('%Y_%m_%d')}.md")
         
-        # 5. Archive
+        # 5. Archive (with the segments and the job's LLM usage alongside);
+        # the ledger entry points at the archived segments
         done_path = self._move_to_done(audio_path, self.note_type)
         logger.info(f"✓ Moved to done: {done_path.relative_to(BASE_DIR)}")
+        segments_path = self._save_segments(segments, kept, done_path)
+        self.ledger.record(
+            self.note_type, audio_path.name, transcription["fingerprint"], segments, page_path,
+            summary=summary if complete else None, segments_path=segments_path
+        )
+        self._index_note(audio_path.name, page_path, segments, summary if complete else None)
+        self._add_related(audio_path.name, page_path, related_text)
+        self._update_technique_index(audio_path.name, page_path, transcript)
+        usage = llm_usage.get_ledger().write_sidecar(job_id, done_path.with_name(f"{done_path.stem}.usage.json"))
+        if usage:
+            total = usage["total"]
+            logger.info(f"🔢 LLM usage: {total['prompt_tokens']} prompt + {total['completion_tokens']} "
+                        f"completion tokens in {total['calls']} call(s), {total['latency_s']}s")
         logger.info(f"✅ Complete: {audio_path.name}")
     
-    def _transcribe(self, audio_path: Path) -> str:
-        """Transcribe audio using Whisper with timestamps."""
-        result = WHISPER_MODEL.transcribe(str(audio_path), word_timestamps=True)
-        
-        # Format with timestamps for readability
-        segments = result.get("segments", [])
-        if not segments:
-            return result["text"].strip()
-        
-        formatted_lines = []
-        for segment in segments:
-            start_time = self._format_timestamp(segment["start"])
-            text = segment["text"].strip()
-            formatted_lines.append(f"({start_time}) {text}")
-        
-        return "\n".join(formatted_lines)
+    def _save_segments(self, segments: List[Dict], kept: int, done_path: Path) -> Optional[Path]:
+        """Store the full segments next to the archived audio (segment_store); returns the path."""
+        path = segment_store.sidecar_path(done_path)
+        try:
+            segment_store.save(path, segment_store.with_previous_details(segments, kept, path))
+            logger.info(f"✓ Saved {len(segments)} segments: {path.name}")
+            return path
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not save segments (recording will not be resumable): {e}")
+            return None
+    
+    def _index_note(self, audio_name: str, page_path: Path, segments: List[Dict], summary: Optional[str]):
+        """Add the note to the full-text search index (note_search)."""
+        try:
+            note_search.get_index().index_note(self.note_type, audio_name, page_path.stem, segments, summary)
+        except Exception as e:
+            logger.warning(f"Could not index note for search: {e}")
+    
+    def _related_notes(self, page_stem: str, text: str) -> List[str]:
+        """Pages of the most similar past notes of this type (related_notes)."""
+        try:
+            hits = related_notes.get_related().query(text, self.note_type, exclude=(page_stem,))
+        except Exception as e:
+            logger.warning(f"Could not find related notes: {e}")
+            return []
+        if hits:
+            logger.info(f"🔗 Related: {', '.join(f'{page} ({score:.2f})' for page, score in hits)}")
+        return [page for page, _ in hits]
+    
+    def _add_related(self, audio_name: str, page_path: Path, text: str):
+        """Add the note to the related-notes matrix, for linking from later notes."""
+        try:
+            related_notes.get_related().add(self.note_type, audio_name, page_path.stem, text)
+        except Exception as e:
+            logger.warning(f"Could not add note to related notes: {e}")
+    
+    def _update_technique_index(self, audio_name: str, page_path: Path, transcript: str):
+        """Fold the note's domain term hits into the technique index, and refresh its page if they changed."""
+        page_name = type_manager.get_technique_index_settings(self.config).get("page")
+        if not page_name:
+            return
+        domain_dict = type_manager.get_domain_dictionary(self.config)
+        hits = summarizer_local.domain_matcher(domain_dict)(transcript)
+        try:
+            index = technique_index.get_index()
+            # One job at a time, so an older render never overwrites a newer one
+            with TECHNIQUE_INDEX_LOCK:
+                if not index.update(self.note_type, audio_name, page_path.stem, hits):
+                    return
+                # Fully generated page: no property is the user's (sessions:: must follow the count)
+                self._patch_page(LOGSEQ_PAGES / f"{page_name}.md", index.render(self.note_type, domain_dict),
+                                 keep=frozenset())
+        except Exception as e:
+            logger.warning(f"Could not update technique index: {e}")
+    
+    def _format_segments(self, segments: List[Dict]) -> str:
+        """Format segments with timestamps for readability."""
+        return "\n".join(
+            f"({self._format_timestamp(segment['start'])}) {segment['text']}"
+            for segment in segments
+        )
     
     def _format_timestamp(self, seconds: float) -> str:
         """Format seconds as MM:SS timestamp."""
@@ -169,94 +371,224 @@ class VoiceNoteHandler(FileSystemEventHandler):
         secs = int(seconds % 60)
         return f"{minutes}:{secs:02d}"
     
-    def _generate_summary(self, transcript: str, note_type: str, config: dict, filename: str) -> str:
-        """Call local summarizer via subprocess."""
+    def _generate_summary(
+        self,
+        transcript: str,
+        note_type: str,
+        config: dict,
+        filename: str,
+        previous_summary: Optional[str] = None,
+        new_from: Optional[int] = None,
+        job_id: Optional[str] = None,
+        page_stem: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """
+        Call local summarizer via subprocess. Returns (summary markdown,
+        complete); the summary comes back as JSON in a result file.
+        """
+        partial_file = STATE_DIR / f"{note_type}-{filename}.partial.md"
+        result_file = STATE_DIR / f"{note_type}-{filename}.result.json"
+        partial_file.parent.mkdir(parents=True, exist_ok=True)
+        partial_file.unlink(missing_ok=True)
+        result_file.unlink(missing_ok=True)
+        cmd = [sys.executable, str(BASE_DIR / "summarizer_local.py"), note_type, filename,
+               "--partial", str(partial_file), "--result", str(result_file)]
+        if page_stem:
+            cmd += ["--page", page_stem]
+        previous_file = None
         try:
-            env = os.environ.copy()
-            result = subprocess.run(
-                [sys.executable, str(BASE_DIR / "summarizer_local.py"), note_type, filename],
-                input=transcript,
-                capture_output=True,
-                text=True,
-                env=env,
-                timeout=120
-            )
+            if previous_summary:
+                # Incremental update: summarizer extends the previous summary
+                previous_file = STATE_DIR / f"{note_type}-{filename}.summary.md"
+                previous_file.write_text(previous_summary, encoding="utf-8")
+                cmd += ["--previous-summary", str(previous_file), "--new-from", str(new_from)]
             
-            if result.returncode != 0:
-                logger.error(f"Summarizer error: {result.stderr}")
-                return self._format_fallback(transcript, filename)
+            returncode, stdout, stderr = self._run_summarizer(cmd, transcript, partial_file, job_id)
             
-            return result.stdout
+            if returncode != 0:
+                logger.error(f"Summarizer error: {stderr}")
+                return self._fallback_summary(self._read_partial(partial_file)), False
+            
+            result = json.loads(result_file.read_text(encoding="utf-8"))
+            # A fallback (LLM call failed, budget refused) is not a summary to keep
+            return result["summary"], not (result["partial"] or result.get("fallback"))
         except Exception as e:
             logger.error(f"Summarizer exception: {e}")
-            return self._format_fallback(transcript, filename)
+            return self._fallback_summary(self._read_partial(partial_file)), False
+        finally:
+            partial_file.unlink(missing_ok=True)
+            result_file.unlink(missing_ok=True)
+            if previous_file:
+                previous_file.unlink(missing_ok=True)
     
-    def _format_fallback(self, transcript: str, filename: str) -> str:
-        """Fallback format if summarization fails."""
-        date = datetime.now().strftime("%Y-%m-%d")
-        title = Path(filename).stem
+    def _run_summarizer(
+        self,
+        cmd: list,
+        transcript: str,
+        partial_file: Path,
+        job_id: Optional[str] = None
+    ) -> Tuple[Optional[int], str, str]:
+        """
+        Run the summarizer, watching its progress instead of a fixed timeout.
+        Progress is stderr output or growth of the streamed partial summary.
+        Returns (returncode, stdout, stderr); returncode is None if killed.
+        """
+        env = os.environ.copy()
+        if job_id:
+            # LLM usage is recorded against this job
+            env["LLM_JOB_ID"] = job_id
+        summary_deadline = self._summary_deadline()
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env
+        )
+        stdout, stderr = [], []
+        last_activity = [time.monotonic()]
         
-        # Format with proper Logseq metadata
-        return f"""# 🎙️ {title}
-
-tags:: #voice-note #{self.note_type} #inbox
-recorded:: [[{date}]]
-processed:: false
-
----
-
-## Summary
-- Unable to generate AI summary. See raw transcript below.
-
----
-
-## 📄 Raw Transcript
-
-<details>
-<summary>Click to expand full transcript</summary>
-
-{transcript}
-
-</details>"""
-        """Fallback format if summarization fails."""
-        date = datetime.now().strftime("%Y-%m-%d")
-        return f"""## Summary
-
-Unable to generate AI summary. See raw transcript below.
-
----
-
-## 📄 Raw Transcript
-
-<details>
-<summary>Click to expand full transcript</summary>
-
-{transcript}
-
-</details>"""
+        def feed():
+            try:
+                process.stdin.write(transcript)
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        
+        def pump(stream, sink, is_progress):
+            for line in stream:
+                sink.append(line)
+                if is_progress:
+                    last_activity[0] = time.monotonic()
+        
+        threads = [
+            threading.Thread(target=feed, daemon=True),
+            threading.Thread(target=pump, args=(process.stdout, stdout, False), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, stderr, True), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        
+        partial_size = 0
+        deadline = None
+        killed = None
+        while process.poll() is None:
+            time.sleep(1)
+            now = time.monotonic()
+            size = partial_file.stat().st_size if partial_file.exists() else 0
+            if size != partial_size:
+                partial_size = size
+                last_activity[0] = now
+                if deadline is None:
+                    deadline = now + summary_deadline
+            if now - last_activity[0] > SUMMARY_INACTIVITY_TIMEOUT:
+                killed = f"no progress for {SUMMARY_INACTIVITY_TIMEOUT:.0f}s"
+            elif deadline is not None and now > deadline:
+                killed = f"deadline of {summary_deadline:.0f}s exceeded"
+            if killed:
+                logger.error(f"⏱️  Summarizer killed: {killed}")
+                process.kill()
+                break
+        
+        process.wait()
+        for thread in threads:
+            thread.join(timeout=5)
+        return (None if killed else process.returncode), "".join(stdout), "".join(stderr)
     
-    def _save_to_logseq(self, content: str, filename: str) -> Path:
-        """Save summary to Logseq pages directory."""
+    def _summary_deadline(self) -> float:
+        """Deadline for a streaming summary, scaled to the largest output budget it may get."""
+        budgets = [summarizer_local.MAX_TOKENS] + [
+            llm_backend.output_budget(rule, summarizer_local.MAX_TOKENS)
+            for rule in type_manager.get_llm_settings(self.config).get("routes", [])
+        ]
+        return SUMMARY_DEADLINE_BASE + llm_gateway.stream_deadline(max(budgets))
+    
+    def _read_partial(self, partial_file: Path) -> Optional[str]:
+        """Summary text streamed before the summarizer failed, if any."""
+        try:
+            return partial_file.read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+    
+    def _fallback_summary(self, partial_summary: Optional[str] = None) -> str:
+        """Summary to use if summarization fails (keeps any partial summary)."""
+        if partial_summary:
+            summary = summarizer_local._ensure_logseq_format(partial_summary)
+            return summary + f"\n- {summarizer_local.PARTIAL_NOTE}"
+        return f"- {summarizer_local.FALLBACK_NOTE}"
+    
+    def _domain_corrector(self) -> Callable[[str], str]:
+        """Same domain corrections the summarizer applies to its transcript."""
+        return summarizer_local.domain_corrector(type_manager.get_domain_dictionary(self.config))
+    
+    def _patch_page(self, page_path: Path, content: str, keep: frozenset = logseq_blocks.USER_PROPERTIES):
+        """
+        Bring a page up to date with regenerated content, rewriting only the
+        changed blocks and keeping properties edited in Logseq (processed::, ids;
+        see logseq_blocks.patch for keep). Blocks added by hand since the page
+        was last generated are kept.
+        """
+        try:
+            current = page_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            PAGES.write(page_path, content)
+            self._remember_generated(page_path, content)
+            logger.info(f"✓ Created page: {page_path.name}")
+            return
+        try:
+            previous = (GENERATED_DIR / page_path.name).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            previous = None
+        patched, changed = logseq_blocks.patch_text(current, content, keep, previous)
+        self._remember_generated(page_path, content)
+        if changed:
+            PAGES.write(page_path, patched)
+            logger.info(f"✓ Updated page: {page_path.name} ({changed} block(s) changed)")
+        else:
+            logger.info(f"✓ Page unchanged: {page_path.name}")
+    
+    def _remember_generated(self, page_path: Path, content: Optional[str] = None):
+        """Keep the generated version of a page (the page file itself if content is None)."""
+        path = GENERATED_DIR / page_path.name
+        try:
+            GENERATED_DIR.mkdir(parents=True, exist_ok=True)
+            if content is None:
+                shutil.copyfile(page_path, path)
+            else:
+                page_writer.atomic_write(path, content, fsync=False)
+        except OSError as e:
+            logger.warning(f"Could not keep generated version of {page_path.name}: {e}")
+    
+    def _reserve_page(self, filename: str) -> str:
+        """Claim today's page name for a recording (suffixed if the name is taken)."""
         date = datetime.now().strftime("%Y-%m-%d")
-        page_name = f"{date}-{filename}.md"
-        page_path = LOGSEQ_PAGES / page_name
-        
-        page_path.write_text(content, encoding="utf-8")
-        return page_path
+        return PAGES.reserve(f"{date}-{filename}")
+    
+    def _save_transcript_pages(self, page_stem: str, transcript_lines: Sequence, new: bool):
+        """
+        Write the linked transcript pages (transcript "pages" mode only). A new
+        note's pages are created exclusively: an existing page of that name is
+        left alone, not overwritten.
+        """
+        settings = type_manager.get_transcript_settings(self.config)
+        if settings.get("mode", summarizer_local.TRANSCRIPT_MODE) != "pages":
+            return
+        pages = summarizer_local.transcript_pages(page_stem, transcript_lines, self.config)
+        for name, content in pages:
+            if not new:
+                self._patch_page(LOGSEQ_PAGES / f"{name}.md", content)
+                continue
+            try:
+                page_path = PAGES.create_exact(name, content)
+            except FileExistsError:
+                logger.warning(f"Transcript page already exists, not overwritten: {name}.md")
+                continue
+            self._remember_generated(page_path, content)
     
     def _add_to_journal(self, filename: str, page_stem: str):
         """Add link to today's journal."""
-        date = datetime.now().strftime("%Y_%m_%d")
-        journal_path = LOGSEQ_JOURNALS / f"{date}.md"
-        
-        link = f"\n- [[{page_stem}]]\n"
-        
-        if journal_path.exists():
-            content = journal_path.read_text(encoding="utf-8")
-            if link not in content:
-                journal_path.write_text(content + link, encoding="utf-8")
-        else:
-            journal_path.write_text(link, encoding="utf-8")
+        JOURNAL.add_link(page_stem)
     
     def _move_to_done(self, audio_path: Path, note_type: str) -> Path:
         """Move audio to done archive."""
@@ -289,6 +621,19 @@ def main():
     logger.info(f"Pages: {LOGSEQ_PAGES}")
     logger.info(f"Archive: {ARCHIVE_DIR}")
     
+    # Start Whisper workers (weights are mmapped and shared between them)
+    global WHISPER_POOL
+    if TUNING:
+        logger.info(f"Tuning profile: {TUNING['workers']} worker(s) x {TUNING['threads']} thread(s) "
+                    f"(RTF {TUNING.get('rtf')}, tuned {TUNING.get('tuned_at')})")
+    governor = resource_governor.ResourceGovernor(max_threads=TORCH_THREADS)
+    governor.start()
+    logger.info(f"🔄 Starting {WHISPER_WORKERS} Whisper worker(s) x {TORCH_THREADS} thread(s) "
+                f"({whisper_pool.MODEL_NAME})...")
+    WHISPER_POOL = whisper_pool.WhisperPool(WHISPER_WORKERS, governor=governor)
+    logger.info("✓ Whisper workers ready")
+    JOURNAL.start()
+    
     # Load available types
     types = type_manager.list_available_types()
     logger.info(f"Available types: {types}")
@@ -298,17 +643,7 @@ def main():
     # Create observer
     observer = Observer()
     
-    # Register handler for each type
-    for note_type in types:
-        config = type_manager.load_config(note_type)
-        handler = VoiceNoteHandler(note_type, config)
-        inbox_path = INBOX_DIR / note_type
-        inbox_path.mkdir(parents=True, exist_ok=True)
-        
-        observer.schedule(handler, str(inbox_path), recursive=False)
-        logger.info(f"Watching inbox: {note_type}")
-    
-    # Store handlers for startup scan
+    # One handler per type (also used for the startup scan)
     handlers = {}
     
     # Register handler for each type
@@ -340,12 +675,22 @@ def main():
     try:
         while True:
             time.sleep(1)
+            PAGES.flush()
     except KeyboardInterrupt:
         observer.stop()
         logger.info("Stopping...")
     
     observer.join()
+    JOB_EXECUTOR.shutdown(wait=True)
+    JOURNAL.close()
+    PAGES.flush()
+    WHISPER_POOL.shutdown()
+    governor.stop()
 
 
 if __name__ == "__main__":
-    main()
+    if "--autotune" in sys.argv:
+        args = [a for a in sys.argv[1:] if a != "--autotune"]
+        autotune.run_autotune(Path(args[0]) if args else None)
+    else:
+        main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Transcript Compactor: Shrink a transcript before it is sent to the LLM.
+
+Whisper transcripts carry a timestamp on every line, filler words, stutters
+and near-duplicate sentences, all of which are paid for as input tokens (and
+again for every stage of the multi-stage summarizers). Compaction:
+1. Strips "(M:SS)" prefixes
+2. Removes filler words and stuttered repeats ("the the")
+3. Drops sentences that near-duplicate one said just before
+4. Optionally (target_tokens set) keeps only the most central sentences, in
+   their original order, by TF-IDF + TextRank until the budget is met
+
+TextRank stays within bounded memory on multi-hour transcripts: the TF-IDF
+rows are sparse (CSR arrays), and each sentence is only compared with the
+SIMILARITY_WINDOW sentences either side of it (the whole transcript when it
+is shorter than that), one block of rows at a time.
+
+Only the LLM input is compacted; pages keep the full transcript.
+
+Type config:
+    "compaction": {"enabled": true, "target_tokens": 3000}
+
+Usage:
+    cat transcript.txt | python transcript_compactor.py [target_tokens]
+"""
+
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import type_manager
+import llm_usage
+
+# Global switch, e.g. TRANSCRIPT_COMPACTION=0 to send transcripts verbatim
+COMPACTION_ENABLED = os.getenv("TRANSCRIPT_COMPACTION", "1") != "0"
+
+TIMESTAMP = re.compile(r"^\((\d+:\d{2}(?::\d{2})?)\)\s*")
+FILLERS = re.compile(
+    r",?\s*(?:\b(?:um+|uh+|uhm|erm|er|ah+|hmm+|mm+)\b,?"
+    r"|\b(?:you know|i mean|like|so yeah),)",
+    re.IGNORECASE
+)
+STUTTER = re.compile(r"\b(\w+)(?:[\s,]+\1\b)+", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"[a-z0-9']+")
+
+DUPLICATE_WINDOW = 5        # Compare against this many preceding sentences
+DUPLICATE_THRESHOLD = 0.8   # Word-set Jaccard similarity that counts as a repeat
+DAMPING = 0.85
+SIMILARITY_WINDOW = 200     # Sentences either side a sentence is compared with
+SIMILARITY_BLOCK = 200      # Rows of the similarity computed at a time
+
+
+class Compaction:
+    """Result of compacting a transcript."""
+
+    def __init__(self, text: str, original_tokens: int, compact_tokens: int):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.compact_tokens = compact_tokens
+
+    @property
+    def ratio(self) -> float:
+        """Compact size as a fraction of the original (lower is smaller)."""
+        return self.compact_tokens / self.original_tokens if self.original_tokens else 1.0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compact_tokens
+
+
+def strip_timestamps(transcript: str) -> List[str]:
+    """Lines without their "(M:SS)" prefix."""
+    return [TIMESTAMP.sub("", line, count=1) for line in transcript.splitlines()]
+
+
+def clean_text(text: str) -> str:
+    """Remove fillers and stuttered repeats, tidy the spacing left behind."""
+    text = FILLERS.sub(" ", text)
+    text = STUTTER.sub(r"\1", text)
+    text = re.sub(r"\s+([,.!?])", r"\1", text)
+    text = re.sub(r"([,.!?])(?:\s*[,.])+", r"\1", text)
+    text = re.sub(r"\s{2,}", " ", text).lstrip(" ,.!?").rstrip(" ,")
+    return text[:1].upper() + text[1:]
+
+
+def word_set(sentence: str) -> set:
+    """Lowercased words of a sentence, for near-duplicate checks."""
+    return set(WORD.findall(sentence.lower()))
+
+
+def is_repeat(sentence: str, recent: List[set]) -> bool:
+    """Whether a sentence near-duplicates one of the recent ones."""
+    words = word_set(sentence)
+    if not words:
+        return True
+    for other in recent:
+        if len(words & other) / len(words | other) >= DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+
+def _tfidf_rows(sentences: List[str]):
+    """L2-normalized TF-IDF rows as CSR arrays (indptr, word ids, weights)."""
+    import numpy as np
+
+    vocabulary = {}
+    indptr = [0]
+    indices, counts = [], []
+    for sentence in sentences:
+        row = {}
+        for word in WORD.findall(sentence.lower()):
+            index = vocabulary.setdefault(word, len(vocabulary))
+            row[index] = row.get(index, 0) + 1
+        indices.extend(row)
+        counts.extend(row.values())
+        indptr.append(len(indices))
+
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int64)
+    df = np.bincount(indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+    weights = np.array(counts, dtype=np.float64) * idf[indices]
+    rows = np.repeat(np.arange(len(sentences)), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(sentences)))
+    weights /= np.where(norms > 0, norms, 1)[rows]
+    return indptr, indices, weights
+
+
+def similarity_edges(sentences: List[str], window: int = SIMILARITY_WINDOW, block: int = SIMILARITY_BLOCK):
+    """
+    Cosine similarity of each sentence with its neighbours (|i - j| <= window,
+    i != j) as sparse edges (rows, cols, weights). Each block of rows is
+    densified over the vocabulary of its neighbourhood only, so memory is
+    bounded by the window, not the transcript.
+    """
+    import numpy as np
+
+    n = len(sentences)
+    indptr, indices, weights = _tfidf_rows(sentences)
+    all_rows, all_cols, all_sims = [], [], []
+    for start in range(0, n, block):
+        end = min(n, start + block)
+        low, high = max(0, start - window), min(n, end + window)
+        entries = slice(indptr[low], indptr[high])
+        words, local = np.unique(indices[entries], return_inverse=True)
+        dense = np.zeros((high - low, len(words)), dtype=np.float32)
+        dense[np.repeat(np.arange(high - low), np.diff(indptr[low:high + 1])), local] = weights[entries]
+
+        similarity = dense[start - low:end - low] @ dense.T
+        i, j = np.nonzero(similarity > 0)
+        rows, cols = i + start, j + low
+        near = (np.abs(rows - cols) <= window) & (rows != cols)
+        all_rows.append(rows[near])
+        all_cols.append(cols[near])
+        all_sims.append(similarity[i[near], j[near]].astype(np.float64))
+    if not all_rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(all_rows), np.concatenate(all_cols), np.concatenate(all_sims)
+
+
+def textrank(sentences: List[str], window: int = SIMILARITY_WINDOW):
+    """Centrality score per sentence: PageRank over windowed TF-IDF cosine similarity."""
+    import numpy as np
+
+    n = len(sentences)
+    rows, cols, sims = similarity_edges(sentences, window)
+    totals = np.bincount(rows, weights=sims, minlength=n)
+    transition = sims / np.where(totals > 0, totals, 1)[rows]
+    # Sentences similar to nothing link to everything (uniform row)
+    dangling = totals == 0
+
+    scores = np.full(n, 1 / n)
+    for _ in range(100):
+        spread = np.bincount(cols, weights=transition * scores[rows], minlength=n)
+        updated = (1 - DAMPING) / n + DAMPING * (spread + scores[dangling].sum() / n)
+        converged = np.abs(updated - scores).sum() < 1e-6
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def select_sentences(sentences: List[str], target_tokens: int, model: str) -> List[str]:
+    """Most central sentences, in original order, within target_tokens."""
+    scores = textrank(sentences)
+    budget = target_tokens
+    keep = set()
+    for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        cost = llm_usage.count_tokens(sentences[index], model) + 1
+        if cost <= budget:
+            keep.add(index)
+            budget -= cost
+    return [sentence for i, sentence in enumerate(sentences) if i in keep]
+
+
+def compact(transcript: str, target_tokens: Optional[int] = None, model: str = "gpt-4o-mini") -> Compaction:
+    """Compact a transcript for LLM input (see module docstring)."""
+    original_tokens = llm_usage.count_tokens(transcript, model)
+    sentences = []
+    recent = []
+    for line in strip_timestamps(transcript):
+        for sentence in SENTENCE_END.split(clean_text(line)):
+            sentence = sentence.strip()
+            if not sentence or is_repeat(sentence, recent):
+                continue
+            sentences.append(sentence)
+            recent = (recent + [word_set(sentence)])[-DUPLICATE_WINDOW:]
+
+    if target_tokens and sentences:
+        kept = sum(llm_usage.count_tokens(text, model) + 1 for text in sentences)
+        if kept > target_tokens:
+            sentences = select_sentences(sentences, target_tokens, model)
+
+    text = "\n".join(sentences)
+    return Compaction(text, original_tokens, llm_usage.count_tokens(text, model))
+
+
+def compact_for_llm(transcript: str, config: Dict) -> str:
+    """
+    Compact a transcript per the type's settings, log and record the savings
+    against the current job, and return the text to send to the LLM.
+    """
+    settings = type_manager.get_compaction_settings(config)
+    if not COMPACTION_ENABLED or not settings.get("enabled", True):
+        return transcript
+    try:
+        result = compact(transcript, settings.get("target_tokens"))
+    except ImportError:
+        # Extractive pass needs numpy; fall back to the lossless steps
+        print("⚠️  numpy not installed, skipping extractive compaction", file=sys.stderr)
+        result = compact(transcript)
+    print(f"🗜️  Compacted transcript: {result.original_tokens} → {result.compact_tokens} tokens "
+          f"({result.ratio:.0%}, saved {result.saved_tokens})", file=sys.stderr)
+    llm_usage.record_compaction(result.original_tokens, result.compact_tokens)
+    return result.text
+
+
+if __name__ == "__main__":
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    result = compact(sys.stdin.read(), target)
+    print(result.text)
+    print(f"{result.original_tokens} → {result.compact_tokens} tokens ({result.ratio:.0%})", file=sys.stderr)
@@ -39,7 +39,9 @@ def load_config(note_type: str) -> Dict:
         )
     
     with open(config_file, 'r') as f:
-        return json.load(f)
+        config = json.load(f)
+    config.setdefault("type", note_type)
+    return config
 
 
 def list_available_types() -> list:
@@ -76,6 +78,50 @@ def get_prompts(config: Dict) -> Dict:
     return config.get("prompts", {})
 
 
+def get_priority(config: Dict) -> str:
+    """
+    Get scheduling priority for this type's jobs.
+    One of "background", "normal" (default) or "urgent".
+    """
+    return config.get("priority", "normal")
+
+
+def get_llm_settings(config: Dict) -> Dict:
+    """
+    Get LLM call settings for this type.
+    Keys: cache (bool, default true) - allow replaying cached responses.
+          backend, model, stage_models - routing (see llm_backend).
+          routes - model/output budget by transcript token count (see llm_backend).
+          hedge (bool, default LLM_HEDGE) - duplicate requests slower than p95 TTFT.
+    """
+    return config.get("llm", {})
+
+
+def get_compaction_settings(config: Dict) -> Dict:
+    """
+    Get transcript compaction settings for LLM input.
+    Keys: enabled (bool, default true), target_tokens (int, optional extractive budget).
+    """
+    return config.get("compaction", {})
+
+
+def get_transcript_settings(config: Dict) -> Dict:
+    """
+    Get raw transcript placement for generated pages.
+    Keys: mode ("inline" or "pages", default TRANSCRIPT_MODE),
+          lines_per_page (int, transcript lines per linked page).
+    """
+    return config.get("transcript", {})
+
+
+def get_technique_index_settings(config: Dict) -> Dict:
+    """
+    Get the cross-session technique index for this type (technique_index.py).
+    Keys: page (Logseq page name of the index; no page, no index).
+    """
+    return config.get("technique_index", {})
+
+
 def get_output_template(config: Dict) -> str:
     """Get Markdown template for output."""
     return config.get("output_template", "# {{title}}\n\n{{sections}}\n\n{{transcript}}")
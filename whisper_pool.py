@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Whisper Pool: Supervised transcription worker processes sharing one copy of
+the weights.
+
+The Whisper checkpoint is exported once as an fp32 state dict. Every worker
+maps that file with torch.load(mmap=True) and assigns the tensors straight
+into its model, so the weights live in the page cache once and are shared
+read-only by all workers instead of being copied into each process.
+
+Workers are recycled between jobs after WHISPER_MAX_JOBS jobs or once their
+RSS crosses WHISPER_RSS_WATERMARK_MB, which keeps allocator fragmentation
+and heap growth from accumulating in a service that runs for months. A
+worker left at a background job's nice is also replaced before running a
+higher-priority job, as lowering nice needs CAP_SYS_NICE. If a replacement
+fails to start, a retiring worker that is still alive stays in the pool, and
+a dead one's replacement is retried in the background, so the pool never
+shrinks.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import queue
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import audio_ledger
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv("WHISPER_MODEL", "small")
+WEIGHTS_DIR = Path(__file__).parent / "state" / "models"
+
+# Recycling policy (0 disables the limit)
+MAX_JOBS_PER_WORKER = int(os.getenv("WHISPER_MAX_JOBS", "50"))
+RSS_WATERMARK_MB = float(os.getenv("WHISPER_RSS_WATERMARK_MB", "3000"))
+
+# Seconds a retiring worker gets to exit before it is terminated
+STOP_TIMEOUT = 30
+
+# Seconds before retrying a replacement that failed to start (doubles up to the max)
+SPAWN_RETRY_DELAY = 5
+SPAWN_RETRY_MAX_DELAY = 300
+
+# Set in each worker process by _worker_main()
+_MODEL = None
+
+
+def weights_path(model_name: str = MODEL_NAME) -> Path:
+    """Location of the mmap-able fp32 export for a Whisper model."""
+    return WEIGHTS_DIR / f"whisper-{model_name}.fp32.pt"
+
+
+def _export_weights(model_name: str, path: str):
+    """Convert the downloaded checkpoint into an fp32 state dict file."""
+    import torch
+    import whisper
+
+    model = whisper.load_model(model_name, device="cpu")
+    tmp_path = f"{path}.tmp"
+    torch.save(
+        {"dims": vars(model.dims), "model_state_dict": model.state_dict()},
+        tmp_path
+    )
+    os.replace(tmp_path, path)
+
+
+def export_weights(model_name: str = MODEL_NAME) -> Path:
+    """
+    Export weights once. Runs in a short-lived process so the service
+    itself never holds a full copy of the model.
+    """
+    path = weights_path(model_name)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"🔄 Exporting Whisper weights ({model_name}) for shared loading...")
+    process = multiprocessing.get_context("spawn").Process(
+        target=_export_weights, args=(model_name, str(path))
+    )
+    process.start()
+    process.join()
+    if process.exitcode != 0 or not path.exists():
+        raise RuntimeError(f"Failed to export Whisper weights for '{model_name}'")
+    logger.info(f"✓ Exported weights: {path.name}")
+    return path
+
+
+def load_shared_model(path: Path, model_name: str = MODEL_NAME):
+    """Build a Whisper model whose parameters are backed by the mmapped file."""
+    import numpy as np
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(str(path), mmap=True, weights_only=True, map_location="cpu")
+    dims = ModelDimensions(**checkpoint["dims"])
+
+    # Build on the meta device so no throwaway weights are allocated
+    try:
+        with torch.device("meta"):
+            model = Whisper(dims)
+    except (RuntimeError, NotImplementedError):
+        model = Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+
+    # Non-persistent buffers are not in the state dict; rebuild them on CPU
+    for module in model.modules():
+        mask = getattr(module, "mask", None)
+        if isinstance(mask, torch.Tensor) and mask.is_meta:
+            n_ctx = mask.shape[0]
+            module.mask = torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1)
+    if model_name in whisper._ALIGNMENT_HEADS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_name])
+
+    return model.eval()
+
+
+def memory_stats() -> Dict:
+    """
+    Memory usage of the current process in MB (Linux).
+    PSS splits shared pages between the processes mapping them, so summing
+    PSS across workers gives the real total; RSS counts shared weights in
+    every process.
+    """
+    stats = {"pid": os.getpid()}
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb"}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    stats[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return stats
+
+
+def _transcribe_job(audio_path: str, entry: Optional[Dict] = None) -> Dict:
+    """
+    Worker side of WhisperPool.transcribe().
+
+    Decodes the audio, reuses whatever the ledger entry still covers and
+    transcribes the rest. Segment times are relative to the whole recording.
+    """
+    import whisper
+
+    audio = whisper.load_audio(audio_path)
+    kept, resume_sample = audio_ledger.resume_point(entry, audio)
+    result = {
+        "kept": len(kept),
+        "resume_sample": resume_sample,
+        "unchanged": bool(kept) and resume_sample == len(audio),
+        "fingerprint": audio_ledger.fingerprint(audio),
+    }
+
+    if result["unchanged"]:
+        result["segments"] = kept
+        result["memory"] = memory_stats()
+        return result
+
+    offset = resume_sample / audio_ledger.SAMPLE_RATE
+    options = {"word_timestamps": True}
+    if kept:
+        # Give Whisper the preceding sentence for continuity
+        options["initial_prompt"] = kept[-1]["text"]
+    transcription = _MODEL.transcribe(audio[resume_sample:], **options)
+
+    # Scores and token ids go to the segment sidecar (segment_store), not the ledger
+    segments = [
+        {
+            "start": offset + segment["start"],
+            "end": offset + segment["end"],
+            "text": segment["text"].strip(),
+            "tokens": segment.get("tokens", []),
+            "avg_logprob": segment.get("avg_logprob"),
+            "no_speech_prob": segment.get("no_speech_prob"),
+            "compression_ratio": segment.get("compression_ratio"),
+        }
+        for segment in transcription.get("segments", [])
+    ]
+    if not segments and transcription["text"].strip():
+        end = len(audio) / audio_ledger.SAMPLE_RATE
+        segments = [{"start": offset, "end": end, "text": transcription["text"].strip()}]
+
+    result["segments"] = kept + segments
+    result["memory"] = memory_stats()
+    return result
+
+
+def _apply_job_settings(settings: Dict):
+    """Apply per-job resource settings from the governor inside the worker."""
+    threads = settings.get("threads")
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _worker_main(conn, path: str, model_name: str):
+    """
+    Worker process loop: load the shared model, report ready, then run jobs
+    from the pipe until told to stop (None).
+    """
+    global _MODEL
+    try:
+        _MODEL = load_shared_model(Path(path), model_name)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    conn.send(("ready", memory_stats()))
+
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        audio_path, entry, settings = job
+        try:
+            _apply_job_settings(settings)
+            conn.send(("done", _transcribe_job(audio_path, entry)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class WorkerCrashed(RuntimeError):
+    """A worker process died while running a job."""
+
+
+class _Worker:
+    """Supervisor-side handle for one worker process."""
+
+    def __init__(self, process, conn, generation: int):
+        self.process = process
+        self.conn = conn
+        self.generation = generation
+        self.jobs = 0
+        self.memory = {}
+        # Spawned processes start at the service's nice; lowering it later
+        # may be refused, so the pool tracks what the worker runs at
+        self.nice = os.getpriority(os.PRIO_PROCESS, 0)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def run(self, job: tuple) -> Dict:
+        """Send a job and wait for its result."""
+        try:
+            self.conn.send(job)
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerCrashed(f"worker {self.pid} died: {e}") from e
+        if status == "error":
+            raise RuntimeError(payload)
+        self.jobs += 1
+        self.memory = payload.pop("memory")
+        return payload
+
+    def stop(self):
+        """Ask the worker to exit; terminate it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class WhisperPool:
+    """
+    Supervised pool of Whisper workers sharing mmapped model weights.
+
+    Jobs only ever go to idle workers, and workers are retired only between
+    jobs, after a replacement has been started, so recycling never drops an
+    in-flight job. A job whose worker crashes is retried once on a fresh one.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        model_name: str = MODEL_NAME,
+        max_jobs: int = MAX_JOBS_PER_WORKER,
+        rss_watermark_mb: float = RSS_WATERMARK_MB,
+        governor=None
+    ):
+        self.workers = workers
+        self.governor = governor
+        self.model_name = model_name
+        self.max_jobs = max_jobs
+        self.rss_watermark_mb = rss_watermark_mb
+        self._path = str(export_weights(model_name))
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._live = {}  # pid -> _Worker
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._recycled = 0
+        self._closing = False
+
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        """Start a worker and wait until its model is loaded; raises WorkerCrashed if it fails to."""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self._path, self.model_name),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        with self._lock:
+            self._generation += 1
+            worker = _Worker(process, parent_conn, self._generation)
+        try:
+            status, payload = parent_conn.recv()
+        except (EOFError, OSError) as e:
+            status, payload = "error", f"exited during startup: {e}"
+        if status != "ready":
+            worker.stop()
+            raise WorkerCrashed(f"worker {worker.pid} failed to start: {payload}")
+        worker.memory = payload
+        with self._lock:
+            self._live[worker.pid] = worker
+        return worker
+
+    def _retire(self, worker: _Worker, reason: str) -> bool:
+        """
+        Replace a worker: start its successor first, then stop it. If the
+        successor fails to start, a worker that is still alive is kept (the
+        caller decides what to do with it) and False is returned; a dead
+        worker's successor is then retried in the background.
+        """
+        logger.info(f"♻️  Recycling worker {worker.pid} ({reason})")
+        if not self._closing:
+            try:
+                successor = self._spawn()
+            except WorkerCrashed as e:
+                logger.error(f"❌ No replacement for worker {worker.pid}: {e}")
+                if worker.process.is_alive():
+                    return False
+                threading.Thread(target=self._respawn, daemon=True).start()
+            else:
+                self._idle.put(successor)
+        with self._lock:
+            self._live.pop(worker.pid, None)
+            self._recycled += 1
+        worker.stop()
+        return True
+
+    def _recycle(self, worker: _Worker, reason: str):
+        """Background retirement after a job; the worker stays idle if it cannot be replaced yet."""
+        if not self._retire(worker, reason):
+            self._idle.put(worker)
+
+    def _respawn(self):
+        """Start a worker in place of one that died, retrying until one starts."""
+        delay = SPAWN_RETRY_DELAY
+        while not self._closing:
+            time.sleep(delay)
+            try:
+                self._idle.put(self._spawn())
+                return
+            except WorkerCrashed as e:
+                logger.error(f"❌ {e}; retrying in {delay}s")
+                delay = min(delay * 2, SPAWN_RETRY_MAX_DELAY)
+
+    def _recycle_reason(self, worker: _Worker) -> Optional[str]:
+        if self.max_jobs and worker.jobs >= self.max_jobs:
+            return f"{worker.jobs} jobs"
+        rss = worker.memory.get("rss_mb", 0)
+        if self.rss_watermark_mb and rss >= self.rss_watermark_mb:
+            return f"RSS {rss} MB >= {self.rss_watermark_mb} MB"
+        return None
+
+    def _take_worker(self, priority: str) -> _Worker:
+        """
+        An idle worker that can run at the nice of priority. A worker left at
+        a higher nice by a background job cannot be lowered without
+        CAP_SYS_NICE, so it is replaced by a fresh one instead.
+        """
+        while True:
+            worker = self._idle.get()
+            if not self.governor or self.governor.can_renice(worker.nice, priority):
+                return worker
+            if not self._retire(worker, f"nice {worker.nice} too high for a {priority} job"):
+                logger.warning(f"⚠️  Running the {priority} job at nice {worker.nice}")
+                return worker
+
+    def transcribe(
+        self,
+        audio_path: Path,
+        entry: Optional[Dict] = None,
+        priority: str = "normal"
+    ) -> Dict:
+        """Transcribe on an idle worker; blocks until the job is done."""
+        settings = {}
+        if self.governor:
+            self.governor.wait_turn(priority)
+            settings = self.governor.job_settings(priority)
+        job = (str(audio_path), entry, settings)
+
+        for attempt in range(2):
+            worker = self._take_worker(priority)
+            if self.governor and self.governor.track(worker.pid, priority, settings):
+                worker.nice = self.governor.nice_for(priority)
+            try:
+                result = worker.run(job)
+            except WorkerCrashed as e:
+                logger.error(f"❌ {e}")
+                self._retire(worker, "crashed")
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self._idle.put(worker)
+                raise
+            finally:
+                if self.governor:
+                    self.governor.untrack(worker.pid)
+
+            reason = self._recycle_reason(worker)
+            if reason:
+                # Hand off in the background so the caller is not delayed
+                threading.Thread(target=self._recycle, args=(worker, reason), daemon=True).start()
+            else:
+                self._idle.put(worker)
+            return result
+
+    def memory_report(self) -> Dict:
+        """Per-worker memory (as of each worker's last job) plus totals."""
+        with self._lock:
+            workers = [
+                {**w.memory, "generation": w.generation, "jobs": w.jobs}
+                for w in self._live.values()
+            ]
+            recycled = self._recycled
+        return {
+            "workers": workers,
+            "recycled": recycled,
+            "total_rss_mb": round(sum(w.get("rss_mb", 0) for w in workers), 1),
+            "total_pss_mb": round(sum(w.get("pss_mb", 0) for w in workers), 1),
+        }
+
+    def log_memory(self):
+        """Log the memory report."""
+        report = self.memory_report()
+        for worker in report["workers"]:
+            logger.info(
+                f"🧠 Worker {worker.get('pid')} (gen {worker['generation']}, {worker['jobs']} jobs): "
+                f"RSS {worker.get('rss_mb', '?')} MB, PSS {worker.get('pss_mb', '?')} MB, "
+                f"shared {worker.get('shared_mb', '?')} MB"
+            )
+        logger.info(
+            f"🧠 Workers total: PSS {report['total_pss_mb']} MB "
+            f"(RSS sum {report['total_rss_mb']} MB, {report['recycled']} recycled)"
+        )
+
+    def save_memory_report(self, path: Path):
+        """Write the memory report as JSON (for `watch cat` / monitoring)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.memory_report(), indent=2), encoding="utf-8")
+
+    def shutdown(self):
+        """Stop all workers once their current jobs have finished."""
+        self._closing = True
+        with self._lock:
+            live = len(self._live)
+        for _ in range(live):
+            try:
+                worker = self._idle.get(timeout=STOP_TIMEOUT * 10)
+            except queue.Empty:
+                break
+            with self._lock:
+                self._live.pop(worker.pid, None)
+            worker.stop()